@@ -1,3 +1,4 @@
+from flask import request
 from flask_restx import Namespace, Resource, fields
 from app.services import facade
 
@@ -41,6 +42,19 @@ place_response = api.model('Place', {
     'amenity_ids': fields.List(fields.String),
 })
 
+# Free date ranges of a place
+free_range_model = api.model('FreeRange', {
+    'start': fields.String(description='Start of the free range (ISO format)'),
+    'end':   fields.String(description='End of the free range (ISO format)'),
+})
+
+availability_response = api.model('PlaceAvailability', {
+    'place_id': fields.String,
+    'from':     fields.String,
+    'to':       fields.String,
+    'free':     fields.List(fields.Nested(free_range_model)),
+})
+
 # Amenity brief model for embedding in Place responses
 amenity_brief_model = api.model('AmenityBrief', {
     'id': fields.String,
@@ -134,6 +148,30 @@ class PlaceList(Resource):
             return {"error": str(e)}, 404
 
 
+@api.route('/available')
+class AvailablePlaces(Resource):
+    @api.doc(params={
+        'start': 'First night in ISO format (YYYY-MM-DD)',
+        'end': 'Day of departure in ISO format (YYYY-MM-DD)',
+        'min_price': 'Lowest price (optional)',
+        'max_price': 'Highest price (optional)',
+    })
+    @api.response(200, 'Places free for every night between start and end', [place_response])
+    @api.response(400, 'Invalid or missing dates or prices')
+    def get(self):
+        """ Places free for the given dates, optionally within a price range """
+        start, end = request.args.get('start'), request.args.get('end')
+        if not start or not end:
+            return {"error": "'start' and 'end' query parameters are required"}, 400
+        try:
+            prices = {key: float(request.args[key]) if request.args.get(key) else None
+                      for key in ('min_price', 'max_price')}
+            places = facade.list_available_places(start, end, **prices)
+        except ValueError as e:
+            return {"error": str(e)}, 400
+        return api.marshal(places, place_response), 200
+
+
 @api.route('/<place_id>')
 class PlaceResource(Resource):
     @api.marshal_with(place_with_amenities_response, code=200)
@@ -158,3 +196,28 @@ class PlaceResource(Resource):
             return place, 200
         except ValueError as e:
             return {"error:", str(e)}, 404
+
+
+@api.route('/<place_id>/availability')
+class PlaceAvailability(Resource):
+    @api.doc(params={'from': 'Start date in ISO format', 'to': 'End date in ISO format'})
+    @api.response(200, 'Free date ranges retrieved successfully', availability_response)
+    @api.response(400, 'Invalid or missing dates')
+    @api.response(404, 'Place not found')
+    def get(self, place_id):
+        """ Free date ranges of a place between from and to """
+        start, end = request.args.get('from'), request.args.get('to')
+        if not start or not end:
+            return {"error": "'from' and 'to' query parameters are required"}, 400
+        try:
+            free = facade.get_place_availability(place_id, start, end)
+        except ValueError as e:
+            if str(e).startswith("404"):
+                return {"error": "Place not found"}, 404
+            return {"error": str(e)}, 400
+        return {
+            "place_id": place_id,
+            "from": start,
+            "to": end,
+            "free": [{"start": s.isoformat(), "end": e.isoformat()} for s, e in free],
+        }, 200
@@ -30,6 +30,7 @@ class ReservationList(Resource):
     @api.expect(reservation_model, validate=True)
     @api.response(201, "Reservation created successfully!")
     @api.response(400, "Invalid input data")
+    @api.response(409, "Place already booked for these dates")
     def post(self):
         """ Create a new reservation """
         reservation_data = api.payload
@@ -47,6 +48,8 @@ class ReservationList(Resource):
                 "payment_status": new_reservation.payment_status
             }, 201
         except (ValueError, TypeError) as e:
+            if str(e).startswith("409"):
+                return {"error": str(e)}, 409
             return {"error": str(e)}, 400
         except Exception as e:
             return {"error": f"Unexpected error: {str(e)}"}, 500
@@ -99,6 +102,7 @@ class ReservationResource(Resource):
     @api.response(200, "Reservation updated successfully!")
     @api.response(400, 'Invalid data or update failed')
     @api.response(404, 'Reservation not found')
+    @api.response(409, 'Place already booked for these dates')
     def put(self, reservation_id):
         """ Update an existing reservation """
         reservation_data = api.payload
@@ -121,6 +125,8 @@ class ReservationResource(Resource):
             message = str(e)
             if message.startswith("404"):
                 return {"error": "Reservation not found"}, 404
+            if message.startswith("409"):
+                return {"error": message}, 409
             return {"error": message}, 400
         except Exception as e:
             return {"error": f"Unexpected error: {str(e)}"}, 500
\ No newline at end of file
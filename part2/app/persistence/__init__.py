@@ -0,0 +1,32 @@
+import atexit
+import os
+
+from app.persistence.concurrent_repository import ConcurrentInMemoryRepository
+
+# one DurableRepository per file, however many facades ask for it
+_durable = {}
+
+
+def make_repository(name, unique=(), indexes=(), references=None):
+    """
+    The repository for one kind of object: in memory only, or kept in
+    HBNB_DATA_DIR/<name>.snapshot / .log when HBNB_DATA_DIR is set.
+    Both are safe to share between request threads. references maps the
+    attributes holding other objects to the repositories of those
+    objects, for a durable repository to re-link them on load.
+    """
+    data_dir = os.getenv("HBNB_DATA_DIR")
+    if not data_dir:
+        return ConcurrentInMemoryRepository(unique=unique, indexes=indexes)
+    from app.persistence.durable_repository import DurableRepository
+    path = os.path.join(data_dir, name)
+    if path not in _durable:
+        _durable[path] = DurableRepository(
+            path, unique=unique, indexes=indexes, references=references,
+            fsync_every=int(os.getenv("HBNB_FSYNC_EVERY", 100)),
+            fsync_interval=float(os.getenv("HBNB_FSYNC_INTERVAL", 0.05)),
+            snapshot_every=int(os.getenv("HBNB_SNAPSHOT_EVERY", 100000)),
+        )
+        # write out the last batch on a clean exit
+        atexit.register(_durable[path].close)
+    return _durable[path]
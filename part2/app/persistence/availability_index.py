@@ -0,0 +1,155 @@
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import date, timedelta
+
+# reservations in these statuses hold their dates; cancelled and
+# completed ones free them
+BLOCKING_STATUSES = ("pending", "confirmed")
+
+
+class AvailabilityIndex:
+    """
+    Booked date ranges per place, for overlap checks and free ranges.
+
+    A place's ranges are half-open [start, end), so a stay may start on
+    the day the previous one ends, and never overlap each other. That
+    keeps them sorted by start and by end at the same time, so both
+    lookups are a bisect in parallel sorted lists.
+
+    For searches across places, each place with bookings also has an
+    occupancy bitmap: an int whose bit d is set when the night of day
+    origin + d is booked, for horizon_days from today. Whether a place
+    is free for a range of nights is then one AND with the range's mask.
+
+    Every method holds lock, so a check and the booking it allows are
+    one step for concurrent requests; hold it to do the same across
+    several calls.
+    """
+    def __init__(self, horizon_days=365):
+        self.lock = threading.RLock()
+        # place_id -> sorted starts, sorted ends, reservation ids in that order
+        self._places = {}
+        # reservation_id -> (place_id, start, end)
+        self._booked = {}
+        self.horizon_days = horizon_days
+        self._origin = date.today()
+        # place_id -> occupancy bitmap, for places with booked nights in the horizon
+        self._bits = {}
+
+    def _ranges(self, place_id):
+        return self._places.setdefault(place_id, ([], [], []))
+
+    def _overlapping(self, place_id, start, end):
+        """Positions of the ranges of place_id overlapping [start, end)"""
+        starts, ends, ids = self._places.get(place_id, ([], [], []))
+        # first range ending after start .. last range starting before end
+        return range(bisect_right(ends, start), bisect_left(starts, end))
+
+    def conflicts(self, place_id, start, end, exclude=None):
+        """Ids of the reservations overlapping [start, end), other than exclude"""
+        with self.lock:
+            ids = self._places.get(place_id, ([], [], []))[2]
+            return [ids[i] for i in self._overlapping(place_id, start, end) if ids[i] != exclude]
+
+    def is_free(self, place_id, start, end, exclude=None):
+        return not self.conflicts(place_id, start, end, exclude)
+
+    def add(self, reservation_id, place_id, start, end):
+        with self.lock:
+            conflicts = self.conflicts(place_id, start, end, exclude=reservation_id)
+            if conflicts:
+                raise ValueError(f"409: Place {place_id} is already booked between {start.isoformat()} "
+                                 f"and {end.isoformat()}")
+            self.remove(reservation_id)
+            starts, ends, ids = self._ranges(place_id)
+            i = bisect_left(starts, start)
+            starts.insert(i, start)
+            ends.insert(i, end)
+            ids.insert(i, reservation_id)
+            self._booked[reservation_id] = (place_id, start, end)
+            mask = self._mask(*self._nights(start, end))
+            if mask:
+                self._bits[place_id] = self._bits.get(place_id, 0) | mask
+
+    def remove(self, reservation_id):
+        with self.lock:
+            if reservation_id not in self._booked:
+                return
+            place_id, start, end = self._booked.pop(reservation_id)
+            starts, ends, ids = self._places[place_id]
+            i = bisect_left(starts, start)
+            del starts[i], ends[i], ids[i]
+            if not ids:
+                del self._places[place_id]
+            # a neighbouring stay may share the night of a same-day stay
+            self._rebuild_bits(place_id)
+
+    def sync(self, reservation):
+        """Index a reservation's current dates, or drop it once it no longer blocks them"""
+        with self.lock:
+            if reservation.status in BLOCKING_STATUSES:
+                self.add(reservation.id, reservation.place_id, reservation.start_date, reservation.end_date)
+            else:
+                self.remove(reservation.id)
+
+    def free_ranges(self, place_id, start, end):
+        """[(free_start, free_end)] between start and end, in order"""
+        with self.lock:
+            starts, ends, _ = self._places.get(place_id, ([], [], []))
+            free = []
+            cursor = start
+            for i in self._overlapping(place_id, start, end):
+                if starts[i] > cursor:
+                    free.append((cursor, starts[i]))
+                cursor = max(cursor, ends[i])
+            if cursor < end:
+                free.append((cursor, end))
+            return free
+
+    # ---------- occupancy bitmaps ----------
+    @staticmethod
+    def _nights(start, end):
+        """[first night, last night) of a stay; a same-day stay takes its day's night"""
+        first = start.date()
+        return first, max(end.date(), first + timedelta(days=1))
+
+    def _mask(self, first, last):
+        """Bits of the nights [first, last) that fall within the horizon"""
+        lo = max((first - self._origin).days, 0)
+        hi = min((last - self._origin).days, self.horizon_days)
+        return ((1 << (hi - lo)) - 1) << lo if hi > lo else 0
+
+    def _rebuild_bits(self, place_id):
+        starts, ends, _ = self._places.get(place_id, ([], [], []))
+        bits = 0
+        for start, end in zip(starts, ends):
+            bits |= self._mask(*self._nights(start, end))
+        if bits:
+            self._bits[place_id] = bits
+        else:
+            self._bits.pop(place_id, None)
+
+    def _roll(self):
+        """Move the horizon to start today"""
+        today = date.today()
+        if today != self._origin:
+            self._origin = today
+            self._bits = {}
+            for place_id in self._places:
+                self._rebuild_bits(place_id)
+
+    def booked_places(self, first, last):
+        """Ids of the places with any of the nights [first, last) booked"""
+        with self.lock:
+            self._roll()
+            # nights before today are not tracked
+            first = max(first, self._origin)
+            if last <= first:
+                return set()
+            if (last - self._origin).days <= self.horizon_days:
+                mask = self._mask(first, last)
+                return {place_id for place_id, bits in self._bits.items() if bits & mask}
+            # past the horizon: go through the stays themselves
+            return {place_id for place_id, (starts, ends, _) in self._places.items()
+                    if any(a < last and b > first
+                           for a, b in (self._nights(s, e) for s, e in zip(starts, ends)))}
@@ -0,0 +1,96 @@
+import threading
+
+from app.persistence.repository import InMemoryRepository
+
+
+class ConcurrentInMemoryRepository(InMemoryRepository):
+    """
+    InMemoryRepository safe to share between the threads of a threaded
+    WSGI server.
+
+    Writers lock the stripe of the object's id (stripes locks, picked
+    by hash), so writes to different objects only wait for each other
+    while they update the secondary indexes, under one index lock. A
+    unique value is checked and claimed under that lock, so two
+    requests cannot both take the same email.
+
+    Readers never lock. get() and index lookups read single dict
+    entries; get_all() and unindexed lookups go through snapshot(), an
+    immutable tuple of the objects rebuilt only after a write changed
+    the version. This relies on the GIL making single dict operations
+    atomic (get, set, pop, and copying a dict or its values, which run
+    in one C call). The objects themselves are shared, so a snapshot
+    fixes which objects exist, not their fields.
+    """
+    def __init__(self, unique=(), indexes=(), stripes=64):
+        super().__init__(unique=unique, indexes=indexes)
+        self._stripes = [threading.Lock() for _ in range(stripes)]
+        self._index_lock = threading.Lock()
+        self._version = 0
+        self._version_lock = threading.Lock()
+        # (version, objects); -1 so that the first read builds it
+        self._view = (-1, ())
+
+    # ---------- locking ----------
+    def _stripe(self, obj_id):
+        return self._stripes[hash(obj_id) % len(self._stripes)]
+
+    def _changed(self):
+        with self._version_lock:
+            self._version += 1
+
+    # ---------- writes ----------
+    def add(self, obj):
+        with self._stripe(obj.id):
+            with self._index_lock:
+                super().reindex(obj)
+            self._storage[obj.id] = obj
+        self._changed()
+
+    def update(self, obj_id, data):
+        with self._stripe(obj_id):
+            obj = self._storage.get(obj_id)
+            if obj is None:
+                return
+            with self._restored_on_error(obj):
+                obj.update(data)
+                with self._index_lock:
+                    super().reindex(obj)
+        self._changed()
+
+    def reindex(self, obj):
+        with self._stripe(obj.id):
+            with self._index_lock:
+                super().reindex(obj)
+
+    def delete(self, obj_id):
+        with self._stripe(obj_id):
+            if self._storage.pop(obj_id, None) is None:
+                return
+            with self._index_lock:
+                for name, indexed in self._indexed.items():
+                    if obj_id in indexed:
+                        self._unindex(obj_id, name)
+        self._changed()
+
+    # ---------- reads ----------
+    def snapshot(self):
+        """Immutable tuple of the objects as of the last write"""
+        version, objs = self._view
+        current = self._version
+        if version != current:
+            # read the version first: a write landing meanwhile is
+            # included and only makes the next reader rebuild again
+            objs = tuple(self._storage.values())
+            self._view = (current, objs)
+        return objs
+
+    def get_all(self):
+        return list(self.snapshot())
+
+    def _scan(self):
+        return self.snapshot()
+
+    def _bucket(self, name, value):
+        # a copy: writers change the index's sets in place
+        return dict(super()._bucket(name, value))
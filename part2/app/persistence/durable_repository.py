@@ -0,0 +1,486 @@
+import base64
+import gc
+import json
+import logging
+import mmap
+import os
+import shutil
+import struct
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from datetime import datetime
+
+from app.models.base_model import BaseModel
+from app.persistence.concurrent_repository import ConcurrentInMemoryRepository
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_MAGIC = b"HBNBSNP3"
+# magic, number of records
+SNAPSHOT_HEADER = struct.Struct("<8sQ")
+# record length, record crc32
+RECORD_HEADER = struct.Struct("<II")
+# first byte of a record: a shape, a put, a delete
+SHAPE, PUT, DELETE = b"S", b"P", b"D"
+# the number of a shape within its file
+SHAPE_ID = struct.Struct("<H")
+
+# codes of the attributes of a shape. Packed with struct: ? bool, q int,
+# d float. In the strings: s str, T datetime (isoformat), r id of a
+# referenced model, j anything else as tagged JSON. n is None, no data.
+_FIXED_CODES = {bool: "?", int: "q", float: "d"}
+_FIXED_FORMAT = str.maketrans({"s": None, "T": None, "r": None, "j": None, "n": None})
+_INT_RANGE = range(-2 ** 63, 2 ** 63)
+
+
+def _model_classes():
+    """The BaseModel subclasses by '<module>.<name>': the only types a store restores"""
+    classes, pending = {}, [BaseModel]
+    while pending:
+        for cls in pending.pop().__subclasses__():
+            classes[f"{cls.__module__}.{cls.__qualname__}"] = cls
+            pending.append(cls)
+    return classes
+
+
+def _plain(value):
+    """value as JSON data, with tuples, bytes and datetimes tagged"""
+    if value is None or type(value) in (str, int, float, bool):
+        return value
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, (bytes, bytearray)):
+        return {"__bytes__": base64.b64encode(value).decode("ascii")}
+    if isinstance(value, tuple):
+        return {"__tuple__": [_plain(v) for v in value]}
+    if isinstance(value, list):
+        return [_plain(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): _plain(v) for k, v in value.items()}
+    raise TypeError(f"Cannot store a value of type {type(value).__name__}")
+
+
+def _untag(obj):
+    """json object_hook undoing the tags of _plain"""
+    if len(obj) == 1:
+        if "__datetime__" in obj:
+            return datetime.fromisoformat(obj["__datetime__"])
+        if "__bytes__" in obj:
+            return base64.b64decode(obj["__bytes__"])
+        if "__tuple__" in obj:
+            return tuple(obj["__tuple__"])
+    return obj
+
+
+def _frame(record):
+    return RECORD_HEADER.pack(len(record), zlib.crc32(record)) + record
+
+
+def _frames(view, pos):
+    """(start, end) of each intact framed record in view from pos on"""
+    while pos + RECORD_HEADER.size <= len(view):
+        length, crc = RECORD_HEADER.unpack_from(view, pos)
+        start = pos + RECORD_HEADER.size
+        pos = start + length
+        if pos > len(view) or zlib.crc32(view[start:pos]) != crc:
+            return
+        yield start, pos
+
+
+@contextmanager
+def _mapped(path):
+    """The file at path mapped read-only, as a memoryview; empty if there is none"""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        yield memoryview(b"")
+        return
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        view = memoryview(mm)
+        try:
+            yield view
+        finally:
+            view.release()
+
+
+class DurableRepository(ConcurrentInMemoryRepository):
+    """
+    ConcurrentInMemoryRepository that survives restarts. Writes are
+    also serialized by the log's lock, so the log is in their order.
+
+    Objects are stored as plain state, never pickled: a binary record of
+    the model's attributes and the ids of the models it refers to (a
+    review's user and place), after a record of their type and names
+    written once per file; see _put_records. Numbers and booleans are
+    packed by struct and strings joined, so a record decodes in a few C
+    calls; other values (lists, dicts) are tagged JSON. On load the type must be a BaseModel subclass, the attributes
+    are set back without running the setters, and each reference is
+    looked up in the repository that references maps its name to
+    ("user" for _user). The review then holds the very User the user
+    repository serves, so later edits reach it.
+
+    Every add/update/delete is appended to <path>.log as a put record or
+    a delete record (the id) behind a length and a crc32.
+    The log is fsynced in batches: once fsync_every records are pending,
+    and at the latest fsync_interval seconds after a write, by a
+    background thread. A crash loses at most that window.
+
+    Once the log holds snapshot_every records it is renamed to
+    <path>.log.compacting and a new log started, and a background thread
+    writes every object to <path>.snapshot (put records framed the same
+    way, in a temporary file renamed over the old one) and then removes
+    the old log. Writers only wait for the rename, and for the one
+    object being encoded in their stripe. If the snapshot cannot be
+    written, the error is logged (and raised by compact()) and the old
+    log stays; the next compaction appends the current log to it and
+    tries again. On startup the snapshot and both logs are mapped with
+    mmap and decoded one record at a time. Every record holds the full
+    state, and every change after the rename is in the new log, so
+    replaying records the snapshot already covers is harmless. A torn
+    record at the end of a log (crash in the middle of a write) is cut
+    off.
+    """
+    def __init__(self, path, unique=(), indexes=(), references=None, fsync_every=100,
+                 fsync_interval=0.05, snapshot_every=100000):
+        super().__init__(unique=unique, indexes=indexes)
+        self.path = path
+        self.snapshot_path = path + ".snapshot"
+        self.log_path = path + ".log"
+        self.compacting_path = path + ".log.compacting"
+        # attribute name -> repository holding the objects it refers to
+        self.references = dict(references or {})
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.snapshot_every = snapshot_every
+
+        self._lock = threading.Lock()
+        self._log_records = 0
+        # shape key -> its number in the current log
+        self._log_shapes = {}
+        self._pending = 0
+        self._closed = False
+        self._wakeup = threading.Condition(self._lock)
+        # the thread writing a snapshot, while it runs
+        self._compactor = None
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._load()
+        if os.path.exists(self.compacting_path):
+            # a compaction cut short: finish it before taking writes
+            self._write_snapshot(tuple(self._storage.values()))
+            os.remove(self.compacting_path)
+        self._log = open(self.log_path, "ab")
+        self._flusher = threading.Thread(target=self._flush_loop, name=f"fsync {path}", daemon=True)
+        self._flusher.start()
+
+    # ---------- startup ----------
+    def _load(self):
+        # millions of new objects would set off the cyclic GC over and
+        # over, though none of them is garbage
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            classes, shapes = _model_classes(), {}
+            self._log_records = 0
+            self._read_snapshot(classes, shapes)
+            self._read_log(self.compacting_path, classes, shapes)
+            # appended to, so go on numbering its shapes
+            self._log_shapes = self._read_log(self.log_path, classes, shapes)
+            # indexes are rebuilt, not stored
+            self._rebuild_indexes()
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    def _read_snapshot(self, classes, shapes):
+        with _mapped(self.snapshot_path) as view:
+            if not view:
+                return
+            magic, count = SNAPSHOT_HEADER.unpack_from(view, 0)
+            if magic != SNAPSHOT_MAGIC:
+                raise ValueError(f"Corrupt snapshot: {self.snapshot_path}")
+            decoders, read, end = {}, 0, SNAPSHOT_HEADER.size
+            for start, end in _frames(view, SNAPSHOT_HEADER.size):
+                if view[start] == PUT[0]:
+                    (shape_id,) = SHAPE_ID.unpack_from(view, start + 1)
+                    obj = decoders[shape_id](view, start + 1 + SHAPE_ID.size, end)
+                    self._storage[obj.id] = obj
+                    read += 1
+                else:
+                    self._read_shape(view, start, end, decoders, classes, shapes)
+            if read != count or end != len(view):
+                raise ValueError(f"Corrupt snapshot: {self.snapshot_path}")
+
+    def _read_log(self, log_path, classes, shapes):
+        """Replay one log; return the numbers of its shapes"""
+        decoders, numbers = {}, {}
+        with _mapped(log_path) as view:
+            size, end = len(view), 0
+            for start, end in _frames(view, 0):
+                op = view[start]
+                if op == PUT[0]:
+                    (shape_id,) = SHAPE_ID.unpack_from(view, start + 1)
+                    obj = decoders[shape_id](view, start + 1 + SHAPE_ID.size, end)
+                    self._storage[obj.id] = obj
+                    self._log_records += 1
+                elif op == DELETE[0]:
+                    self._storage.pop(str(view[start + 1:end], "utf-8"), None)
+                    self._log_records += 1
+                else:
+                    key, shape_id = self._read_shape(view, start, end, decoders, classes, shapes)
+                    numbers[key] = shape_id
+        if end != size:
+            # a write cut short by a crash: drop it
+            with open(log_path, "r+b") as f:
+                f.truncate(end)
+        return numbers
+
+    def _read_shape(self, view, start, end, decoders, classes, shapes):
+        (shape_id,) = SHAPE_ID.unpack_from(view, start + 1)
+        key = str(view[start + 1 + SHAPE_ID.size:end], "utf-8")
+        if key not in shapes:
+            shapes[key] = self._decoder(key, classes)
+        decoders[shape_id] = shapes[key]
+        return key, shape_id
+
+    # ---------- records ----------
+    def _put_records(self, obj, numbers):
+        """
+        The framed put record of obj: PUT, the number of its shape, the
+        attributes of the fixed-size codes packed by struct, then the
+        others as strings joined by NUL. The shape
+        ('<module>.<type>|<codes>|<names>' of the attributes) is written
+        once per file, in a SHAPE record before the first put using it;
+        numbers holds those of the file being written.
+        """
+        codes, names, fixed, strings = [], [], [], []
+        for name, value in vars(obj).items():
+            kind = type(value)
+            if kind is str and "\0" not in value:
+                code = "s"
+                strings.append(value)
+            elif value is None:
+                code = "n"
+            elif kind in _FIXED_CODES and (kind is not int or value in _INT_RANGE):
+                code = _FIXED_CODES[kind]
+                fixed.append(value)
+            elif kind is datetime:
+                code = "T"
+                strings.append(value.isoformat())
+            elif isinstance(value, BaseModel):
+                if name.lstrip("_") not in self.references:
+                    raise TypeError(f"No repository for the {name} references of {self.path}")
+                code = "r"
+                strings.append(value.id)
+            else:
+                code = "j"
+                strings.append(json.dumps(_plain(value), separators=(",", ":")))
+            codes.append(code)
+            names.append(name)
+        codes = "".join(codes)
+        cls = type(obj)
+        key = f"{cls.__module__}.{cls.__qualname__}|{codes}|{','.join(names)}"
+        records = b""
+        shape_id = numbers.get(key)
+        if shape_id is None:
+            shape_id = numbers[key] = len(numbers)
+            records = _frame(SHAPE + SHAPE_ID.pack(shape_id) + key.encode("utf-8"))
+        return records + _frame(b"".join((
+            PUT, SHAPE_ID.pack(shape_id),
+            struct.pack("<" + codes.translate(_FIXED_FORMAT), *fixed),
+            "\0".join(strings).encode("utf-8"),
+        )))
+
+    def _decoder(self, key, classes):
+        """decode(view, start, end) of the put records of one shape"""
+        type_name, codes, names = key.split("|")
+        cls = classes.get(type_name)
+        if cls is None:
+            raise ValueError(f"Corrupt {self.path}: unknown type {type_name}")
+        coded = list(zip(names.split(",") if names else (), codes))
+        fixed = struct.Struct("<" + codes.translate(_FIXED_FORMAT))
+        fixed_names = [name for name, code in coded if code in "?qd"]
+        string_names = [name for name, code in coded if code in "sTrj"]
+        nones = dict.fromkeys(name for name, code in coded if code == "n")
+        conversions = []
+        for name, code in coded:
+            if code == "T":
+                conversions.append((name, datetime.fromisoformat))
+            elif code == "j":
+                conversions.append((name, lambda value: json.loads(value, object_hook=_untag)))
+            elif code == "r":
+                conversions.append((name, self._referent(name)))
+        new, unpack_from, size = cls.__new__, fixed.unpack_from, fixed.size
+
+        def decode(view, start, end):
+            # the stored attributes as they were, without the setters'
+            # checks (a reservation's start date is in the past by now)
+            obj = new(cls)
+            attrs = obj.__dict__
+            attrs.update(zip(fixed_names, unpack_from(view, start)))
+            if string_names:
+                attrs.update(zip(string_names, str(view[start + size:end], "utf-8").split("\0")))
+            if nones:
+                attrs.update(nones)
+            for name, convert in conversions:
+                attrs[name] = convert(attrs[name])
+            return obj
+        return decode
+
+    def _referent(self, name):
+        """Look up the object an attribute refers to by its id"""
+        repo = self.references.get(name.lstrip("_"))
+        if repo is None:
+            raise ValueError(f"Corrupt {self.path}: no repository for the {name} references")
+
+        def referent(ref_id):
+            target = repo.get(ref_id)
+            if target is None:
+                raise ValueError(f"Corrupt {self.path}: {name} {ref_id} not found")
+            return target
+        return referent
+
+    # ---------- log ----------
+    def _append(self, op, value):
+        # called with the lock held, so the log is in the order of the changes
+        if op == "put":
+            self._log.write(self._put_records(value, self._log_shapes))
+        else:
+            self._log.write(_frame(DELETE + value.encode("utf-8")))
+        self._log_records += 1
+        self._pending += 1
+        if self._pending >= self.fsync_every:
+            self._fsync()
+        else:
+            self._wakeup.notify()
+        if self._log_records >= self.snapshot_every and self._compactor is None:
+            self._start_compaction()
+
+    def _fsync(self):
+        self._log.flush()
+        os.fsync(self._log.fileno())
+        self._pending = 0
+
+    def _flush_loop(self):
+        with self._lock:
+            while not self._closed:
+                if not self._pending:
+                    self._wakeup.wait()
+                    continue
+                # give the batch until fsync_interval after its first write
+                deadline = time.monotonic() + self.fsync_interval
+                while self._pending and not self._closed and time.monotonic() < deadline:
+                    self._wakeup.wait(deadline - time.monotonic())
+                if self._pending and not self._closed:
+                    self._fsync()
+
+    def sync(self):
+        """Write pending log records to disk now"""
+        with self._lock:
+            if self._pending:
+                self._fsync()
+
+    # ---------- snapshots ----------
+    def _start_compaction(self):
+        # called with the lock held: the log so far is set aside and the
+        # objects as of now are written out by another thread
+        self._fsync()
+        self._log.close()
+        if os.path.exists(self.compacting_path):
+            # a compaction failed: its log is needed until a snapshot
+            # covers it, so this one's goes after it. Each file numbers
+            # its shapes from 0, and a SHAPE record redefines its number
+            # for the records after it.
+            with open(self.log_path, "rb") as log, open(self.compacting_path, "ab") as aside:
+                shutil.copyfileobj(log, aside)
+                aside.flush()
+                os.fsync(aside.fileno())
+            os.remove(self.log_path)
+        else:
+            os.replace(self.log_path, self.compacting_path)
+        self._log = open(self.log_path, "ab")
+        self._log_records = 0
+        self._log_shapes = {}
+        objs = tuple(self._storage.values())
+        self._compactor = threading.Thread(target=self._compact, args=(objs,),
+                                           name=f"compact {self.path}", daemon=True)
+        # set by _compact if the snapshot could not be written
+        self._compactor.error = None
+        self._compactor.start()
+
+    def _compact(self, objs):
+        error = None
+        try:
+            self._write_snapshot(objs)
+            # the snapshot holds everything the old log did
+            os.remove(self.compacting_path)
+        except Exception as e:
+            # the log set aside stays, the next compaction retries
+            logger.exception("Writing the snapshot of %s failed", self.path)
+            error = e
+        with self._lock:
+            self._compactor.error = error
+            self._compactor = None
+
+    def _write_snapshot(self, objs):
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, len(objs)))
+            numbers = {}
+            for obj in objs:
+                # not in the middle of an update of this object
+                with self._stripe(obj.id):
+                    records = self._put_records(obj, numbers)
+                f.write(records)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+
+    def _wait_for_compaction(self):
+        with self._lock:
+            compactor = self._compactor
+        if compactor is not None:
+            compactor.join()
+
+    def compact(self):
+        """Compact the log into a new snapshot now, and wait for it; raise why it failed"""
+        self._wait_for_compaction()
+        with self._lock:
+            if self._compactor is None:
+                self._start_compaction()
+            compactor = self._compactor
+        compactor.join()
+        if compactor.error is not None:
+            raise compactor.error
+
+    def close(self):
+        self._wait_for_compaction()
+        with self._lock:
+            if self._closed:
+                return
+            self._fsync()
+            self._closed = True
+            self._wakeup.notify()
+        self._flusher.join()
+        self._log.close()
+
+    # ---------- CRUD ----------
+    def add(self, obj):
+        with self._lock:
+            super().add(obj)
+            self._append("put", obj)
+
+    def update(self, obj_id, data):
+        with self._lock:
+            super().update(obj_id, data)
+            obj = self.get(obj_id)
+            if obj:
+                self._append("put", obj)
+
+    def delete(self, obj_id):
+        with self._lock:
+            if obj_id in self._storage:
+                super().delete(obj_id)
+                self._append("del", obj_id)
@@ -1,4 +1,6 @@
 from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from operator import attrgetter
 
 class Repository(ABC):
     @abstractmethod
@@ -25,13 +27,123 @@ class Repository(ABC):
     def get_by_attribute(self, attr_name, attr_value):
         pass
 
+    @abstractmethod
+    def filter_by(self, **criteria):
+        pass
+
 
 class InMemoryRepository(Repository):
-    def __init__(self):
+    """
+    Objects kept in a dict by id, with optional secondary hash indexes.
+
+    unique and indexes name the attributes to index, either as a name
+    ("email") or as a (name, key function) pair for values that are not
+    plain attributes, e.g. ("place_id", lambda review: review.place.id).
+    get_by_attribute and filter_by use an index when there is one and
+    scan the objects otherwise. Indexes are kept up to date on add,
+    update and delete; an object changed outside update() needs
+    reindex(obj).
+    """
+    def __init__(self, unique=(), indexes=()):
         self._storage = {}
+        # name -> (key function, unique)
+        self._index_keys = {}
+        # name -> {value: obj_id} for unique, {value: {obj_id: None}} otherwise
+        self._indexes = {}
+        # name -> {obj_id: indexed value}, to find the old entry on update
+        self._indexed = {}
+        for spec in unique:
+            self._declare(spec, True)
+        for spec in indexes:
+            self._declare(spec, False)
+
+    def _declare(self, spec, unique):
+        name, key = (spec, attrgetter(spec)) if isinstance(spec, str) else spec
+        self._index_keys[name] = (key, unique)
+        self._indexes[name] = {}
+        self._indexed[name] = {}
+
+    # ---------- index maintenance ----------
+    def _check_unique(self, obj):
+        for name, (key, unique) in self._index_keys.items():
+            if unique:
+                value = key(obj)
+                owner = self._indexes[name].get(value)
+                if value is not None and owner is not None and owner != obj.id:
+                    raise ValueError(f"Duplicate {name}: {value}")
+
+    def _unindex(self, obj_id, name):
+        key, unique = self._index_keys[name]
+        value = self._indexed[name].pop(obj_id)
+        index = self._indexes[name]
+        if unique:
+            if index.get(value) == obj_id:
+                del index[value]
+        else:
+            ids = index[value]
+            del ids[obj_id]
+            if not ids:
+                del index[value]
 
+    def _index(self, obj, name):
+        key, unique = self._index_keys[name]
+        value = key(obj)
+        # several objects may leave a unique value unset
+        if unique and value is None:
+            return
+        if unique:
+            self._indexes[name][value] = obj.id
+        else:
+            # a dict keeps the ids in the order they were indexed
+            self._indexes[name].setdefault(value, {})[obj.id] = None
+        self._indexed[name][obj.id] = value
+
+    def _rebuild_indexes(self):
+        """Index every stored object from scratch, e.g. after a bulk load"""
+        for name, (key, unique) in self._index_keys.items():
+            index, indexed = {}, {}
+            for obj_id, obj in self._storage.items():
+                value = key(obj)
+                if unique:
+                    if value is None:
+                        continue
+                    if index.setdefault(value, obj_id) != obj_id:
+                        raise ValueError(f"Duplicate {name}: {value}")
+                else:
+                    index.setdefault(value, {})[obj_id] = None
+                indexed[obj_id] = value
+            self._indexes[name], self._indexed[name] = index, indexed
+
+    @contextmanager
+    def _restored_on_error(self, obj):
+        """Put back obj's attributes if the block raises, e.g. on a rejected
+        value or a unique value already taken (indexes are only touched
+        once the unique check passed)"""
+        before = dict(obj.__dict__)
+        try:
+            yield
+        except Exception:
+            obj.__dict__.clear()
+            obj.__dict__.update(before)
+            raise
+
+    def reindex(self, obj):
+        """Refresh the index entries of an object changed in place"""
+        self._check_unique(obj)
+        for name, (key, unique) in self._index_keys.items():
+            indexed = self._indexed[name]
+            if obj.id in indexed:
+                # unchanged values keep their place in the index
+                if indexed[obj.id] == key(obj):
+                    continue
+                self._unindex(obj.id, name)
+            self._index(obj, name)
+
+    # ---------- CRUD ----------
     def add(self, obj):
+        self._check_unique(obj)
         self._storage[obj.id] = obj
+        self.reindex(obj)
 
     def get(self, obj_id):
         return self._storage.get(obj_id)
@@ -42,11 +154,52 @@ class InMemoryRepository(Repository):
     def update(self, obj_id, data):
         obj = self.get(obj_id)
         if obj:
-            obj.update(data)
+            with self._restored_on_error(obj):
+                obj.update(data)
+                self.reindex(obj)
 
     def delete(self, obj_id):
         if obj_id in self._storage:
+            for name, indexed in self._indexed.items():
+                if obj_id in indexed:
+                    self._unindex(obj_id, name)
             del self._storage[obj_id]
 
+    # ---------- lookups ----------
+    def _bucket(self, name, value):
+        """{obj_id: None} of the objects indexed under value, in index order"""
+        key, unique = self._index_keys[name]
+        if unique:
+            obj_id = self._indexes[name].get(value)
+            return {obj_id: None} if obj_id is not None else {}
+        return self._indexes[name].get(value, {})
+
+    def _scan(self):
+        """The objects a lookup without an index goes through"""
+        return self._storage.values()
+
     def get_by_attribute(self, attr_name, attr_value):
-        return next((obj for obj in self._storage.values() if getattr(obj, attr_name) == attr_value), None)
\ No newline at end of file
+        if attr_name in self._index_keys and attr_value is not None:
+            for obj_id in self._bucket(attr_name, attr_value):
+                obj = self._storage.get(obj_id)
+                if obj is not None:
+                    return obj
+            return None
+        return next((obj for obj in self._scan() if getattr(obj, attr_name) == attr_value), None)
+
+    def filter_by(self, **criteria):
+        """Objects whose attributes (or indexed values) equal all of criteria"""
+        candidates = None
+        rest = {}
+        for name, value in criteria.items():
+            if name not in self._index_keys or (value is None and self._index_keys[name][1]):
+                rest[name] = value
+                continue
+            ids = self._bucket(name, value)
+            # keep the first index's order, narrowed by the others
+            candidates = ids if candidates is None else {i: None for i in candidates if i in ids}
+        objs = self._scan() if candidates is None else (self._storage.get(i) for i in candidates)
+        getters = {name: self._index_keys[name][0] if name in self._index_keys else attrgetter(name)
+                   for name in rest}
+        return [obj for obj in objs
+                if obj is not None and all(getters[name](obj) == value for name, value in rest.items())]
@@ -1,10 +1,10 @@
 from app.models.amenity import Amenity
-from app.persistence.repository import InMemoryRepository
+from app.persistence import make_repository
 
 class AmenityService:
     def __init__(self):
         """ Instantiate Amenity Repo where data is stored """
-        self.amenity_repo = InMemoryRepository()
+        self.amenity_repo = make_repository("amenities")
     
     """ Add an amenity """
     def create_amenity(self, amenity_data):
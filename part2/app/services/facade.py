@@ -1,18 +1,18 @@
-from app.persistence.repository import InMemoryRepository
+from app.persistence import make_repository
 from app.services.user_service import UserService
 from app.services.amenity_service import AmenityService
 from app.services.reservation_service import ReservationService
 from app.services.place_service import PlaceService
-from app.services.review_service import ReviewService
+from app.services.review_service import ReviewService, REVIEW_INDEXES
 
 class HBnBFacade:
     def __init__(self):
         # shared repo
-        self.user_repo = InMemoryRepository()
-        self.place_repo = InMemoryRepository()
-        self.review_repo = InMemoryRepository()
-        self.amenity_repo = InMemoryRepository()
-        self.reservation_repo = InMemoryRepository()
+        # secondary indexes serve get_by_attribute / filter_by lookups
+        self.user_repo = make_repository("users", unique=("email",))
+        self.place_repo = make_repository("places", indexes=("owner_id",))
+        self.review_repo = make_repository("reviews", indexes=REVIEW_INDEXES,
+                                           references={"user": self.user_repo, "place": self.place_repo})
 
         # services using shared repos
         self.user_service = UserService(self.user_repo)
@@ -56,6 +56,11 @@ class HBnBFacade:
     def get_place(self, place_id):
         return self.place_service.get_place(place_id)
 
+    # Places free for every night between two ISO dates, within a price range
+    def list_available_places(self, start, end, min_price=None, max_price=None):
+        booked = self.reservation_service.get_booked_place_ids(start, end)
+        return [p for p in self.place_service.filter_places(min_price, max_price) if p.id not in booked]
+
     # Update Place
     def update_place(self, place_id, place_data):
         return self.place_service.update_place(place_id, place_data)
@@ -94,6 +99,11 @@ class HBnBFacade:
     def update_reservation(self, reservation_id, reservation_data):
         return self.reservation_service.update_reservation(reservation_id, reservation_data)
 
+    # free date ranges of a place
+    def get_place_availability(self, place_id, start, end):
+        self.place_service.get_place(place_id)
+        return self.reservation_service.get_place_availability(place_id, start, end)
+
     """Review CRU"""
     #CREATE A REVIEW
     def create_review(self, review_data):
@@ -47,6 +47,18 @@ class PlaceService():
             raise ValueError("404: Places not found")
         return places
 
+    # ---------- Filter Places ----------
+    def filter_places(self, min_price=None, max_price=None):
+        """
+        Return a list[Place] priced within [min_price, max_price] (either may be None).
+        """
+        places = self.place_repo.get_all()
+        if min_price is not None:
+            places = [p for p in places if p.price >= min_price]
+        if max_price is not None:
+            places = [p for p in places if p.price <= max_price]
+        return places
+
 
     # ---------- Update ----------
     def update_place(self, place_id, place_data:dict):
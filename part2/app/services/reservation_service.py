@@ -1,13 +1,20 @@
 from app.models.reservation import Reservation
-from app.persistence.repository import InMemoryRepository
+from app.persistence.availability_index import AvailabilityIndex, BLOCKING_STATUSES
+from app.persistence import make_repository
 from datetime import datetime
+import copy
 
 # define one global repo instance
-reservation_repo = InMemoryRepository()
+reservation_repo = make_repository("reservations", indexes=("user_id", "place_id"))
+# booked dates of the reservations in reservation_repo
+availability_index = AvailabilityIndex()
+for _reservation in reservation_repo.get_all():
+    availability_index.sync(_reservation)
 
 class ReservationService:
     def __init__(self):
         self.reservation_repo = reservation_repo
+        self.availability_index = availability_index
 
     def create_reservation(self, reservation_data):
         """ Create a new reservation """
@@ -24,8 +31,16 @@ class ReservationService:
         # Create reservation object
         reservation = Reservation(**reservation_data)
 
-        # Save to repository
-        self.reservation_repo.add(reservation)
+        with self.availability_index.lock:
+            # Reject overlapping bookings before saving
+            self.availability_index.sync(reservation)
+
+            # Save to repository, taking the booking back if that fails
+            try:
+                self.reservation_repo.add(reservation)
+            except Exception:
+                self.availability_index.remove(reservation.id)
+                raise
         return reservation
 
     def get_reservation(self, reservation_id):
@@ -62,9 +77,41 @@ class ReservationService:
                 # Convert ISO strings to datetime for date fields
                 if key in ("start_date", "end_date"):
                     value = datetime.fromisoformat(value)
-                setattr(reservation, key, value)
                 update_dict[key] = value  # store the changes to pass to repo
 
-        # Call repo update with obj_id and data dictionary
-        self.reservation_repo.update(reservation, update_dict)
-        return reservation
\ No newline at end of file
+        # A stay moved past its old end date gets its new end first
+        if "start_date" in update_dict and "end_date" in update_dict \
+                and update_dict["start_date"] >= reservation.end_date:
+            update_dict = {"end_date": update_dict.pop("end_date"), **update_dict}
+
+        # Validate the changes on a copy, so a setter failing halfway
+        # leaves the reservation and its booked dates as they were
+        candidate = copy.copy(reservation)
+        candidate.update(update_dict)
+
+        # Check the new dates / status against the other bookings first,
+        # with no other booking of the place slipping in before the update
+        with self.availability_index.lock:
+            if candidate.status in BLOCKING_STATUSES and not self.availability_index.is_free(
+                    reservation.place_id, candidate.start_date, candidate.end_date, exclude=reservation.id):
+                raise ValueError(f"409: Place {reservation.place_id} is already booked between "
+                                 f"{candidate.start_date.isoformat()} and {candidate.end_date.isoformat()}")
+
+            # Call repo update with obj_id and data dictionary
+            self.reservation_repo.update(reservation.id, update_dict)
+            self.availability_index.sync(reservation)
+        return reservation
+
+    def get_booked_place_ids(self, start, end):
+        """ Ids of the places with a night booked between two ISO dates """
+        first, last = datetime.fromisoformat(start).date(), datetime.fromisoformat(end).date()
+        if last <= first:
+            raise ValueError("'end' must be after 'start'")
+        return self.availability_index.booked_places(first, last)
+
+    def get_place_availability(self, place_id, start, end):
+        """ Free [start, end) ranges of a place between two ISO dates """
+        start, end = datetime.fromisoformat(start), datetime.fromisoformat(end)
+        if end <= start:
+            raise ValueError("'to' must be after 'from'")
+        return self.availability_index.free_ranges(place_id, start, end)
\ No newline at end of file
@@ -3,11 +3,17 @@ from datetime import datetime
 from app.models.review import Review
 from app.persistence.repository import InMemoryRepository
 
+# reviews hold their user and place objects; index them by id
+REVIEW_INDEXES = (
+    ("user_id", lambda review: review.user.id),
+    ("place_id", lambda review: review.place.id),
+)
+
 class ReviewService:
     def __init__(self, place_repo, user_repo, review_repo):
         self.user_repo = user_repo
         self.place_repo = place_repo
-        self.review_repo = review_repo or InMemoryRepository()
+        self.review_repo = review_repo or InMemoryRepository(indexes=REVIEW_INDEXES)
     
     #CREATE
     def create_review(self, review_data):
@@ -42,11 +48,11 @@ class ReviewService:
 
     def get_reviews_by_user(self, user_id):
         """Fetch all reviews made by a specific user (by ID)."""
-        return [r for r in self.review_repo.get_all() if r.user.id == user_id]
+        return self.review_repo.filter_by(user_id=user_id)
 
     def get_reviews_for_place(self, place_id):
         """Fetch all reviews for a specific place (by ID)."""
-        return [r for r in self.review_repo.get_all() if r.place.id == place_id]
+        return self.review_repo.filter_by(place_id=place_id)
     
     #UPDATE
     def update_review(self, review_id, review_data, current_user_id=None):
@@ -41,27 +41,11 @@ class UserService:
                 # if new email not None(means it's in use by others)
                 if found_user is not None and found_user.id != user.id:
                     raise ValueError(f"Email already in use: {new_email}")
-                user.email = new_email
+            user_data = {**user_data, "email": new_email}
 
-        # To update the rest of attributes: name, number, image
-        updatable = {
-            "first_name",
-            "last_name",
-            "encrypted_password",
-            "phone_number",
-            "profile_img",
-            "is_admin",
-        }
-
-        # create a dict to store the updated data
-        update_data = {}
-        for key, value in user_data.items():
-            if key in updatable and value is not None:
-                # user model property setter will do validation
-                setattr(user, key, value)
-                update_data[key] = getattr(user, key)  # store updated value to repo
-
-        # call repo.update(obj_id, data)
+        # call repo.update(obj_id, data): the user model property setters
+        # do the validation there, and the repo puts the user back as it
+        # was if one fails or the email got taken meanwhile
         self.user_repo.update(user.id, user_data)
 
         return user
@@ -0,0 +1,409 @@
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from datetime import date, datetime, timedelta
+from unittest import mock
+from app.models.base_model import BaseModel
+from app.persistence.availability_index import AvailabilityIndex
+from app.persistence.concurrent_repository import ConcurrentInMemoryRepository
+from app.persistence.durable_repository import RECORD_HEADER, DurableRepository
+from app.persistence.repository import InMemoryRepository
+
+
+class Item(BaseModel):
+    def __init__(self, email=None, owner_id=None, parent=None):
+        super().__init__()
+        self.email = email
+        self.owner_id = owner_id
+        self.parent = parent
+
+
+class TestInMemoryRepositoryIndexes(unittest.TestCase):
+    def setUp(self):
+        self.repo = InMemoryRepository(
+            unique=("email",),
+            indexes=("owner_id", ("parent_id", lambda item: item.parent.id if item.parent else None)),
+        )
+
+    def test_unique_lookup_follows_updates_and_deletes(self):
+        a, b = Item("a@example.com"), Item("b@example.com")
+        self.repo.add(a)
+        self.repo.add(b)
+        self.assertIs(self.repo.get_by_attribute("email", "a@example.com"), a)
+
+        self.repo.update(a.id, {"email": "c@example.com"})
+        self.assertIsNone(self.repo.get_by_attribute("email", "a@example.com"))
+        self.assertIs(self.repo.get_by_attribute("email", "c@example.com"), a)
+
+        # changed in place, as UserService does before calling update
+        b.email = "d@example.com"
+        self.repo.update(b.id, {})
+        self.assertIs(self.repo.get_by_attribute("email", "d@example.com"), b)
+
+        self.repo.delete(a.id)
+        self.assertIsNone(self.repo.get_by_attribute("email", "c@example.com"))
+
+    def test_unique_values_are_enforced(self):
+        self.repo.add(Item("a@example.com"))
+        with self.assertRaises(ValueError):
+            self.repo.add(Item("a@example.com"))
+        # unset values do not collide
+        self.repo.add(Item())
+        self.repo.add(Item())
+        self.assertEqual(len(self.repo.get_all()), 3)
+
+    def test_failed_update_changes_nothing(self):
+        a, b = Item("a@example.com", "o1"), Item("b@example.com", "o1")
+        self.repo.add(a)
+        self.repo.add(b)
+        before = dict(b.__dict__)
+        with self.assertRaises(ValueError):
+            self.repo.update(b.id, {"email": "a@example.com", "owner_id": "o2"})
+        self.assertEqual(b.__dict__, before)
+        self.assertIs(self.repo.get_by_attribute("email", "a@example.com"), a)
+        self.assertIs(self.repo.get_by_attribute("email", "b@example.com"), b)
+        self.assertEqual(self.repo.filter_by(owner_id="o2"), [])
+
+    def test_filter_by(self):
+        parent = Item()
+        items = [Item(owner_id="o1", parent=parent), Item(owner_id="o2", parent=parent),
+                 Item(owner_id="o1"), Item(owner_id="o1", parent=parent)]
+        for item in items:
+            self.repo.add(item)
+
+        self.assertEqual(self.repo.filter_by(owner_id="o1"), [items[0], items[2], items[3]])
+        self.assertEqual(self.repo.filter_by(parent_id=parent.id), [items[0], items[1], items[3]])
+        self.assertEqual(self.repo.filter_by(owner_id="o1", parent_id=parent.id), [items[0], items[3]])
+        self.assertEqual(self.repo.filter_by(owner_id="o3"), [])
+        self.assertIs(self.repo.get_by_attribute("owner_id", "o2"), items[1])
+
+        self.repo.update(items[0].id, {"owner_id": "o2"})
+        self.repo.delete(items[3].id)
+        self.assertEqual(self.repo.filter_by(owner_id="o1"), [items[2]])
+        self.assertEqual(self.repo.filter_by(owner_id="o2"), [items[1], items[0]])
+
+    def test_unindexed_attributes_are_scanned(self):
+        plain = InMemoryRepository()
+        item = Item("a@example.com", owner_id="o1")
+        plain.add(item)
+        self.assertIs(plain.get_by_attribute("email", "a@example.com"), item)
+        self.assertEqual(plain.filter_by(owner_id="o1", email="a@example.com"), [item])
+        self.assertEqual(self.repo.filter_by(email=None), [])
+
+
+class TestAvailabilityIndexBitmaps(unittest.TestCase):
+    def setUp(self):
+        self.index = AvailabilityIndex(horizon_days=10)
+        self.today = date.today()
+
+    def day(self, n, hour=0):
+        return datetime.combine(self.today + timedelta(days=n), datetime.min.time()) + timedelta(hours=hour)
+
+    def booked(self, first, last):
+        return self.index.booked_places(self.today + timedelta(days=first), self.today + timedelta(days=last))
+
+    def test_nights_within_and_past_the_horizon(self):
+        self.index.add("r1", "p1", self.day(2, 15), self.day(4, 11))
+        self.index.add("r2", "p2", self.day(8, 15), self.day(14, 11))
+        self.assertEqual(self.booked(0, 2), set())
+        self.assertEqual(self.booked(3, 4), {"p1"})
+        self.assertEqual(self.booked(4, 8), set())
+        self.assertEqual(self.booked(9, 10), {"p2"})
+        # past the 10-day horizon the stays are checked one by one
+        self.assertEqual(self.booked(12, 20), {"p2"})
+        self.assertEqual(self.booked(14, 20), set())
+
+    def test_same_day_stays_share_a_night(self):
+        self.index.add("r1", "p1", self.day(2, 9), self.day(2, 12))
+        self.index.add("r2", "p1", self.day(2, 15), self.day(3, 11))
+        self.index.remove("r1")
+        self.assertEqual(self.booked(2, 3), {"p1"})
+        self.index.remove("r2")
+        self.assertEqual(self.booked(0, 10), set())
+
+
+class TestConcurrentInMemoryRepository(unittest.TestCase):
+    def setUp(self):
+        # an index key that gives up the GIL, so threads interleave
+        # inside the check-then-claim of a unique value
+        def email(item):
+            time.sleep(0)
+            return item.email
+
+        self.repo = ConcurrentInMemoryRepository(unique=(("email", email),), indexes=("owner_id",), stripes=4)
+        # switch threads as often as possible to shake out races
+        self.interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+
+    def tearDown(self):
+        sys.setswitchinterval(self.interval)
+
+    def run_threads(self, target, count=8):
+        errors = []
+
+        def run(n):
+            try:
+                target(n)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=run, args=(n,)) for n in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return errors
+
+    def test_a_unique_value_is_taken_once(self):
+        taken = []
+
+        def register(n):
+            for i in range(200):
+                try:
+                    item = Item(f"user{i}@example.com", owner_id=f"o{n}")
+                    self.repo.add(item)
+                    taken.append(item)
+                except ValueError:
+                    pass
+
+        self.assertEqual(self.run_threads(register), [])
+        self.assertEqual(len(taken), 200)
+        self.assertEqual(len(self.repo.get_all()), 200)
+        for item in taken:
+            self.assertIs(self.repo.get_by_attribute("email", item.email), item)
+
+    def test_failed_update_changes_nothing(self):
+        a, b = Item("a@example.com", "o1"), Item("b@example.com", "o1")
+        self.repo.add(a)
+        self.repo.add(b)
+        before = dict(b.__dict__)
+        with self.assertRaises(ValueError):
+            self.repo.update(b.id, {"email": "a@example.com", "owner_id": "o2"})
+        self.assertEqual(b.__dict__, before)
+        self.assertIs(self.repo.get_by_attribute("email", "b@example.com"), b)
+        self.assertEqual(self.repo.filter_by(owner_id="o2"), [])
+
+    def test_readers_see_consistent_snapshots_while_writers_run(self):
+        items = [Item(f"user{i}@example.com", owner_id="o0") for i in range(500)]
+        for item in items:
+            self.repo.add(item)
+        done = threading.Event()
+
+        def work(n):
+            if n < 4:
+                for item in items[n::4]:
+                    self.repo.update(item.id, {"owner_id": "o1"})
+                    self.repo.delete(item.id)
+                    self.repo.add(Item(owner_id="o2"))
+                done.set()
+            else:
+                while not done.is_set():
+                    snapshot = self.repo.snapshot()
+                    self.assertEqual(len(snapshot), len(set(snapshot)))
+                    self.repo.filter_by(owner_id="o1")
+                    self.repo.filter_by(email=None)
+
+        self.assertEqual(self.run_threads(work), [])
+        self.assertEqual(len(self.repo.get_all()), 500)
+        self.assertEqual(len(self.repo.filter_by(owner_id="o2")), 500)
+        self.assertEqual(self.repo.filter_by(owner_id="o0") + self.repo.filter_by(owner_id="o1"), [])
+
+
+class TestDurableRepository(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, "items")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def open(self, **options):
+        return DurableRepository(self.path, unique=("email",), indexes=("owner_id",), **options)
+
+    def test_changes_survive_a_restart(self):
+        repo = self.open()
+        a, b, c = Item("a@example.com", "o1"), Item("b@example.com", "o1"), Item("c@example.com", "o2")
+        for item in (a, b, c):
+            repo.add(item)
+        repo.update(a.id, {"email": "z@example.com"})
+        repo.delete(b.id)
+        repo.close()
+
+        repo = self.open()
+        self.assertEqual({i.id for i in repo.get_all()}, {a.id, c.id})
+        self.assertEqual(repo.get_by_attribute("email", "z@example.com").id, a.id)
+        self.assertEqual([i.id for i in repo.filter_by(owner_id="o2")], [c.id])
+        repo.close()
+
+    def test_snapshot_then_log_tail(self):
+        repo = self.open(snapshot_every=3)
+        items = [Item(f"{n}@example.com") for n in range(4)]
+        for item in items:
+            repo.add(item)
+        # the third add set the log aside for a snapshot
+        repo._wait_for_compaction()
+        self.assertTrue(os.path.getsize(self.path + ".snapshot") > 0)
+        self.assertFalse(os.path.exists(self.path + ".log.compacting"))
+        self.assertEqual(repo._log_records, 1)
+        repo.delete(items[0].id)
+        repo.close()
+
+        repo = self.open()
+        self.assertEqual({i.id for i in repo.get_all()}, {i.id for i in items[1:]})
+        repo.close()
+
+    def test_records_hold_plain_state(self):
+        repo = self.open()
+        item = Item("a@example.com", "o1")
+        item.tags = ["x", ("y", 1)]
+        item.extra = {"score": 1.5, "flag": True, "big": 2 ** 70, "note": "a\0b", "none": None}
+        vars(item).update(item.extra)
+        repo.add(item)
+        repo.close()
+        with open(self.path + ".log", "rb") as f:
+            data = f.read()
+        length, _ = RECORD_HEADER.unpack_from(data)
+        shape, put = data[RECORD_HEADER.size:RECORD_HEADER.size + length], data[2 * RECORD_HEADER.size + length:]
+        # the type and attribute names, then the values
+        self.assertEqual(shape[:1], b"S")
+        self.assertIn(b"app.tests.test_repository.Item|", shape)
+        self.assertEqual(put[:1], b"P")
+        self.assertIn(b"a@example.com", put)
+
+        repo = self.open()
+        loaded = repo.get(item.id)
+        self.assertEqual(vars(loaded), vars(item))
+        self.assertIsInstance(loaded, Item)
+        repo.close()
+
+    def test_references_are_relinked_on_load(self):
+        parents = DurableRepository(os.path.join(self.tmp, "parents"))
+        repo = DurableRepository(self.path, references={"parent": parents})
+        parent = Item("p@example.com")
+        parents.add(parent)
+        repo.add(Item("c@example.com", parent=parent))
+        repo.compact()
+        repo.add(Item("d@example.com", parent=parent))
+        repo.close()
+        parents.close()
+
+        parents = DurableRepository(os.path.join(self.tmp, "parents"))
+        repo = DurableRepository(self.path, references={"parent": parents})
+        loaded = parents.get(parent.id)
+        self.assertEqual(len(repo.get_all()), 2)
+        for child in repo.get_all():
+            self.assertIs(child.parent, loaded)
+        parents.update(parent.id, {"email": "q@example.com"})
+        self.assertEqual({c.parent.email for c in repo.get_all()}, {"q@example.com"})
+        repo.close()
+        parents.close()
+
+    def test_a_reference_needs_its_repository(self):
+        repo = self.open()
+        with self.assertRaises(TypeError):
+            repo.add(Item("c@example.com", parent=Item("p@example.com")))
+        repo.close()
+
+    def test_writes_go_on_while_a_snapshot_is_written(self):
+        repo = self.open(snapshot_every=3)
+        release = threading.Event()
+        write_snapshot = repo._write_snapshot
+
+        def slow_snapshot(objs):
+            release.wait(5)
+            write_snapshot(objs)
+
+        items = [Item(f"{n}@example.com") for n in range(6)]
+        with mock.patch.object(repo, "_write_snapshot", slow_snapshot):
+            for item in items[:3]:
+                repo.add(item)
+            writer = threading.Thread(target=lambda: [repo.add(i) for i in items[3:]])
+            writer.start()
+            writer.join(2)
+            self.assertFalse(writer.is_alive())
+            self.assertTrue(os.path.exists(self.path + ".log.compacting"))
+            release.set()
+            repo.close()
+
+        repo = self.open()
+        self.assertEqual({i.id for i in repo.get_all()}, {i.id for i in items})
+        self.assertFalse(os.path.exists(self.path + ".log.compacting"))
+        repo.close()
+
+    def test_failed_compaction_is_raised_and_logged(self):
+        repo = self.open()
+        items = [Item(f"{n}@example.com") for n in range(2)]
+        for item in items:
+            repo.add(item)
+        with mock.patch.object(repo, "_write_snapshot", side_effect=OSError("disk full")):
+            with self.assertLogs("app.persistence.durable_repository", "ERROR"):
+                with self.assertRaises(OSError):
+                    repo.compact()
+        self.assertTrue(os.path.exists(self.path + ".log.compacting"))
+        repo.add(Item("2@example.com"))
+        repo.close()
+
+        # the log set aside is replayed, and compacted on startup
+        repo = self.open()
+        self.assertEqual(len(repo.get_all()), 3)
+        self.assertFalse(os.path.exists(self.path + ".log.compacting"))
+        repo.close()
+
+    def test_failed_compaction_is_retried(self):
+        repo = self.open(snapshot_every=2)
+        items = [Item(f"{n}@example.com", "o1") for n in range(4)]
+        with mock.patch.object(repo, "_write_snapshot", side_effect=OSError("disk full")):
+            with self.assertLogs("app.persistence.durable_repository", "ERROR"):
+                repo.add(items[0])
+                repo.add(items[1])
+                repo._wait_for_compaction()
+        repo.add(items[2])
+        repo.add(items[3])
+        repo._wait_for_compaction()
+        self.assertFalse(os.path.exists(self.path + ".log.compacting"))
+        repo.close()
+
+        repo = self.open()
+        self.assertEqual({i.id for i in repo.get_all()}, {i.id for i in items})
+        repo.close()
+
+    def test_logs_of_failed_compactions_are_replayed(self):
+        repo = self.open(snapshot_every=2)
+        items = [Item(f"{n}@example.com", "o1") for n in range(5)]
+        with mock.patch.object(repo, "_write_snapshot", side_effect=OSError("disk full")):
+            with self.assertLogs("app.persistence.durable_repository", "ERROR"):
+                for item in items[:4]:
+                    repo.add(item)
+                    repo._wait_for_compaction()
+        repo.add(items[4])
+        repo.close()
+
+        repo = self.open()
+        self.assertEqual({i.id for i in repo.get_all()}, {i.id for i in items})
+        self.assertFalse(os.path.exists(self.path + ".log.compacting"))
+        repo.close()
+
+    def test_torn_log_record_is_dropped(self):
+        repo = self.open()
+        kept = Item("a@example.com")
+        repo.add(kept)
+        repo.add(Item("b@example.com"))
+        repo.close()
+        with open(self.path + ".log", "r+b") as f:
+            f.truncate(os.path.getsize(self.path + ".log") - 5)
+
+        repo = self.open()
+        self.assertEqual([i.id for i in repo.get_all()], [kept.id])
+        repo.add(Item("c@example.com"))
+        repo.close()
+        repo = self.open()
+        self.assertEqual(len(repo.get_all()), 2)
+        repo.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,9 @@
 import unittest
+from unittest import mock
 from app import create_app
 import uuid
 from datetime import datetime, timedelta
+from app.services import facade
 
 
 class TestReservationEndpoints(unittest.TestCase):
@@ -94,3 +96,134 @@ class TestReservationEndpoints(unittest.TestCase):
         })
         self.assertEqual(response.status_code, 400)
         self.assertIn("error", response.get_json())
+
+
+class TestReservationAvailability(unittest.TestCase):
+    """ Overlapping bookings are rejected and free ranges follow the bookings """
+    def setUp(self):
+        self.app = create_app()
+        self.client = self.app.test_client()
+
+        owner = facade.create_user({
+            "first_name": "Ann", "last_name": "Lee", "email": f"ann.{uuid.uuid4().hex[:6]}@example.com",
+            "password": "password123", "phone_number": "+61412345678"
+        })
+        self.place_id = facade.create_place({
+            "owner_id": owner.id, "title": "Beach House", "description": "Two bedrooms", "price": 200.0,
+            "address": "1 Shore Rd",
+            "latitude": -33.9, "longitude": 151.2
+        }).id
+        self.user_id = str(uuid.uuid4())
+        self.day = (datetime.now() + timedelta(days=10)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+    def date(self, days):
+        return (self.day + timedelta(days=days)).isoformat()
+
+    def book(self, start, end):
+        return self.client.post('/api/v1/reservations/', json={
+            "user_id": self.user_id, "place_id": self.place_id,
+            "start_date": self.date(start), "end_date": self.date(end), "price": 400.0
+        })
+
+    def free(self, start, end):
+        response = self.client.get(f'/api/v1/places/{self.place_id}/availability',
+                                   query_string={"from": self.date(start), "to": self.date(end)})
+        self.assertEqual(response.status_code, 200)
+        return [(r["start"], r["end"]) for r in response.get_json()["free"]]
+
+    def test_overlapping_booking_is_rejected(self):
+        self.assertEqual(self.book(2, 5).status_code, 201)
+        self.assertEqual(self.book(4, 6).status_code, 409)
+        self.assertEqual(self.book(0, 3).status_code, 409)
+        # checking in on the day the previous stay checks out is fine
+        self.assertEqual(self.book(5, 7).status_code, 201)
+        self.assertEqual(self.book(0, 2).status_code, 201)
+
+    def test_free_ranges(self):
+        self.book(2, 4)
+        self.book(6, 8)
+        self.assertEqual(self.free(0, 10), [(self.date(0), self.date(2)), (self.date(4), self.date(6)),
+                                            (self.date(8), self.date(10))])
+        self.assertEqual(self.free(3, 7), [(self.date(4), self.date(6))])
+        self.assertEqual(self.free(2, 4), [])
+
+    def test_status_and_date_changes_update_the_index(self):
+        reservation_id = self.book(2, 4).get_json()["id"]
+        self.assertEqual(self.book(3, 5).status_code, 409)
+
+        response = self.client.put(f'/api/v1/reservations/{reservation_id}', json={"status": "cancelled"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.free(0, 6), [(self.date(0), self.date(6))])
+        other_id = self.book(3, 5).get_json()["id"]
+
+        # reopening it would overlap the new booking
+        response = self.client.put(f'/api/v1/reservations/{reservation_id}', json={"status": "pending"})
+        self.assertEqual(response.status_code, 409)
+
+        response = self.client.put(f'/api/v1/reservations/{other_id}', json={
+            "start_date": self.date(7), "end_date": self.date(9)
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.free(0, 10), [(self.date(0), self.date(7)), (self.date(9), self.date(10))])
+
+        self.client.put(f'/api/v1/reservations/{other_id}', json={"status": "completed"})
+        self.assertEqual(self.free(0, 10), [(self.date(0), self.date(10))])
+
+    def test_failed_create_leaves_no_booking(self):
+        with mock.patch.object(facade.reservation_service.reservation_repo, "add", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                facade.create_reservation({
+                    "user_id": self.user_id, "place_id": self.place_id,
+                    "start_date": self.date(2), "end_date": self.date(4), "price": 400.0
+                })
+        self.assertEqual(self.free(0, 6), [(self.date(0), self.date(6))])
+        self.assertEqual(self.book(2, 4).status_code, 201)
+
+    def test_invalid_update_changes_nothing(self):
+        reservation_id = self.book(2, 4).get_json()["id"]
+        # the new end date is set, then the new start date is in the past
+        response = self.client.put(f'/api/v1/reservations/{reservation_id}', json={
+            "end_date": self.date(6), "start_date": (datetime.now() - timedelta(days=1)).isoformat()
+        })
+        self.assertEqual(response.status_code, 400)
+
+        reservation = facade.get_reservation(reservation_id)
+        self.assertEqual((reservation.start_date.isoformat(), reservation.end_date.isoformat()),
+                         (self.date(2), self.date(4)))
+        self.assertEqual(self.free(0, 6), [(self.date(0), self.date(2)), (self.date(4), self.date(6))])
+
+    def available(self, start, end, **prices):
+        response = self.client.get('/api/v1/places/available',
+                                   query_string={"start": self.date(start), "end": self.date(end), **prices})
+        self.assertEqual(response.status_code, 200)
+        return {place["id"] for place in response.get_json()}
+
+    def test_search_available_places(self):
+        other_id = facade.create_place({
+            "owner_id": facade.get_place(self.place_id).owner_id, "title": "Cabin", "description": "Small",
+            "price": 90.0, "address": "2 Hill Rd", "latitude": -33.8, "longitude": 151.1
+        }).id
+        self.book(2, 4)
+
+        self.assertIn(self.place_id, self.available(0, 2))
+        self.assertNotIn(self.place_id, self.available(3, 5))
+        self.assertIn(other_id, self.available(3, 5))
+        # leaves on the day the stay starts, arrives on the day it ends
+        self.assertIn(self.place_id, self.available(4, 6))
+
+        found = self.available(0, 2, min_price=100, max_price=300)
+        self.assertIn(self.place_id, found)
+        self.assertNotIn(other_id, found)
+
+        response = self.client.get('/api/v1/places/available', query_string={"start": self.date(0)})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get('/api/v1/places/available',
+                                   query_string={"start": self.date(3), "end": self.date(1)})
+        self.assertEqual(response.status_code, 400)
+
+    def test_availability_errors(self):
+        response = self.client.get(f'/api/v1/places/{self.place_id}/availability')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(f'/api/v1/places/{uuid.uuid4()}/availability',
+                                   query_string={"from": self.date(0), "to": self.date(1)})
+        self.assertEqual(response.status_code, 404)
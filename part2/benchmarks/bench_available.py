@@ -0,0 +1,110 @@
+"""
+Date-range search across all places with the occupancy bitmaps of
+AvailabilityIndex.
+
+Run from part2:
+    python -m benchmarks.bench_available --places 100000
+
+--places places get --stays non-overlapping stays each, spread over the
+next year, in an AvailabilityIndex and a ConcurrentInMemoryRepository
+of places. For stays of --nights nights, the search does what
+GET /api/v1/places/available does: booked_places() for the range, then
+the places outside it, with and without a price filter. It is compared
+with asking the index about each place's stays one by one (is_free()).
+"""
+import argparse
+import random
+import time
+import uuid
+from datetime import date, datetime, timedelta
+
+from app.persistence.availability_index import AvailabilityIndex
+from app.persistence.concurrent_repository import ConcurrentInMemoryRepository
+
+
+class Place:
+    __slots__ = ("id", "price")
+
+    def __init__(self, price):
+        self.id = str(uuid.uuid4())
+        self.price = price
+
+
+def search(index, places, first, last, min_price=None, max_price=None):
+    booked = index.booked_places(first, last)
+    found = places.get_all()
+    if min_price is not None:
+        found = [p for p in found if p.price >= min_price]
+    if max_price is not None:
+        found = [p for p in found if p.price <= max_price]
+    return [p for p in found if p.id not in booked]
+
+
+def per_call_ms(fn, ranges):
+    start = time.perf_counter()
+    for first, last in ranges:
+        fn(first, last)
+    return (time.perf_counter() - start) / len(ranges) * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--places", type=int, default=100_000)
+    parser.add_argument("--stays", type=int, default=10, help="stays per place")
+    parser.add_argument("--searches", type=int, default=50)
+    parser.add_argument("--scan-searches", type=int, default=3, help="searches timed with is_free()")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    today = date.today()
+    midnight = datetime.combine(today, datetime.min.time())
+    index = AvailabilityIndex()
+    places = ConcurrentInMemoryRepository()
+
+    start = time.perf_counter()
+    n = 0
+    for _ in range(args.places):
+        place = Place(rng.randrange(20, 500))
+        places.add(place)
+        # one stay of 1-7 nights in each stretch of the year
+        stretch = 365 // args.stays
+        for s in range(args.stays):
+            first = s * stretch + rng.randrange(stretch - 7)
+            index.add(str(n), place.id, midnight + timedelta(days=first, hours=15),
+                      midnight + timedelta(days=first + rng.randint(1, 7), hours=11))
+            n += 1
+    load = time.perf_counter() - start
+
+    def ranges(nights, count):
+        out = []
+        for _ in range(count):
+            first = today + timedelta(days=rng.randrange(365 - nights))
+            out.append((first, first + timedelta(days=nights)))
+        return out
+
+    def scan(first, last):
+        start = datetime.combine(first, datetime.min.time())
+        end = datetime.combine(last, datetime.min.time())
+        return [p for p in places.get_all() if index.is_free(p.id, start, end)]
+
+    print(f"\n{args.places:,} places, {n:,} stays, loaded in {load:.2f} s")
+    print(f"{'search':<34}{'bitmap ms':>11}{'is_free ms':>12}{'found':>9}")
+    for nights in (7, 30):
+        timed = ranges(nights, args.searches)
+        first, last = timed[0]
+        found = len(search(index, places, first, last))
+        bitmap = per_call_ms(lambda a, b: search(index, places, a, b), timed)
+        slow = per_call_ms(scan, timed[:args.scan_searches])
+        print(f"{f'{nights} nights':<34}{bitmap:>11.1f}{slow:>12.0f}{found:>9,}")
+
+        priced = per_call_ms(lambda a, b: search(index, places, a, b, 100, 200), timed)
+        found = len(search(index, places, first, last, 100, 200))
+        print(f"{f'{nights} nights, price 100-200':<34}{priced:>11.1f}{'':>12}{found:>9,}")
+
+    first, last = ranges(7, 1)[0]
+    only_bits = per_call_ms(lambda a, b: index.booked_places(a, b), [(first, last)] * args.searches)
+    print(f"booked_places() alone, 7 nights: {only_bits:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
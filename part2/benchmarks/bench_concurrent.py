@@ -0,0 +1,169 @@
+"""
+Multi-threaded stress test of the repositories.
+
+Run from part2:
+    python -m benchmarks.bench_concurrent --threads 1 2 4 8 --seconds 3
+
+Each thread runs a mix of operations against one shared repository of
+--objects users (email unique, owner_id indexed) for --seconds. The
+request mix is 60% get(), 20% filter_by(owner_id), 14% update(),
+5% delete() + add() and 1% get_all(); the read-mostly mix is 55% get(),
+30% filter_by(owner_id), 14% get_all() and 1% update().
+ConcurrentInMemoryRepository (striped write locks, lock-free reads over
+versioned snapshots) is compared with the plain InMemoryRepository
+behind one lock, the simplest way to make it safe. Operations per
+second are reported per thread count, and the repository's indexes are
+checked against its contents afterwards.
+
+This is not a scaling benchmark: every operation is pure Python under
+the GIL, so total throughput stays flat however many threads run, for
+both repositories, on any number of cores. What it shows is that the
+striped repository stays consistent under concurrent writes, what its
+locking costs against one lock, and what the cached snapshots save on
+reads. On one CPU, 20,000 objects, 1-8 threads:
+
+    request mix      striped / single lock  0.82-0.97 (extra locking per write)
+    read-mostly mix  striped / single lock  1.44-1.54 (get_all() reuses the snapshot)
+"""
+import argparse
+import os
+import random
+import threading
+import time
+
+from app.models.base_model import BaseModel
+from app.persistence.concurrent_repository import ConcurrentInMemoryRepository
+from app.persistence.repository import InMemoryRepository
+
+
+class Record(BaseModel):
+    def __init__(self, n, owners):
+        super().__init__()
+        self.email = f"user{n}@example.com"
+        self.owner_id = f"owner{n % owners}"
+
+
+class LockedRepository(InMemoryRepository):
+    """InMemoryRepository with every call behind one lock"""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # reentrant: update() calls get()
+        self._lock = threading.RLock()
+
+    def add(self, obj):
+        with self._lock:
+            super().add(obj)
+
+    def get(self, obj_id):
+        with self._lock:
+            return super().get(obj_id)
+
+    def get_all(self):
+        with self._lock:
+            return super().get_all()
+
+    def update(self, obj_id, data):
+        with self._lock:
+            super().update(obj_id, data)
+
+    def delete(self, obj_id):
+        with self._lock:
+            super().delete(obj_id)
+
+    def get_by_attribute(self, attr_name, attr_value):
+        with self._lock:
+            return super().get_by_attribute(attr_name, attr_value)
+
+    def filter_by(self, **criteria):
+        with self._lock:
+            return super().filter_by(**criteria)
+
+
+# share of each operation, per mix
+MIXES = {
+    "request": {"get": 0.60, "filter_by": 0.20, "update": 0.14, "replace": 0.05, "get_all": 0.01},
+    "read-mostly": {"get": 0.55, "filter_by": 0.30, "get_all": 0.14, "update": 0.01},
+}
+
+
+def run(repo_class, threads, args):
+    repo = repo_class(unique=("email",), indexes=("owner_id",))
+    records = [Record(n, args.owners) for n in range(args.objects)]
+    for record in records:
+        repo.add(record)
+    ids = [r.id for r in records]
+    next_n = [args.objects]
+    n_lock = threading.Lock()
+    counts = [0] * threads
+    errors = []
+    stop = threading.Event()
+
+    ops, weights = zip(*MIXES[args.mix].items())
+
+    def worker(t):
+        rng = random.Random(t)
+        done = 0
+        try:
+            while not stop.is_set():
+                op = rng.choices(ops, weights)[0]
+                if op == "get":
+                    repo.get(rng.choice(ids))
+                elif op == "filter_by":
+                    repo.filter_by(owner_id=f"owner{rng.randrange(args.owners)}")
+                elif op == "update":
+                    repo.update(rng.choice(ids), {"owner_id": f"owner{rng.randrange(args.owners)}"})
+                elif op == "replace":
+                    # each thread replaces only its own slots
+                    i = rng.randrange(t, len(ids), threads)
+                    repo.delete(ids[i])
+                    with n_lock:
+                        n = next_n[0]
+                        next_n[0] += 1
+                    record = Record(n, args.owners)
+                    repo.add(record)
+                    ids[i] = record.id
+                else:
+                    repo.get_all()
+                done += 1
+        except Exception as e:
+            errors.append(repr(e))
+        counts[t] = done
+
+    workers = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+
+    # every stored object indexed under its current owner, and nothing else
+    stored = {obj.id: obj for obj in repo.get_all()}
+    by_owner = sum(len(repo.filter_by(owner_id=f"owner{o}")) for o in range(args.owners))
+    consistent = (by_owner == len(stored) == args.objects and
+                  all(repo.get_by_attribute("email", obj.email) is obj for obj in stored.values()))
+    return sum(counts) / elapsed, errors, consistent
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--seconds", type=float, default=3)
+    parser.add_argument("--objects", type=int, default=20_000)
+    parser.add_argument("--owners", type=int, default=2_000)
+    parser.add_argument("--mix", choices=MIXES, default="request")
+    args = parser.parse_args()
+
+    print(f"\n{args.objects:,} objects, {args.mix} mix, {args.seconds:g}s per run, {os.cpu_count()} CPUs")
+    print(f"{'threads':>8}{'single lock ops/s':>20}{'striped ops/s':>16}{'ratio':>8}  consistent / errors")
+    for threads in args.threads:
+        locked, locked_errors, locked_ok = run(LockedRepository, threads, args)
+        striped, striped_errors, striped_ok = run(ConcurrentInMemoryRepository, threads, args)
+        print(f"{threads:>8}{locked:>20,.0f}{striped:>16,.0f}{striped / locked:>8.2f}  "
+              f"{locked_ok}/{striped_ok} {len(locked_errors)}/{len(striped_errors)}")
+
+
+if __name__ == "__main__":
+    main()
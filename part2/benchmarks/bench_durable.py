@@ -0,0 +1,88 @@
+"""
+Startup time of DurableRepository.
+
+Run from part2:
+    python -m benchmarks.bench_durable --objects 1000000 --tail 100000
+
+--objects users are written through a DurableRepository indexed by
+email, then compacted into a snapshot, and --tail more are appended to
+the log after it. Startup (reopening the repository) is timed for
+the snapshot alone, for the snapshot plus the log tail, and for
+replaying the same objects from the log only. Write throughput with
+batched fsync is reported too.
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from app.models.user import User
+from app.persistence.durable_repository import DurableRepository
+
+
+def make_users(count, offset=0):
+    return [User(first_name="Bench", last_name="User", email=f"user{n}@example.com",
+                 password="password123", phone_number="+61412345678")
+            for n in range(offset, offset + count)]
+
+
+def open_repo(path, **options):
+    start = time.perf_counter()
+    repo = DurableRepository(path, unique=("email",), **options)
+    return repo, time.perf_counter() - start
+
+
+def size_mb(path):
+    return os.path.getsize(path) / 1e6 if os.path.exists(path) else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--objects", type=int, default=1_000_000)
+    parser.add_argument("--tail", type=int, default=100_000, help="log records after the snapshot")
+    parser.add_argument("--fsync-every", type=int, default=100)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    try:
+        users = make_users(args.objects)
+        tail = make_users(args.tail, offset=args.objects)
+        # never compact on its own, so the log-only case can be measured
+        options = dict(fsync_every=args.fsync_every, snapshot_every=10 ** 12)
+
+        log_path = os.path.join(tmp, "log_only")
+        repo, _ = open_repo(log_path, **options)
+        start = time.perf_counter()
+        for user in users:
+            repo.add(user)
+        repo.close()
+        write_s = time.perf_counter() - start
+
+        repo, replay_s = open_repo(log_path, **options)
+        assert len(repo.get_all()) == args.objects
+        start = time.perf_counter()
+        repo.compact()
+        snapshot_write_s = time.perf_counter() - start
+        repo.close()
+
+        repo, snapshot_s = open_repo(log_path, **options)
+        for user in tail:
+            repo.add(user)
+        repo.close()
+        repo, tail_s = open_repo(log_path, **options)
+        assert len(repo.get_all()) == args.objects + args.tail
+        repo.close()
+
+        print(f"\n{args.objects:,} users, email index, fsync every {args.fsync_every} records")
+        print(f"writes: {args.objects / write_s:,.0f}/s ({write_s:.1f} s)")
+        print(f"snapshot: {snapshot_write_s:.2f} s to write, {size_mb(log_path + '.snapshot'):.0f} MB")
+        print(f"startup, log replay only ({args.objects:,} records):        {replay_s:.2f} s")
+        print(f"startup, snapshot only:                                  {snapshot_s:.2f} s")
+        print(f"startup, snapshot + log tail ({args.tail:,} records):      {tail_s:.2f} s")
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+InMemoryRepository lookups with and without secondary indexes.
+
+Run from part2:
+    python -m benchmarks.bench_repository --objects 1000000
+
+--objects records with an email and an owner_id (--owners distinct
+values) are loaded the way UserService.create_user does it: an email
+lookup for uniqueness, then add(). The indexed repository does that for
+all of them; the unindexed one is only loaded with --scan-load objects,
+since every check scans what is already stored (quadratic). Then
+get_by_attribute('email') and filter_by(owner_id=...) are timed on the
+full data set, against an unindexed repository holding the same
+objects.
+"""
+import argparse
+import random
+import time
+import uuid
+
+from app.persistence.repository import InMemoryRepository
+
+
+class Record:
+    __slots__ = ("id", "email", "owner_id")
+
+    def __init__(self, n, owners):
+        self.id = str(uuid.uuid4())
+        self.email = f"user{n}@example.com"
+        self.owner_id = f"owner{n % owners}"
+
+
+def load(repo, records):
+    start = time.perf_counter()
+    for record in records:
+        if repo.get_by_attribute("email", record.email) is not None:
+            raise ValueError("duplicate email")
+        repo.add(record)
+    return time.perf_counter() - start
+
+
+def per_call_us(fn, args):
+    start = time.perf_counter()
+    for a in args:
+        fn(a)
+    return (time.perf_counter() - start) / len(args) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--objects", type=int, default=1_000_000)
+    parser.add_argument("--owners", type=int, default=100_000)
+    parser.add_argument("--scan-load", type=int, default=20_000, help="objects loaded into the unindexed repository")
+    parser.add_argument("--lookups", type=int, default=10_000)
+    parser.add_argument("--scan-lookups", type=int, default=20, help="lookups timed on the unindexed repository")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    records = [Record(n, args.owners) for n in range(args.objects)]
+
+    indexed = InMemoryRepository(unique=("email",), indexes=("owner_id",))
+    indexed_load = load(indexed, records)
+    scan_load = load(InMemoryRepository(), records[:args.scan_load])
+
+    # same objects, no indexes, for the lookups
+    plain = InMemoryRepository()
+    for record in records:
+        plain.add(record)
+
+    emails = [f"user{rng.randrange(args.objects)}@example.com" for _ in range(args.lookups)]
+    owners = [f"owner{rng.randrange(args.owners)}" for _ in range(args.lookups)]
+    rows = [
+        ("get_by_attribute(email)",
+         per_call_us(lambda e: indexed.get_by_attribute("email", e), emails),
+         per_call_us(lambda e: plain.get_by_attribute("email", e), emails[:args.scan_lookups])),
+        ("filter_by(owner_id)",
+         per_call_us(lambda o: indexed.filter_by(owner_id=o), owners),
+         per_call_us(lambda o: plain.filter_by(owner_id=o), owners[:args.scan_lookups])),
+    ]
+
+    print(f"\n{args.objects:,} objects, {args.owners:,} owners")
+    print(f"load with uniqueness check: indexed {indexed_load:.2f} s for {args.objects:,} "
+          f"({indexed_load / args.objects * 1e6:.2f} us each), "
+          f"unindexed {scan_load:.2f} s for {args.scan_load:,} ({scan_load / args.scan_load * 1e6:.0f} us each)")
+    print(f"{'lookup':<26}{'indexed us':>12}{'scan us':>14}{'speedup':>10}")
+    for name, fast, slow in rows:
+        print(f"{name:<26}{fast:>12.2f}{slow:>14.0f}{slow / fast:>9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
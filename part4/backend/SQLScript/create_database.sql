@@ -28,6 +28,11 @@ CREATE TABLE IF NOT EXISTS places (
     price DECIMAL(10, 2) NOT NULL,
     latitude FLOAT NOT NULL,
     longitude FLOAT  NOT NULL,
+    -- geohash cell of (latitude, longitude) for nearby search
+    geohash VARCHAR(12) NULL,
+    -- running rating totals, maintained on review writes
+    rating_sum INT NOT NULL DEFAULT 0,
+    rating_count INT NOT NULL DEFAULT 0,
     owner_id CHAR(36) NOT NULL,
     -- if user is deleted, all places referecing the user will be deleted
     CONSTRAINT places_fk FOREIGN KEY (owner_id) REFERENCES users(id) ON DELETE CASCADE
@@ -74,6 +79,20 @@ CREATE TABLE IF NOT EXISTS place_amenity (
 );
 
 
+-- ==========================
+-- Indexes:
+-- ==========================
+-- Match the indexes declared on the SQLAlchemy models
+-- (existing databases get them with `flask db-upgrade`)
+CREATE INDEX ix_places_owner_id ON places (owner_id);
+CREATE INDEX ix_places_price ON places (price);
+CREATE INDEX ix_places_latitude_longitude ON places (latitude, longitude);
+CREATE INDEX ix_places_geohash ON places (geohash);
+-- reviews by place and the one-review-per-user check
+CREATE INDEX ix_reviews_place_id_user_id ON reviews (place_id, user_id);
+-- places having an amenity (search filter)
+CREATE INDEX ix_place_amenity_amenity_id ON place_amenity (amenity_id);
+
 -- ==========================
 -- Administrator User: 
 -- ==========================
@@ -23,6 +23,27 @@ def create_app(config_class="config.DevelopmentConfig"):
     jwt.init_app(app)
     db.init_app(app)
 
+    # before anything opens a connection
+    from app.persistence.sqlite_pragmas import sqlite_pragmas
+    sqlite_pragmas.init_app(app)
+
+    # forked server workers get their own connection pools
+    from app.utils import fork_safety
+    with app.app_context():
+        fork_safety.track_engines(db.engines.values())
+
+    from app.persistence.cache import repository_cache
+    repository_cache.init_app(app)
+
+    from app.persistence.query_stats import query_stats
+    query_stats.init_app(app)
+
+    from app.utils.passwords import password_hasher
+    password_hasher.init_app(app)
+
+    from app.utils.rate_limit import login_limiter
+    login_limiter.init_app(app)
+
     # ========================
     #   FRONT-END ROUTES
     # ========================
@@ -56,6 +77,12 @@ def create_app(config_class="config.DevelopmentConfig"):
     
     api = Api(app, version='1.0', title='HBnB API', description='HBnB Application API', doc='/api/v1/')
 
+    from app.utils.passwords import PasswordHasherBusy
+
+    @api.errorhandler(PasswordHasherBusy)
+    def password_hasher_busy(error):
+        return {'error': str(error)}, 503, {'Retry-After': '1'}
+
     # Import namespaces after app and db are initialized
     from app.api.v1.users import api as users_ns
     from app.api.v1.amenities import api as amenities_ns
@@ -86,5 +113,11 @@ def create_app(config_class="config.DevelopmentConfig"):
     # Admin namespace
     api.add_namespace(admin_ns, path="/api/v1")
 
+    # =======================
+    # CLI COMMANDS
+    # =======================
+    from app.commands import register_commands
+    register_commands(app)
+
                       
     return app
\ No newline at end of file
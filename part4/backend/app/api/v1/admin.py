@@ -1,7 +1,10 @@
 from flask_restx import Namespace, Resource, fields
-from flask_jwt_extended import jwt_required, get_jwt
-from flask import request
+from flask_jwt_extended import jwt_required
+from flask import Response, current_app, request, stream_with_context
+from datetime import datetime, timedelta, timezone
 from app.services import facade
+from app.utils.current_user import current_user
+from app.utils.export import FORMATS
 
 api = Namespace('admin', description='Admin operations')
 
@@ -58,9 +61,7 @@ class AdminUserCreate(Resource):
     @api.response(400, 'Invalid password')
     @jwt_required()
     def post(self):
-        # current_user = get_jwt()
-        claims = get_jwt()
-        if not claims.get('is_admin'):
+        if not current_user.is_admin:
             return {'error': 'Admin privileges required'}, 403
 
         user_data = api.payload
@@ -92,10 +93,7 @@ class AdminUserResource(Resource):
     @api.response(404, 'Invalid input')
     @jwt_required()
     def put(self, user_id):
-        current_user = get_jwt()
-        
-        # If 'is_admin' is part of the identity payload
-        if not current_user.get('is_admin'):
+        if not current_user.is_admin:
             return {'error': 'Admin privileges required'}, 403
 
         data = request.json
@@ -127,8 +125,7 @@ class AdminAmenityCreate(Resource):
     @api.response(403, 'Unauthorized action')
     @jwt_required()
     def post(self):
-        current_user = get_jwt()
-        if not current_user.get('is_admin'):
+        if not current_user.is_admin:
             return {'error': 'Admin privileges required'}, 403
 
         # Logic to create a new amenity
@@ -151,8 +148,7 @@ class AdminAmenityModify(Resource):
     @api.response(403, 'Unauthorized action')
     @jwt_required()
     def put(self, amenity_id):
-        current_user = get_jwt()
-        if not current_user.get('is_admin'):
+        if not current_user.is_admin:
             return {'error': 'Admin privileges required'}, 403
 
         # Logic to update an amenity
@@ -180,8 +176,7 @@ class AdminAmenityDelete(Resource):
     @api.response(404, 'Amenity not found')
     def delete(self, amenity_id):
         try:
-            claims = get_jwt()
-            if not claims.get('is_admin'):
+            if not current_user.is_admin:
                 raise PermissionError('Admin privileges required')
             amenity = facade.get_amenity(amenity_id)
             if not amenity:
@@ -193,4 +188,78 @@ class AdminAmenityDelete(Resource):
             if error_message.startswith('403'):
                 return {'error': error_message}, 403    
             if error_message.startswith('404'):
-                return {'error': error_message}, 404
\ No newline at end of file
+                return {'error': error_message}, 404
+
+
+# Repository cache counters
+@api.route('/cache/stats')
+class AdminCacheStats(Resource):
+    @api.response(200, 'Cache statistics retrieved successfully')
+    @api.response(403, 'Admin privileges required')
+    @jwt_required()
+    def get(self):
+        if not current_user.is_admin:
+            return {'error': 'Admin privileges required'}, 403
+        return facade.get_cache_stats(), 200
+
+
+# Login rate limiter counters
+@api.route('/ratelimit/stats')
+class AdminRateLimitStats(Resource):
+    @api.response(200, 'Rate limiter statistics retrieved successfully')
+    @api.response(403, 'Admin privileges required')
+    @jwt_required()
+    def get(self):
+        if not current_user.is_admin:
+            return {'error': 'Admin privileges required'}, 403
+        return facade.get_rate_limit_stats(), 200
+
+
+# Streamed table exports for analytics jobs
+@api.route('/export/<string:name>')
+class AdminExport(Resource):
+    @api.response(200, 'Rows streamed as NDJSON or CSV')
+    @api.response(400, 'Invalid format, since or batch_size')
+    @api.response(403, 'Admin privileges required')
+    @api.response(404, 'Unknown export')
+    @api.param('format', 'ndjson (default) or csv')
+    @api.param('since', 'ISO timestamp: only rows with updated_at >= since')
+    @api.param('batch_size', 'Rows fetched per round trip (default EXPORT_BATCH_SIZE)')
+    @api.doc(description="Export places, reviews or users. Pass the X-Export-Watermark "
+                         "header of one export as since of the next to get only the changes. "
+                         "Consecutive exports overlap by EXPORT_WATERMARK_OVERLAP seconds so that "
+                         "late commits are not missed: dedupe rows by id and updated_at.")
+    @jwt_required()
+    def get(self, name):
+        """ Stream every row of a table """
+        if not current_user.is_admin:
+            return {'error': 'Admin privileges required'}, 403
+
+        export_format = request.args.get('format', 'ndjson')
+        if export_format not in FORMATS:
+            return {'error': f"format must be one of {', '.join(FORMATS)}"}, 400
+        since = request.args.get('since')
+        try:
+            since = datetime.fromisoformat(since) if since else None
+        except ValueError:
+            return {'error': 'since must be an ISO 8601 timestamp'}, 400
+        if since is not None and since.tzinfo is not None:
+            # updated_at is stored as naive UTC
+            since = since.astimezone(timezone.utc).replace(tzinfo=None)
+        batch_size = request.args.get('batch_size', current_app.config.get('EXPORT_BATCH_SIZE', 1000), type=int)
+
+        overlap = timedelta(seconds=current_app.config.get('EXPORT_WATERMARK_OVERLAP', 300))
+        try:
+            columns, watermark, batches = facade.export_rows(name, since, batch_size, overlap)
+        except ValueError as e:
+            error_message = str(e)
+            if error_message.startswith('404'):
+                return {'error': error_message}, 404
+            return {'error': error_message}, 400
+
+        mimetype, encode = FORMATS[export_format]
+        response = Response(stream_with_context(encode(columns, batches)), mimetype=mimetype)
+        response.headers['Content-Disposition'] = f'attachment; filename="{name}.{export_format}"'
+        response.headers['X-Export-Watermark'] = watermark.isoformat()
+        return response
+
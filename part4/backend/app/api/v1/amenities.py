@@ -1,6 +1,7 @@
 from flask_restx import Namespace, Resource, fields
 # from app.services.facade import HBnBFacade
 from app.services import facade # shared singleton
+from app.utils.etag import make_etag, not_modified, etag_headers
 
 # Define Namepsace for amenities operations
 api = Namespace('amenities', description='Amenity operations')
@@ -18,12 +19,18 @@ amenity_model = api.model('Amenity', {
 @api.route('/')
 class AmenityList(Resource):
     @api.response(200, 'List of amenities retrieved successfully')
+    @api.response(304, 'Not modified since the ETag in If-None-Match')
     @api.response(404, 'Amenities not found')
     def get(self):
         """ Retrieve a list of all amenities """
+        etag = make_etag('amenities', facade.get_amenities_version())
+        response = not_modified(etag)
+        if response is not None:
+            return response
+
         try:
             all_amenities = facade.get_all_amenities()
-            return [{'id': amenity.id, 'name': amenity.name, 'description': amenity.description} for amenity in all_amenities], 200
+            return [{'id': amenity.id, 'name': amenity.name, 'description': amenity.description} for amenity in all_amenities], 200, etag_headers(etag)
         except ValueError as e:
             return {'error': str(e)}, 404
             
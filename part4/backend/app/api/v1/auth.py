@@ -1,7 +1,10 @@
+from flask import request
 from flask_restx import Namespace, Resource, fields
 from flask_jwt_extended import create_access_token
 from app.services import facade
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from app.utils.rate_limit import login_limiter
+from app.utils.current_user import current_user
+from flask_jwt_extended import jwt_required
 from flask_cors import cross_origin
 
 api = Namespace('auth', description='Authentication operations')
@@ -15,16 +18,21 @@ login_model = api.model('Login', {
 @api.route('/login')
 class Login(Resource):
     @api.expect(login_model)
+    @api.response(429, 'Too many login attempts from this address or for this email')
     @cross_origin()
     def post(self):
         """Authenticate user and return a JWT token"""
         credentials = api.payload  # Get the email and password from the request payload
+
+        # Step 0: Token buckets per IP and per email, before any lookup or bcrypt work
+        retry_after = login_limiter.check(request.remote_addr, credentials.get('email'))
+        if retry_after is not None:
+            return {'error': 'Too many login attempts, try again later'}, 429, {'Retry-After': str(retry_after)}
         
-        # Step 1: Retrieve the user based on the provided email
-        user = facade.get_user_by_email(credentials['email'])
-        
-        # Step 2: Check if the user exists and the password is correct
-        if not user or not user.verify_password(credentials['password']):
+        # Step 1 & 2: Retrieve the user by email and check the password
+        # (hashed off the request thread, upgraded if below the current cost)
+        user = facade.authenticate(credentials['email'], credentials['password'])
+        if not user:
             return {'error': 'Invalid credentials'}, 401
 
         # Step 3: Create a JWT token with the user's id and is_admin flag
@@ -41,10 +49,5 @@ class ProtectedResource(Resource):
     @jwt_required()
     def get(self):
          """A protected endpoint that requires a valid JWT token"""
-         print("jwt------")
-         print(get_jwt_identity())
-         current_user = get_jwt_identity() # Retrieve the user's identity from the token
-         #if you need to see if the user is an admin or not, you can access additional claims using get_jwt() :
-         # addtional claims = get_jwt()
-         #additional claims["is_admin"] -> True or False
-         return {'message': f'Hello, user {current_user}'}, 200
\ No newline at end of file
+         # id and is_admin come from the token claims, no database lookup
+         return {'message': f'Hello, user {current_user.id}'}, 200
\ No newline at end of file
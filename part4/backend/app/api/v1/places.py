@@ -1,6 +1,13 @@
+import io
+import json
+import math
+from flask import current_app, request
 from flask_restx import Namespace, Resource, fields
 from app.services import facade
-from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
+from app.services.place_service import MAX_PAGE_SIZE
+from app.utils.etag import make_etag, not_modified, etag_headers
+from app.utils.current_user import current_user
+from flask_jwt_extended import jwt_required
 
 api = Namespace('places', description='Place operations')
 
@@ -28,6 +35,10 @@ place_update_model = api.model('PlaceUpdate', {
     'amenity_ids': fields.List(fields.String, required=False),
 })
 
+place_amenities_model = api.model('PlaceAmenities', {
+    'amenity_ids': fields.List(fields.String, required=True, description='Amenity ids to add'),
+})
+
 # Place response model
 place_response = api.model('Place', {
     'id':          fields.String,
@@ -40,11 +51,19 @@ place_response = api.model('Place', {
     'longitude':   fields.Float,
     'image_url':   fields.String,
     'amenity_ids': fields.List(fields.String),
-    "average_rating": fields.Float
+    "average_rating": fields.Float,
+    "review_count": fields.Integer
 })
 
+MAX_RATING_IDS = 500
+
 # ============== Response enrichment helper function（using SQLAlchemy relationships） ==============
-def _enrich_place_with_amenities(place, facade=facade):
+def _enrich_place_with_amenities(place, average_rating=None, review_count=None, facade=facade):
+    # Listings pass the rating summary from the joined aggregate,
+    # single places look it up
+    if review_count is None:
+        average_rating, review_count = facade.get_rating_summaries([place.id])[place.id]
+
     # Use relationship to get amenities directly
     amenities = []
     for amenity in place.amenities:
@@ -80,6 +99,8 @@ def _enrich_place_with_amenities(place, facade=facade):
         'amenity_ids': amenity_ids,
         'amenities': amenities,
         'owner': owner,
+        'average_rating': average_rating,
+        'review_count': review_count,
     }
 
 # === Place Endpoints (remove marshal_with, directly jsonify data) ===
@@ -91,11 +112,9 @@ class PlaceList(Resource):
     @api.response(403, 'Unauthorised action')
     @jwt_required()
     def post(self):
-        current_user = get_jwt_identity()
-        # place_data["owner_id"] = current_user
         try:
             place_data = api.payload
-            place_data["owner_id"] = current_user
+            place_data["owner_id"] = current_user.id
             place = facade.create_place(place_data)
             return {
                 'result': _enrich_place_with_amenities(place),
@@ -105,33 +124,212 @@ class PlaceList(Resource):
             return {'error': str(e)}, 400
 
     @api.response(200, 'List of all places retrieved successfully')
+    @api.response(304, 'Not modified since the ETag in If-None-Match')
+    @api.response(400, 'Invalid limit or cursor')
     @api.response(404, 'No places found')
+    @api.param('limit', 'Page size (max 100); omit to get every place')
+    @api.param('after', 'next_cursor from the previous page')
     def get(self):
+        limit = request.args.get('limit', type=int)
+        after = request.args.get('after')
+        if 'limit' in request.args and limit is None:
+            return {'error': 'limit must be a positive integer'}, 400
+
+        etag = make_etag('places', facade.get_places_version(), limit, after)
+        response = not_modified(etag)
+        if response is not None:
+            return response
+
         try:
-            places = facade.list_places()
-            enriched = [_enrich_place_with_amenities(p) for p in places]
+            rows, next_cursor = facade.list_places(limit, after)
+            enriched = [
+                _enrich_place_with_amenities(place, average_rating, review_count)
+                for place, average_rating, review_count in rows
+            ]
             return {
                 'result': enriched,
+                'next_cursor': next_cursor,
                 'message': 'List of all places retrieved successfully.'
-            }, 200
+            }, 200, etag_headers(etag)
         except ValueError as e:
-            return {'error': str(e)}, 404
+            error_message = str(e)
+            if error_message.startswith('400'):
+                return {'error': error_message}, 400
+            return {'error': error_message}, 404
+
+def _read_bulk_rows():
+    """
+    Yield (row_number, data) from an NDJSON body (one object per line,
+    read as it streams in) or a JSON array. Unparsable lines are yielded
+    as the exception so they end up in the error report.
+    """
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        for number, line in enumerate(io.BufferedReader(request.stream, 1 << 16), 1):
+            if not line.strip():
+                continue
+            try:
+                yield number, json.loads(line)
+            except ValueError as e:
+                yield number, e
+        return
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, list):
+        raise ValueError('400: Body must be a JSON array or NDJSON')
+    yield from enumerate(data, 1)
+
+@api.route('/bulk')
+class PlaceBulkImport(Resource):
+    @api.response(201, 'Places imported, see errors for rejected rows')
+    @api.response(400, 'Invalid body or no row could be imported')
+    @api.response(403, 'Admin privileges required')
+    @api.param('chunk_size', 'Rows per batched insert (default BULK_IMPORT_CHUNK_SIZE)')
+    @api.doc(description="Import places from a JSON array or NDJSON (application/x-ndjson). "
+                         "Each row takes the PlaceCreate fields, owner_id included.")
+    @jwt_required()
+    def post(self):
+        """ Bulk import places (admin) """
+        if not current_user.is_admin:
+            return {'error': 'Admin privileges required'}, 403
+
+        chunk_size = request.args.get('chunk_size', current_app.config.get('BULK_IMPORT_CHUNK_SIZE', 1000), type=int)
+        try:
+            report = facade.bulk_import_places(_read_bulk_rows(), chunk_size)
+        except ValueError as e:
+            return {'error': str(e)}, 400
+
+        created, errors = report['created'], report['errors']
+        return {
+            'created': len(created),
+            'failed': len(errors),
+            'ids': [{'row': row, 'id': place_id} for row, place_id in created],
+            'errors': [{'row': row, 'error': message} for row, message in errors],
+            'message': f'{len(created)} places imported, {len(errors)} rows rejected.'
+        }, 201 if created else 400
+
+@api.route('/nearby')
+class PlaceNearby(Resource):
+    @api.response(200, 'Nearby places retrieved successfully')
+    @api.response(400, 'Invalid coordinates, radius or limit')
+    @api.param('lat', 'Latitude (-90..90)')
+    @api.param('lon', 'Longitude (-180..180)')
+    @api.param('radius_km', 'Search radius in km (default 10)')
+    @api.param('limit', 'Maximum number of places (default 20, max 100)')
+    def get(self):
+        """ Places within radius_km of a point, nearest first """
+        latitude = request.args.get('lat', type=float)
+        longitude = request.args.get('lon', type=float)
+        radius_km = request.args.get('radius_km', default=10.0, type=float)
+        limit = request.args.get('limit', default=20, type=int)
+        if latitude is None or longitude is None:
+            return {'error': 'lat and lon are required numbers'}, 400
+
+        try:
+            rows = facade.get_places_nearby(latitude, longitude, radius_km, limit)
+        except ValueError as e:
+            return {'error': str(e)}, 400
+
+        ratings = facade.get_rating_summaries([place.id for place, _ in rows])
+        result = []
+        for place, distance_km in rows:
+            enriched = _enrich_place_with_amenities(place, *ratings[place.id])
+            enriched['distance_km'] = distance_km
+            result.append(enriched)
+        return {
+            'result': result,
+            'message': 'Nearby places retrieved successfully.'
+        }, 200
+
+@api.route('/search')
+class PlaceSearch(Resource):
+    @api.response(200, 'Search results retrieved successfully')
+    @api.response(400, 'Invalid search parameters')
+    @api.param('min_price', 'Minimum price')
+    @api.param('max_price', 'Maximum price')
+    @api.param('bbox', 'Bounding box: min_lat,max_lat,min_lon,max_lon')
+    @api.param('amenity_ids', 'Comma separated amenity ids, places must have all of them')
+    @api.param('min_rating', 'Minimum average rating (1-5)')
+    @api.param('sort', 'newest (default), price_asc, price_desc or rating_desc')
+    @api.param('limit', 'Page size (default 20, max 100)')
+    @api.param('offset', 'Number of results to skip')
+    @api.param('facets', 'Set to false to skip facet counts')
+    def get(self):
+        """ Search places with any combination of filters, with facet counts """
+        args = request.args
+        criteria = {}
+        try:
+            for key in ('min_price', 'max_price', 'min_rating'):
+                if args.get(key):
+                    criteria[key] = float(args[key])
+            if args.get('bbox'):
+                bbox = [float(v) for v in args['bbox'].split(',')]
+                if len(bbox) != 4:
+                    raise ValueError
+                criteria['bbox'] = bbox
+            # float() takes 'nan' and 'inf', which no row matches
+            numbers = [v for key, v in criteria.items() if key != 'bbox'] + criteria.get('bbox', [])
+            if not all(math.isfinite(v) for v in numbers):
+                raise ValueError
+            limit = int(args.get('limit', 20))
+            offset = int(args.get('offset', 0))
+        except ValueError:
+            return {'error': 'Prices, rating, bbox, limit and offset must be numbers'}, 400
+        if args.get('amenity_ids'):
+            criteria['amenity_ids'] = [a.strip() for a in args['amenity_ids'].split(',') if a.strip()]
+        with_facets = args.get('facets', 'true').lower() != 'false'
+
+        try:
+            rows, total, facets = facade.search_places(
+                criteria, args.get('sort', 'newest'), limit, offset, with_facets
+            )
+        except ValueError as e:
+            return {'error': str(e)}, 400
+
+        response = {
+            'result': [
+                _enrich_place_with_amenities(place, average_rating, review_count)
+                for place, average_rating, review_count in rows
+            ],
+            'total': total,
+            'limit': min(limit, MAX_PAGE_SIZE),
+            'offset': offset,
+            'message': 'Search results retrieved successfully.'
+        }
+        if facets is not None:
+            response['facets'] = {
+                'amenities': [
+                    {'id': amenity_id, 'name': name, 'count': count}
+                    for amenity_id, name, count in facets['amenities']
+                ],
+                'price': [
+                    {'min': low, 'max': high, 'count': count}
+                    for (low, high), count in facets['price']
+                ],
+            }
+        return response, 200
 
 @api.route('/<place_id>')
 class PlaceResource(Resource):
     @api.response(200, 'Place details retrieved successfully')
+    @api.response(304, 'Not modified since the ETag in If-None-Match')
     @api.response(404, 'Place not found')
     @api.doc(description="Get place by ID")
     def get(self, place_id):
         try:
             place = facade.get_place(place_id)
-            return {
-                'result': _enrich_place_with_amenities(place),
-                'message': 'Place details retrieved successfully.'
-            }, 200
         except ValueError as e:
             return {'error': str(e)}, 404
 
+        etag = make_etag('place', facade.get_place_version(place))
+        response = not_modified(etag)
+        if response is not None:
+            return response
+
+        return {
+            'result': _enrich_place_with_amenities(place),
+            'message': 'Place details retrieved successfully.'
+        }, 200, etag_headers(etag)
+
     @api.expect(place_update_model, validate=True)
     @api.response(200, 'Place updated successfully')
     @api.response(404, 'Place not found')
@@ -140,12 +338,6 @@ class PlaceResource(Resource):
     def put(self, place_id):
         """ Update place """
         data = api.payload or {}
-        current_user = get_jwt()
-        jwt_user_id = get_jwt_identity()
-
-        # Set is_admin default to False if not exists
-        is_admin = current_user.get('is_admin', False)
-        # user_id = current_user.get('id')
 
         try:
             # retrieve place and check ownership before update
@@ -153,12 +345,9 @@ class PlaceResource(Resource):
             if not place:
                 return {'error': 'Place not found'}, 404
             
-            if not is_admin and str(place.owner_id) != str(jwt_user_id):
+            if not current_user.is_admin and not current_user.owns(place.owner_id):
                 return {'error': 'Unauthorized action'}, 403
             
-            # if str(place.owner_id) != str(current_user):
-            #     return {'error': 'Unauthorised action'}, 403
-            
             # perform update
             updated_place = facade.update_place(place_id, data)
             return {
@@ -178,12 +367,6 @@ class PlaceResource(Resource):
         Only the owner of the place or an admin can delete it.
         This will also delete all associated reviews and remove amenity associations.
         """
-        current_user = get_jwt()
-        jwt_user_id = get_jwt_identity()
-        
-        # Get admin status
-        is_admin = current_user.get('is_admin', False)
-        
         try:
             # Retrieve place to verify it exists
             place = facade.get_place(place_id)
@@ -191,7 +374,7 @@ class PlaceResource(Resource):
                 return {'error': 'Place not found'}, 404
             
             # Check authorization: must be owner or admin
-            if not is_admin and str(place.owner_id) != str(jwt_user_id):
+            if not current_user.is_admin and not current_user.owns(place.owner_id):
                 return {'error': 'Unauthorized action'}, 403
             
             # Perform deletion
@@ -202,9 +385,57 @@ class PlaceResource(Resource):
         except ValueError as e:
             return {'error': str(e)}, 404
 
+"""Add amenities to a place"""
+@api.route('/<place_id>/amenities')
+class PlaceAmenities(Resource):
+    @api.expect(place_amenities_model, validate=True)
+    @api.response(200, 'Amenities added to the place')
+    @api.response(400, 'Unknown amenity id')
+    @api.response(403, 'Unauthorized action')
+    @api.response(404, 'Place not found')
+    @jwt_required()
+    def post(self, place_id):
+        """ Add several amenities to a place (owner or admin) """
+        try:
+            place = facade.get_place(place_id)
+            if not current_user.is_admin and not current_user.owns(place.owner_id):
+                return {'error': 'Unauthorized action'}, 403
+
+            place = facade.add_amenities_to_place(place_id, api.payload['amenity_ids'])
+            return {
+                'result': _enrich_place_with_amenities(place),
+                'message': 'Amenities added successfully.'
+            }, 200
+        except ValueError as e:
+            error_message = str(e)
+            if error_message.startswith('404'):
+                return {'error': error_message}, 404
+            return {'error': error_message}, 400
+
 """get average rating"""
 @api.route('/average/<place_id>')
 class AverageRating(Resource):
     def get(self, place_id):
         avg_rating = facade.get_average_rating(place_id)
         return {"average_rating": avg_rating}, 200
+
+"""get average rating and review count of many places"""
+@api.route('/ratings')
+class PlaceRatings(Resource):
+    @api.response(200, 'Ratings retrieved successfully')
+    @api.response(400, 'Invalid ids')
+    @api.param('ids', 'Comma separated place ids')
+    def get(self):
+        ids = [i.strip() for i in request.args.get('ids', '').split(',') if i.strip()]
+        if not ids:
+            return {'error': 'ids is required'}, 400
+        if len(ids) > MAX_RATING_IDS:
+            return {'error': f'At most {MAX_RATING_IDS} ids per request'}, 400
+
+        summaries = facade.get_rating_summaries(ids)
+        return {
+            'result': {
+                place_id: {'average_rating': average_rating, 'review_count': review_count}
+                for place_id, (average_rating, review_count) in summaries.items()
+            }
+        }, 200
@@ -1,7 +1,9 @@
 from flask import request
 from flask_restx import Namespace, Resource, fields
 from app.services import facade
-from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
+from app.utils.etag import make_etag, not_modified, etag_headers
+from app.utils.current_user import current_user
+from flask_jwt_extended import jwt_required
 
 api = Namespace("reviews", description="Review operations")
 
@@ -38,9 +40,9 @@ class ReviewsList(Resource):
         """List all reviews made by a specific user"""
         reviews = facade.get_all_reviews()
 
-        reviews = [r for r in reviews if r.to_dict().get('place') is not None]
+        serialized = facade.serialize_reviews(reviews)
 
-        return [r.to_dict() for r in reviews], 200
+        return [r for r in serialized if r.get('place') is not None], 200
 
     """Create a review for a place"""
     @jwt_required() 
@@ -52,25 +54,20 @@ class ReviewsList(Resource):
     def post(self): 
         """Create a review""" 
         data = api.payload 
-        current_user = get_jwt_identity() 
 
         try:
             place = facade.get_place(data["place_id"])
             if not place:
                 return {'error': 'Place not found'}, 404
 
-            if str(place.owner_id) == str(current_user):
+            if current_user.owns(place.owner_id):
                 return {'error': "You cannot review your own place."}, 400
             
-            if facade.user_already_reviewed(place.id, current_user):
+            if facade.user_already_reviewed(place.id, current_user.id):
                 return {'error': "You have already reviewed this place."}, 400
 
-            user = facade.get_user(current_user)
-            if not user:
-                return {'error': 'User not found'}, 404
-
             review = facade.create_review({
-                "user": user,
+                "user": current_user.user,
                 "place": place,
                 "rating": data["rating"],
                 "text": data["text"],
@@ -113,19 +110,16 @@ class ReviewResource(Resource):
     def put(self, review_id):
         """Update a review (owner only)"""
         data = api.payload or {}
-        current_user = get_jwt()
-        jwt_user_id = get_jwt_identity()
-        is_admin = current_user.get('is_admin', False)
 
         try:
             review = facade.get_review_by_id(review_id)
             if not review:
                 return {'error': 'Review not found'}, 404
             
-            if not is_admin and str(review.user.id) != str(jwt_user_id):
+            if not current_user.is_admin and not current_user.owns(review.user_id):
                 return {"error": 'Unauthorised action'}, 403
             
-            update = facade.update_review(review_id, data, jwt_user_id, is_admin)
+            update = facade.update_review(review_id, data, current_user.id, current_user.is_admin)
             return update.to_dict(), 200
         
         except PermissionError as e:
@@ -139,20 +133,15 @@ class ReviewResource(Resource):
     @api.response(404, 'Review not found')
     def delete(self, review_id):
         """Delete a review (owner only)"""
-        current_user = get_jwt()
-        jwt_user_id = get_jwt_identity()
-
-        is_admin = current_user.get('is_admin', False)
-
         try:
             review = facade.get_review_by_id(review_id)
             if not review:
                 return {"error": "Review not found"}, 404
             
-            if not is_admin and str(review.user.id) != str(jwt_user_id):
+            if not current_user.is_admin and not current_user.owns(review.user_id):
                 return {"error": "Unauthorized action."}, 403
             
-            facade.delete_review(review_id, jwt_user_id, is_admin)
+            facade.delete_review(review_id, current_user.id, current_user.is_admin)
             return {"message": "Review deleted successfully"}, 200
 
         except PermissionError as e:
@@ -166,6 +155,7 @@ class ReviewResource(Resource):
 @api.route('/place/<string:place_id>')
 class ReviewsByPlace(Resource):
     @api.response(200, 'List of reviews for the place', [review_response_model])
+    @api.response(304, 'Not modified since the ETag in If-None-Match')
     @api.response(404, 'Place not found')
     def get(self, place_id):
         """List all reviews for a specific place"""
@@ -173,8 +163,15 @@ class ReviewsByPlace(Resource):
         if not place:
             return {"error": "Place not found"}, 404
 
+        # the place and the reviewer are embedded in each review; the
+        # reviews version includes MAX(updated_at) of the reviewers
+        etag = make_etag('reviews', place.id, place.updated_at, facade.get_place_reviews_version(place_id))
+        response = not_modified(etag)
+        if response is not None:
+            return response
+
         reviews = facade.get_reviews_for_place(place_id)
 
-        reviews = [r for r in reviews if r.to_dict().get('place') is not None]
+        serialized = facade.serialize_reviews(reviews)
 
-        return [r.to_dict() for r in reviews], 200
+        return [r for r in serialized if r.get('place') is not None], 200, etag_headers(etag)
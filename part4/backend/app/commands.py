@@ -0,0 +1,25 @@
+import click
+
+
+def register_commands(app):
+    """Register maintenance commands on the flask CLI"""
+
+    @app.cli.command("rebuild-ratings")
+    def rebuild_ratings():
+        """Recompute places.rating_sum / rating_count from the reviews table."""
+        from app.services import facade
+
+        updated = facade.rebuild_rating_totals()
+        click.echo(f"Rebuilt rating totals for {updated} places")
+
+    @app.cli.command("db-upgrade")
+    def db_upgrade():
+        """Create missing tables and apply pending schema migrations."""
+        from app import db
+        from app.persistence import migrations
+
+        db.create_all()
+        applied = migrations.upgrade(db.engine)
+        for version, description in applied:
+            click.echo(f"Applied migration {version}: {description}")
+        click.echo(f"Schema is at version {migrations.current_version(db.engine)}")
@@ -1,8 +1,8 @@
 from app import db
 from app.models.base_model import BaseModel
 from app.models.review import Review
+from app.utils import geo
 from sqlalchemy.orm import relationship, validates
-from sqlalchemy import func
 
 # association table for Place <-> Amenity (many-to-many)
 # one Place can have many Amenitys + one Amenity can belong to many Places
@@ -12,25 +12,37 @@ place_amenity = db.Table(
     'place_amenity',
     db.Column('place_id', db.String(36), db.ForeignKey('places.id'), primary_key=True),
     db.Column('amenity_id', db.String(36), db.ForeignKey('amenities.id'), primary_key=True),
+    # the primary key covers place_id lookups, this one amenity_id lookups
+    db.Index('ix_place_amenity_amenity_id', 'amenity_id'),
 )
 
 
 """ Class Place represents to Place model in BL"""
 class Place(BaseModel):
     __tablename__ = 'places'
+    __table_args__ = (
+        db.Index('ix_places_latitude_longitude', 'latitude', 'longitude'),
+        db.Index('ix_places_created_at_id', 'created_at', 'id'),
+    )
 
     # Core attributes as required by task_08, except amenity_ids and review_ids
     title = db.Column(db.String(255), nullable=False)
     description = db.Column(db.String(1000), nullable=True)
-    price = db.Column(db.Float, nullable=False)
+    price = db.Column(db.Float, nullable=False, index=True)
     latitude = db.Column(db.Float, nullable=False)
     longitude = db.Column(db.Float, nullable=False)
+    # grid cell of (latitude, longitude), kept in sync by the validators
+    geohash = db.Column(db.String(12), nullable=True, index=True)
     
     address = db.Column(db.String(200), nullable=True)
     image_url = db.Column(db.String, nullable=True)
 
+    # Running rating totals, maintained by ReviewService on review writes
+    rating_sum = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
     # Foreign Key for User-Place relationship (One-to-Many)
-    owner_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False)
+    owner_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False, index=True)
 
     # =====================
     # RELATIONASHIPS
@@ -109,6 +121,7 @@ class Place(BaseModel):
         value = float(value)
         if not (-90.0 <= value <= 90.0):
             raise ValueError("Latitude must be between -90.0 and 90.0")
+        self._refresh_geohash(value, self.longitude)
         return value
 
     @validates('longitude')
@@ -119,6 +132,7 @@ class Place(BaseModel):
         value = float(value)
         if not (-180.0 <= value <= 180.0):
             raise ValueError("Longitude must be between -180.0 and 180.0")
+        self._refresh_geohash(self.latitude, value)
         return value
 
     @validates('address')
@@ -147,23 +161,22 @@ class Place(BaseModel):
     
     @property
     def average_rating(self):
-        """Calculate the average rating for a place"""
-        average_rating = (
-            db.session.query(func.avg(Review.rating))
-            .filter(Review.place_id == self.id)
-            .scalar()
-        )
-
-        if average_rating is None:
+        """Average rating for a place, read from the stored totals"""
+        if not self.rating_count:
             return None
 
         # round to one decimal
-        return round(float(average_rating), 1)
+        return round(self.rating_sum / self.rating_count, 1)
 
     # =====================
     # HELPER METHODS
     # =====================
 
+    def _refresh_geohash(self, latitude, longitude):
+        """Recompute geohash once both coordinates are known"""
+        if latitude is not None and longitude is not None:
+            self.geohash = geo.encode(latitude, longitude)
+
     def add_amenity(self, amenity):
         if amenity not in self.amenities:
             self.amenities.append(amenity)
@@ -171,3 +184,11 @@ class Place(BaseModel):
     def add_review(self, review):
         if review not in self.reviews:
             self.reviews.append(review)
+
+    def adjust_rating_totals(self, sum_delta, count_delta):
+        """
+        Apply a rating change as an in-database increment, so concurrent
+        review writes cannot lose updates. Committed with the review.
+        """
+        self.rating_sum = Place.rating_sum + sum_delta
+        self.rating_count = Place.rating_count + count_delta
@@ -3,11 +3,16 @@ from app import db
 from sqlalchemy.orm import relationship, validates
 from app.models.base_model import BaseModel
 
+# to_dict(): user / place not passed, as opposed to passed as None
+_NOT_LOADED = object()
+
 class Review(BaseModel):
     """Represents a review left by a user for a place."""
     __tablename__ = 'reviews'
     __table_args__ = (
         db.UniqueConstraint('user_id', 'place_id', name='unique_user_place_review'),
+        # serves reviews-by-place listings and the already-reviewed check
+        db.Index('ix_reviews_place_id_user_id', 'place_id', 'user_id'),
     )
 
     rating = db.Column(db.Integer, nullable=False)
@@ -36,12 +41,17 @@ class Review(BaseModel):
             if field in data:
                 setattr(self, field, data[field])
 
-    def to_dict(self): 
-        """Return a JSON-serializable representation of the review.""" 
-        from app.services.facade import facade
-        
-        user = facade.get_user(self.user_id)
-        place = facade.get_place(self.place_id)
+    def to_dict(self, user=_NOT_LOADED, place=_NOT_LOADED):
+        """Return a JSON-serializable representation of the review.
+
+        user and place may be passed in when they were already loaded in
+        bulk (see ReviewService.serialize_reviews), None when the bulk
+        load found none; only when left out are the relationships used.
+        """
+        if user is _NOT_LOADED:
+            user = self.user
+        if place is _NOT_LOADED:
+            place = self.place
 
         return {
             "id": self.id,
@@ -1,11 +1,9 @@
 from app import db
 from app.models.base_model import BaseModel
-from flask_bcrypt import Bcrypt
+from app.utils.passwords import password_hasher
 import re
 from sqlalchemy.orm import validates, relationship
 
-bcrypt = Bcrypt()
-
 class User(BaseModel):
     __tablename__ = 'users'
 
@@ -65,8 +63,12 @@ class User(BaseModel):
     # =====================
     def hash_password(self, password): 
         """ Hashes the password before storing it """
-        self.password = bcrypt.generate_password_hash(password).decode('utf-8')
+        self.password = password_hasher.hash(password)
 
     def verify_password(self, password):
         """ Verifies if the provided password matches the hashed password."""
-        return bcrypt.check_password_hash(self.password, password)
\ No newline at end of file
+        return password_hasher.verify(self.password, password)
+
+    def password_needs_rehash(self):
+        """ True if the stored hash is weaker than the configured cost """
+        return password_hasher.needs_rehash(self.password)
\ No newline at end of file
@@ -0,0 +1,419 @@
+"""
+Read-through cache for SQLAlchemyRepository.get().
+
+Rows are cached as plain column dicts keyed by model and id, never as ORM
+instances, so nothing is shared between sessions: on a hit the row is
+rebuilt and merged into the current session without a SELECT.
+
+Entries are invalidated whenever the session flushes a change to a cached
+object (through a repository or by setting attributes and committing), and
+again after the commit. Every invalidation bumps the key's generation: a
+reader takes the generation before loading the row on a miss and only
+fills the cache if it is unchanged, so a row read before a concurrent
+commit is never cached after that commit's invalidation.
+
+Backends, chosen by CACHE_TYPE:
+    'null'   - no caching
+    'simple' - in-process LRU with a TTL; invalidations only reach the
+               process that made the change, so one worker process only
+    'redis'  - any server speaking the Redis protocol at CACHE_REDIS_URL
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app import db
+from app.utils import fork_safety
+from app.utils.resp import RespClient, RespError
+
+logger = logging.getLogger(__name__)
+
+
+# ---------- backends ----------
+class NullCache:
+    def get(self, key):
+        return None
+
+    def generation(self, key):
+        return None
+
+    def set(self, key, value, generation=None):
+        pass
+
+    def delete(self, *keys):
+        pass
+
+    def clear(self):
+        pass
+
+    def after_fork(self):
+        pass
+
+
+class LRUCache:
+    """
+    Thread-safe in-process LRU with a per-entry time to live.
+
+    Generations come from one clock ticking on every delete/clear: a fill
+    is dropped if its key was deleted, or the cache cleared, after the
+    generation it was given. The last maxsize deletes are remembered; a
+    key deleted before those counts as deleted when the oldest was forgotten.
+    """
+    def __init__(self, maxsize=10000, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._clock = 0
+        # key -> clock of its last delete, oldest first
+        self._deleted = OrderedDict()
+        # clock of the last clear() or of the newest forgotten delete
+        self._floor = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def generation(self, key):
+        with self._lock:
+            return self._clock
+
+    def set(self, key, value, generation=None):
+        with self._lock:
+            if generation is not None and max(self._deleted.get(key, 0), self._floor) > generation:
+                return
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            self._clock += 1
+            for key in keys:
+                self._data.pop(key, None)
+                self._deleted[key] = self._clock
+                self._deleted.move_to_end(key)
+            while len(self._deleted) > self.maxsize:
+                _, self._floor = self._deleted.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._clock += 1
+            self._floor = self._clock
+            self._data.clear()
+            self._deleted.clear()
+
+    def after_fork(self):
+        # entries are kept; the lock may have been held by another thread
+        self._lock = threading.Lock()
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    raise TypeError(f"Cannot cache value of type {type(value).__name__}")
+
+
+def _json_object_hook(obj):
+    if "__datetime__" in obj:
+        return datetime.fromisoformat(obj["__datetime__"])
+    return obj
+
+
+# KEYS: entry, its generation, the epoch
+# ARGV: generation and epoch seen before the load, row, ttl
+_FILL_SCRIPT = """
+if (redis.call('GET', KEYS[2]) or '0') == ARGV[1] and (redis.call('GET', KEYS[3]) or '0') == ARGV[2] then
+    redis.call('SET', KEYS[1], ARGV[3], 'EX', ARGV[4])
+    return 1
+end
+return 0
+"""
+
+# KEYS: entry, its generation, entry, its generation, ...
+# ARGV: ttl of the generations
+_DELETE_SCRIPT = """
+for i = 1, #KEYS, 2 do
+    redis.call('DEL', KEYS[i])
+    redis.call('INCR', KEYS[i + 1])
+    redis.call('EXPIRE', KEYS[i + 1], ARGV[1])
+end
+return 0
+"""
+
+
+class RedisCache:
+    """
+    Rows stored as JSON under '<prefix><key>' with an expiry. Any error
+    talking to the server is logged and treated as a miss.
+
+    A key's generation is kept under '<prefix>gen:<key>' for one ttl after
+    its last delete, clear() bumps '<prefix>epoch', and fills compare both
+    in a Lua script, so workers never cache a row another one invalidated
+    while it was being read.
+    """
+    def __init__(self, client, ttl=300, prefix="hbnb:cache:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.epoch_key = prefix + "epoch"
+        self._shas = {script: hashlib.sha1(script.encode("utf-8")).hexdigest()
+                      for script in (_FILL_SCRIPT, _DELETE_SCRIPT)}
+
+    def after_fork(self):
+        self.client.after_fork()
+
+    def _run(self, script, keys, args):
+        try:
+            return self.client.execute("EVALSHA", self._shas[script], len(keys), *keys, *args)
+        except RespError as e:
+            if not str(e).startswith("NOSCRIPT"):
+                raise
+            return self.client.execute("EVAL", script, len(keys), *keys, *args)
+
+    def get(self, key):
+        try:
+            raw = self.client.execute("GET", self.prefix + key)
+        except (ConnectionError, RespError) as e:
+            logger.warning("cache get failed: %s", e)
+            return None
+        return None if raw is None else json.loads(raw, object_hook=_json_object_hook)
+
+    def generation(self, key):
+        try:
+            values = self.client.execute("MGET", self.prefix + "gen:" + key, self.epoch_key)
+        except (ConnectionError, RespError) as e:
+            logger.warning("cache generation failed: %s", e)
+            # matches nothing: the fill is skipped
+            return ("", "")
+        return tuple((value or b"0").decode() for value in values)
+
+    def set(self, key, value, generation=None):
+        row = json.dumps(value, default=_json_default)
+        try:
+            if generation is None:
+                self.client.execute("SET", self.prefix + key, row, "EX", self.ttl)
+            else:
+                self._run(_FILL_SCRIPT, (self.prefix + key, self.prefix + "gen:" + key, self.epoch_key),
+                          (*generation, row, self.ttl))
+        except (ConnectionError, RespError) as e:
+            logger.warning("cache set failed: %s", e)
+
+    def delete(self, *keys):
+        if not keys:
+            return
+        names = []
+        for key in keys:
+            names += [self.prefix + key, self.prefix + "gen:" + key]
+        try:
+            self._run(_DELETE_SCRIPT, names, (self.ttl,))
+        except (ConnectionError, RespError) as e:
+            logger.warning("cache delete failed: %s", e)
+
+    def clear(self):
+        try:
+            # first, so that fills already under way are dropped
+            self.client.execute("INCR", self.epoch_key)
+            cursor = "0"
+            while True:
+                cursor, keys = self.client.execute("SCAN", cursor, "MATCH", self.prefix + "*", "COUNT", 500)
+                cursor = cursor.decode() if isinstance(cursor, bytes) else str(cursor)
+                keys = [k for k in keys if k != self.epoch_key.encode()]
+                if keys:
+                    self.client.execute("DEL", *keys)
+                if cursor == "0":
+                    break
+        except (ConnectionError, RespError) as e:
+            logger.warning("cache clear failed: %s", e)
+
+
+# ---------- extension ----------
+class RepositoryCache:
+    """
+    Shared cache used by every CachedRepository. Configured per app with
+    init_app(), like the other extensions in app/__init__.py.
+    """
+    def __init__(self):
+        self.backend = NullCache()
+        self.models = set()
+        self._stats_lock = threading.Lock()
+        self._listening = False
+        self.reset_stats()
+        fork_safety.register(self)
+
+    def after_fork(self):
+        self._stats_lock = threading.Lock()
+        self.backend.after_fork()
+
+    def init_app(self, app):
+        cache_type = app.config.get("CACHE_TYPE", "null")
+        ttl = app.config.get("CACHE_DEFAULT_TIMEOUT", 300)
+        if cache_type == "simple":
+            self.backend = LRUCache(app.config.get("CACHE_MAXSIZE", 10000), ttl)
+        elif cache_type == "redis":
+            client = RespClient(app.config.get("CACHE_REDIS_URL", "redis://127.0.0.1:6379/0"))
+            self.backend = RedisCache(client, ttl, app.config.get("CACHE_KEY_PREFIX", "hbnb:cache:"))
+        elif cache_type == "null":
+            self.backend = NullCache()
+        else:
+            raise ValueError(f"Unknown CACHE_TYPE: {cache_type}")
+        self.reset_stats()
+
+        if not self._listening:
+            event.listen(db.session, "after_flush", self._after_flush)
+            event.listen(db.session, "after_commit", self._after_commit)
+            event.listen(db.session, "after_rollback", self._after_rollback)
+            event.listen(db.session, "do_orm_execute", self._do_orm_execute)
+            self._listening = True
+
+    # ---------- stats ----------
+    def reset_stats(self):
+        with self._stats_lock:
+            self._stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            self._stats[name] += amount
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else None
+        stats["backend"] = type(self.backend).__name__
+        return stats
+
+    # ---------- entries ----------
+    @staticmethod
+    def key(model, obj_id):
+        return f"{model.__tablename__}:{obj_id}"
+
+    def get(self, model, obj_id):
+        row = self.backend.get(self.key(model, obj_id))
+        self._count("hits" if row is not None else "misses")
+        return row
+
+    def generation(self, model, obj_id):
+        """Token to pass to set(): taken before loading a row on a miss"""
+        return self.backend.generation(self.key(model, obj_id))
+
+    def set(self, model, obj_id, row, generation=None):
+        """Cache row, unless it was invalidated since generation was taken"""
+        self.backend.set(self.key(model, obj_id), row, generation)
+
+    def invalidate(self, model, obj_id):
+        self.backend.delete(self.key(model, obj_id))
+        self._count("invalidations")
+
+    def clear(self):
+        self.backend.clear()
+
+    # ---------- session events ----------
+    def _cached_keys(self, objects):
+        return {
+            (type(obj), inspect(obj).identity[0])
+            for obj in objects
+            if type(obj) in self.models and inspect(obj).identity
+        }
+
+    def _after_flush(self, session, flush_context):
+        keys = self._cached_keys(list(session.dirty) + list(session.deleted))
+        if keys:
+            session.info.setdefault("cache_invalidate", set()).update(keys)
+            for model, obj_id in keys:
+                self.invalidate(model, obj_id)
+
+    def _after_commit(self, session):
+        keys = session.info.pop("cache_invalidate", ())
+        if keys:
+            self.backend.delete(*[self.key(model, obj_id) for model, obj_id in keys])
+        if session.info.pop("cache_clear", False):
+            self.clear()
+
+    def _after_rollback(self, session):
+        session.info.pop("cache_invalidate", None)
+        session.info.pop("cache_clear", None)
+
+    def _do_orm_execute(self, orm_execute_state):
+        # bulk UPDATE / DELETE statements bypass the flush, drop everything,
+        # now and after the commit
+        if orm_execute_state.is_update or orm_execute_state.is_delete:
+            mapper = orm_execute_state.bind_mapper
+            if mapper is not None and mapper.class_ in self.models:
+                orm_execute_state.session.info["cache_clear"] = True
+                self.clear()
+
+
+repository_cache = RepositoryCache()
+
+
+class CachedRepository:
+    """
+    Wraps a SQLAlchemyRepository and serves get() from the repository cache.
+    Every other attribute is delegated to the wrapped repository.
+    """
+    def __init__(self, repository, cache=repository_cache):
+        self.repository = repository
+        self.cache = cache
+        cache.models.add(repository.model)
+
+    def __getattr__(self, name):
+        return getattr(self.repository, name)
+
+    def _serialize(self, obj):
+        return {attr.key: getattr(obj, attr.key) for attr in inspect(self.model).column_attrs}
+
+    def _rebuild(self, row):
+        """Turn a cached row back into an instance attached to this session"""
+        obj = inspect(self.model).class_manager.new_instance()
+        for key, value in row.items():
+            set_committed_value(obj, key, value)
+        make_transient_to_detached(obj)
+        return db.session.merge(obj, load=False)
+
+    def get(self, obj_id):
+        if obj_id is None:
+            return None
+        # already in this session: the identity map wins
+        identity = inspect(self.model).identity_key_from_primary_key((obj_id,))
+        obj = db.session.identity_map.get(identity)
+        if obj is not None:
+            return obj
+
+        row = self.cache.get(self.model, obj_id)
+        if row is not None:
+            return self._rebuild(row)
+
+        generation = self.cache.generation(self.model, obj_id)
+        obj = self.repository.get(obj_id)
+        if obj is not None:
+            self.cache.set(self.model, obj_id, self._serialize(obj), generation)
+        return obj
+
+    def add(self, obj):
+        self.repository.add(obj)
+
+    def update(self, obj_id, data):
+        self.cache.invalidate(self.model, obj_id)
+        self.repository.update(obj_id, data)
+
+    def delete(self, obj_id):
+        self.cache.invalidate(self.model, obj_id)
+        self.repository.delete(obj_id)
@@ -0,0 +1,107 @@
+"""
+Versioned schema migrations for databases created before a model change.
+
+db.create_all() only creates missing tables, so columns and indexes added
+to existing tables are applied here. Each step is idempotent: it inspects
+the live schema and only creates what is missing, so running it against a
+database freshly built by create_all() simply stamps the version.
+The current version is kept in the schema_version table.
+"""
+from sqlalchemy import inspect, text
+from app.models.place import Place, place_amenity
+from app.models.review import Review
+from app.utils import geo
+
+
+def _add_rating_totals(conn):
+    """places.rating_sum / rating_count, backfilled from reviews"""
+    columns = {c['name'] for c in inspect(conn).get_columns('places')}
+    if 'rating_sum' in columns and 'rating_count' in columns:
+        return
+    for name in ('rating_sum', 'rating_count'):
+        if name not in columns:
+            conn.execute(text(f"ALTER TABLE places ADD COLUMN {name} INTEGER NOT NULL DEFAULT 0"))
+    conn.execute(text(
+        "UPDATE places SET "
+        "rating_sum = (SELECT COALESCE(SUM(rating), 0) FROM reviews WHERE reviews.place_id = places.id), "
+        "rating_count = (SELECT COUNT(*) FROM reviews WHERE reviews.place_id = places.id)"
+    ))
+
+
+def _create_missing_indexes(conn, table):
+    """create model indexes that are missing, skipping those whose
+    columns a later migration has yet to add"""
+    inspector = inspect(conn)
+    if not inspector.has_table(table.name):
+        # created with all its indexes by db.create_all()
+        return
+    existing = {i['name'] for i in inspector.get_indexes(table.name)}
+    columns = {c['name'] for c in inspector.get_columns(table.name)}
+    for index in table.indexes:
+        if index.name not in existing and all(c.name in columns for c in index.columns):
+            index.create(conn)
+
+
+def _add_filter_indexes(conn):
+    """indexes declared on Place and Review for the repository filters"""
+    _create_missing_indexes(conn, Place.__table__)
+    _create_missing_indexes(conn, Review.__table__)
+
+
+def _add_place_geohash(conn, batch_size=1000):
+    """places.geohash, backfilled from latitude/longitude, and its index"""
+    columns = {c['name'] for c in inspect(conn).get_columns('places')}
+    if 'geohash' not in columns:
+        conn.execute(text("ALTER TABLE places ADD COLUMN geohash VARCHAR(12)"))
+
+    rows = conn.execute(text(
+        "SELECT id, latitude, longitude FROM places WHERE geohash IS NULL"
+    )).all()
+    for i in range(0, len(rows), batch_size):
+        conn.execute(
+            text("UPDATE places SET geohash = :geohash WHERE id = :id"),
+            [{"id": place_id, "geohash": geo.encode(lat, lon)} for place_id, lat, lon in rows[i:i + batch_size]],
+        )
+    _create_missing_indexes(conn, Place.__table__)
+
+
+def _add_amenity_search_index(conn):
+    """place_amenity(amenity_id) for the search amenity filter"""
+    _create_missing_indexes(conn, place_amenity)
+
+
+# (version, description, step) - append only, never renumber
+MIGRATIONS = [
+    (1, "place rating totals", _add_rating_totals),
+    (2, "indexes on hot filter columns", _add_filter_indexes),
+    (3, "place geohash for nearby search", _add_place_geohash),
+    (4, "place_amenity amenity_id index for amenity search", _add_amenity_search_index),
+]
+
+
+def _ensure_version_table(conn):
+    conn.execute(text("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)"))
+    version = conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar()
+    return version or 0
+
+
+def current_version(engine):
+    """Return the schema version recorded in the database (0 if none)"""
+    with engine.begin() as conn:
+        return _ensure_version_table(conn)
+
+
+def upgrade(engine):
+    """
+    Apply every migration newer than the recorded version, each in its
+    own transaction. Returns the list of (version, description) applied.
+    """
+    applied = []
+    for version, description, step in MIGRATIONS:
+        with engine.begin() as conn:
+            if version <= _ensure_version_table(conn):
+                continue
+            step(conn)
+            conn.execute(text("INSERT INTO schema_version (version) VALUES (:v)"), {"v": version})
+        applied.append((version, description))
+    return applied
@@ -1,12 +1,283 @@
-from app.models.place import Place
+from app.models.place import Place, place_amenity
+from app.models.amenity import Amenity
+from app.models.review import Review
+from app.models.user import User
 from app import db
 from app.persistence.repository import SQLAlchemyRepository
+from app.utils import geo
+from sqlalchemy import and_, or_, func, select, update, case, literal, union_all, cast, String
+from sqlalchemy.orm import joinedload, selectinload
+
+
+# price facet buckets: (low, high), high None means open ended
+PRICE_BUCKETS = [(0, 50), (50, 100), (100, 200), (200, 500), (500, None)]
 
 
 class PlaceRepository(SQLAlchemyRepository):
     def __init__(self):
         super().__init__(Place)
 
+    # ---------- search query builder ----------
+    def _search_conditions(self, criteria):
+        """
+        Translate search criteria into WHERE clauses. Supported keys:
+        min_price, max_price, bbox (min_lat, max_lat, min_lon, max_lon),
+        amenity_ids (places must have all of them), min_rating.
+        """
+        conditions = []
+        if criteria.get('min_price') is not None:
+            conditions.append(self.model.price >= criteria['min_price'])
+        if criteria.get('max_price') is not None:
+            conditions.append(self.model.price <= criteria['max_price'])
+
+        if criteria.get('bbox') is not None:
+            min_lat, max_lat, min_lon, max_lon = criteria['bbox']
+            conditions.append(self.model.latitude.between(min_lat, max_lat))
+            conditions.append(self.model.longitude.between(min_lon, max_lon))
+
+        amenity_ids = criteria.get('amenity_ids')
+        if amenity_ids:
+            having_all = (
+                select(place_amenity.c.place_id)
+                .where(place_amenity.c.amenity_id.in_(amenity_ids))
+                .group_by(place_amenity.c.place_id)
+                .having(func.count(func.distinct(place_amenity.c.amenity_id)) == len(amenity_ids))
+            )
+            conditions.append(self.model.id.in_(having_all))
+
+        if criteria.get('min_rating') is not None:
+            conditions.append(self.model.rating_count > 0)
+            conditions.append(self.model.rating_sum >= criteria['min_rating'] * self.model.rating_count)
+        return conditions
+
+    def _search_order(self, sort):
+        average = case(
+            (self.model.rating_count == 0, 0),
+            else_=self.model.rating_sum * 1.0 / self.model.rating_count,
+        )
+        orders = {
+            'newest': (self.model.created_at.desc(), self.model.id.desc()),
+            'price_asc': (self.model.price.asc(), self.model.id.asc()),
+            'price_desc': (self.model.price.desc(), self.model.id.asc()),
+            'rating_desc': (average.desc(), self.model.rating_count.desc(), self.model.id.asc()),
+        }
+        return orders[sort]
+
+    def search_places(self, criteria, sort='newest', limit=20, offset=0):
+        """
+        Return ([(place, average_rating, review_count)], total) for one
+        page of matching places. The page and the total match count come
+        from a single statement (COUNT(*) OVER ()).
+        """
+        total = func.count().over().label('total')
+        query = (
+            db.session.query(self.model, total)
+            .filter(*self._search_conditions(criteria))
+            .options(
+                joinedload(self.model.owner),
+                selectinload(self.model.amenities),
+            )
+            .order_by(*self._search_order(sort))
+            .limit(limit)
+            .offset(offset)
+        )
+        rows = query.all()
+        if not rows:
+            # past the last page the window count is not available
+            total_count = 0 if offset == 0 else self.count_search_results(criteria)
+        else:
+            total_count = rows[0][1]
+        return [
+            (place, *self._rating_summary(place.rating_sum, place.rating_count))
+            for place, _ in rows
+        ], total_count
+
+    def count_search_results(self, criteria):
+        return (
+            db.session.query(func.count(self.model.id))
+            .filter(*self._search_conditions(criteria))
+            .scalar()
+        )
+
+    def get_search_facets(self, criteria):
+        """
+        Return facet counts over every place matching criteria, in one
+        UNION ALL round-trip:
+        {'amenities': [(amenity_id, name, count)], 'price': [((low, high), count)]}
+        """
+        matching = select(self.model.id).where(*self._search_conditions(criteria))
+
+        amenity_facet = (
+            select(
+                literal('amenity').label('facet'),
+                Amenity.id.label('key'),
+                Amenity.name.label('label'),
+                func.count().label('count'),
+            )
+            .select_from(place_amenity.join(Amenity, Amenity.id == place_amenity.c.amenity_id))
+            .where(place_amenity.c.place_id.in_(matching))
+            .group_by(Amenity.id, Amenity.name)
+        )
+
+        bucket = case(
+            *[
+                (self.model.price < high, str(i))
+                for i, (_, high) in enumerate(PRICE_BUCKETS) if high is not None
+            ],
+            else_=str(len(PRICE_BUCKETS) - 1),
+        )
+        price_facet = (
+            select(
+                literal('price').label('facet'),
+                bucket.label('key'),
+                cast(literal(None), String).label('label'),
+                func.count().label('count'),
+            )
+            .where(*self._search_conditions(criteria))
+            .group_by(bucket)
+        )
+
+        facets = {'amenities': [], 'price': []}
+        price_counts = {}
+        for facet, key, label, count in db.session.execute(union_all(amenity_facet, price_facet)):
+            if facet == 'amenity':
+                facets['amenities'].append((key, label, count))
+            else:
+                price_counts[int(key)] = count
+        facets['amenities'].sort(key=lambda a: (-a[2], a[1]))
+        facets['price'] = [
+            (bounds, price_counts.get(i, 0)) for i, bounds in enumerate(PRICE_BUCKETS)
+        ]
+        return facets
+
+    @staticmethod
+    def _rating_summary(rating_sum, rating_count):
+        """Average rounded to one decimal like Place.average_rating"""
+        if not rating_count:
+            return None, 0
+        return round(rating_sum / rating_count, 1), rating_count
+
+    def get_places_page(self, limit=None, after=None):
+        """
+        Retrieve (place, average_rating, review_count) rows ordered by
+        (created_at, id). Ratings come from the stored totals, owners and
+        amenities are eager loaded, so a page costs a fixed number of queries.
+        after is the (created_at, id) key of the last place already seen.
+        """
+        query = (
+            self.model.query
+            .options(
+                joinedload(self.model.owner),
+                selectinload(self.model.amenities),
+            )
+            .order_by(self.model.created_at, self.model.id)
+        )
+
+        if after is not None:
+            created_at, place_id = after
+            if created_at is None:
+                # rows without created_at sort first
+                query = query.filter(or_(
+                    self.model.created_at.isnot(None),
+                    and_(self.model.created_at.is_(None), self.model.id > place_id),
+                ))
+            else:
+                query = query.filter(or_(
+                    self.model.created_at > created_at,
+                    and_(self.model.created_at == created_at, self.model.id > place_id),
+                ))
+
+        if limit is not None:
+            query = query.limit(limit)
+        return [
+            (place, *self._rating_summary(place.rating_sum, place.rating_count))
+            for place in query.all()
+        ]
+
+    def get_listing_version(self):
+        """
+        Version of the place listing in one query: MAX(updated_at) and
+        COUNT(*) of places, plus the latest change to the amenities and
+        owners embedded in each listed place.
+        """
+        stmt = select(
+            select(func.max(self.model.updated_at)).scalar_subquery(),
+            select(func.count()).select_from(self.model).scalar_subquery(),
+            select(func.max(Amenity.updated_at)).scalar_subquery(),
+            select(func.count()).select_from(Amenity).scalar_subquery(),
+            select(func.max(User.updated_at)).scalar_subquery(),
+        )
+        return tuple(db.session.execute(stmt).one())
+
+    def get_rating_summaries(self, place_ids):
+        """Return {place_id: (average_rating, review_count)} in one grouped query."""
+        place_ids = list(set(place_ids))
+        if not place_ids:
+            return {}
+        rows = (
+            db.session.query(self.model.id, self.model.rating_sum, self.model.rating_count)
+            .filter(self.model.id.in_(place_ids))
+            .all()
+        )
+        summaries = {place_id: (None, 0) for place_id in place_ids}
+        for place_id, rating_sum, rating_count in rows:
+            summaries[place_id] = self._rating_summary(rating_sum, rating_count)
+        return summaries
+
+    def rebuild_rating_totals(self):
+        """
+        Recompute rating_sum / rating_count of every place from the reviews
+        table, to repair drift. Returns the number of places updated.
+        """
+        rating_sum = (
+            select(func.coalesce(func.sum(Review.rating), 0))
+            .where(Review.place_id == self.model.id)
+            .scalar_subquery()
+        )
+        rating_count = (
+            select(func.count(Review.id))
+            .where(Review.place_id == self.model.id)
+            .scalar_subquery()
+        )
+        result = db.session.execute(
+            update(self.model)
+            .values(rating_sum=rating_sum, rating_count=rating_count)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount
+
+    def insert_places(self, place_rows, amenity_links):
+        """
+        Insert place rows and their (place_id, amenity_id) links with
+        executemany inside a SAVEPOINT. Nothing is committed: a failure
+        rolls back this batch only and is raised to the caller.
+        """
+        with db.session.begin_nested():
+            db.session.execute(self.model.__table__.insert(), place_rows)
+            if amenity_links:
+                db.session.execute(
+                    place_amenity.insert(),
+                    [{"place_id": place_id, "amenity_id": amenity_id} for place_id, amenity_id in amenity_links],
+                )
+
+    def update_amenity_links(self, place, add_ids, remove_ids):
+        """
+        Link place to add_ids and unlink it from remove_ids with one bulk
+        INSERT and one bulk DELETE on place_amenity, then expire
+        place.amenities so it reloads. Nothing is committed.
+        """
+        if remove_ids:
+            db.session.execute(place_amenity.delete().where(
+                place_amenity.c.place_id == place.id,
+                place_amenity.c.amenity_id.in_(list(remove_ids)),
+            ))
+        if add_ids:
+            db.session.execute(
+                place_amenity.insert(),
+                [{"place_id": place.id, "amenity_id": amenity_id} for amenity_id in add_ids],
+            )
+        db.session.expire(place, ["amenities"])
+
     def get_places_by_owner(self, owner_id):
         """Retrieve all places owned by a specific user."""
         return self.model.query.filter_by(owner_id=owner_id).all()
@@ -28,9 +299,51 @@ class PlaceRepository(SQLAlchemyRepository):
         ).all()
 
 
+    def get_places_nearby(self, latitude, longitude, radius_km, limit):
+        """
+        Retrieve up to limit (place, distance_km) pairs within radius_km,
+        nearest first. Candidates are pruned with the geohash cells
+        covering the circle, one ix_places_geohash range per cell, then
+        refined by haversine distance.
+        """
+        cells = geo.covering_cells(latitude, longitude, radius_km)
+
+        # a range, not LIKE 'cell%': SQLite's LIKE is case-insensitive and
+        # cannot use the index. No latitude filter either, or the planner
+        # picks ix_places_latitude_longitude instead; haversine covers it.
+        candidates = (
+            db.session.query(self.model.id, self.model.latitude, self.model.longitude)
+            .filter(or_(*[
+                and_(self.model.geohash >= low, self.model.geohash < high)
+                for low, high in map(geo.prefix_range, cells)
+            ]))
+            .all()
+        )
+
+        in_range = []
+        for place_id, lat, lon in candidates:
+            distance = geo.haversine_km(latitude, longitude, lat, lon)
+            if distance <= radius_km:
+                in_range.append((distance, place_id))
+        in_range.sort()
+        in_range = in_range[:limit]
+
+        places = {
+            place.id: place
+            for place in self.model.query.options(
+                joinedload(self.model.owner),
+                selectinload(self.model.amenities),
+            ).filter(self.model.id.in_([place_id for _, place_id in in_range]))
+        } if in_range else {}
+        return [(places[place_id], round(distance, 3)) for distance, place_id in in_range if place_id in places]
+
     def get_average_rating_for_place(self, place_id):
-        """Return the average rating using the Place model's property."""
-        place = self.model.query.get(place_id)
-        if not place:
+        """Return the average rating from the stored totals."""
+        row = (
+            db.session.query(self.model.rating_sum, self.model.rating_count)
+            .filter(self.model.id == place_id)
+            .first()
+        )
+        if not row:
             return None
-        return place.average_rating
\ No newline at end of file
+        return self._rating_summary(*row)[0]
\ No newline at end of file
@@ -0,0 +1,91 @@
+"""
+Per-request SQL instrumentation.
+
+Engine events count the statements each request runs and the time spent
+in the database. Statements slower than DB_SLOW_QUERY_MS are logged with
+the endpoint that issued them, and with DB_STATS_HEADERS the totals are
+returned in X-DB-Queries / X-DB-Time-ms / Server-Timing headers.
+"""
+import logging
+import time
+
+from flask import current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import event
+
+from app import db
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStats:
+    """Configured per app with init_app(), like the other extensions in app/__init__.py."""
+    def init_app(self, app):
+        with app.app_context():
+            engine = db.engine
+        # one listener per engine, even if several apps share it
+        if not event.contains(engine, "before_cursor_execute", self._before_cursor_execute):
+            event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+            event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+            event.listen(engine, "handle_error", self._handle_error)
+
+        app.before_request(self._start_request)
+        app.after_request(self._add_headers)
+
+    # ---------- request ----------
+    @staticmethod
+    def current():
+        """(queries, seconds) of the current request so far, None outside a request"""
+        stats = g.get("_db_stats") if has_app_context() else None
+        return None if stats is None else (stats[0], stats[1])
+
+    @staticmethod
+    def _start_request():
+        g._db_stats = [0, 0.0]
+
+    @staticmethod
+    def _add_headers(response):
+        stats = g.get("_db_stats")
+        if stats is None or not current_app.config.get("DB_STATS_HEADERS", False):
+            return response
+        queries, seconds = stats
+        ms = seconds * 1000
+        response.headers["X-DB-Queries"] = str(queries)
+        response.headers["X-DB-Time-ms"] = f"{ms:.2f}"
+        response.headers.add("Server-Timing", f'db;dur={ms:.2f};desc="{queries} queries"')
+        return response
+
+    # ---------- engine events ----------
+    @staticmethod
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @classmethod
+    def _after_cursor_execute(cls, conn, cursor, statement, parameters, context, executemany):
+        cls._finish(conn, statement)
+
+    @classmethod
+    def _handle_error(cls, exception_context):
+        # a failed statement never reaches after_cursor_execute: pop its
+        # start here, or the pooled connection keeps it for the next one
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_start") and exception_context.statement is not None:
+            cls._finish(conn, exception_context.statement)
+
+    @staticmethod
+    def _finish(conn, statement):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        if not has_app_context():
+            return
+
+        stats = g.get("_db_stats")
+        if stats is not None:
+            stats[0] += 1
+            stats[1] += elapsed
+
+        threshold = current_app.config.get("DB_SLOW_QUERY_MS")
+        if threshold is not None and elapsed * 1000 >= threshold:
+            endpoint = request.endpoint if has_request_context() else None
+            logger.warning("slow query (%.1f ms) in %s: %s", elapsed * 1000, endpoint, statement)
+
+
+query_stats = QueryStats()
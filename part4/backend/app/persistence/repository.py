@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from sqlalchemy import func, select
 from app import db
 from app.models.amenity import Amenity
 
@@ -32,9 +33,10 @@ class SQLAlchemyRepository(Repository):
     def __init__(self, model):
         self.model = model
 
+    # writes only flush: the caller's unit of work commits
     def add(self, obj):
         db.session.add(obj)
-        db.session.commit()
+        db.session.flush()
 
     def get(self, obj_id):
         return self.model.query.get(obj_id)
@@ -42,18 +44,54 @@ class SQLAlchemyRepository(Repository):
     def get_all(self):
         return self.model.query.all()
 
+    def get_by_ids(self, obj_ids):
+        """Fetch every object whose id is in obj_ids with a single IN query."""
+        obj_ids = list(set(obj_ids))
+        if not obj_ids:
+            return []
+        return self.model.query.filter(self.model.id.in_(obj_ids)).all()
+
+    def get_existing_ids(self, obj_ids):
+        """Return the subset of obj_ids that exist, with a single IN query."""
+        obj_ids = list(set(obj_ids))
+        if not obj_ids:
+            return set()
+        return set(db.session.scalars(select(self.model.id).where(self.model.id.in_(obj_ids))))
+
+    def get_version(self, *criterion):
+        """
+        Return (MAX(updated_at), COUNT(*)) of the matching rows.
+        Any insert, update or delete changes one of the two, so it
+        versions a collection without loading it.
+        """
+        stmt = select(func.max(self.model.updated_at), func.count()).select_from(self.model).where(*criterion)
+        return tuple(db.session.execute(stmt).one())
+
+    def iter_rows(self, columns, since=None, batch_size=1000):
+        """
+        Stream the named columns of every row (only updated_at >= since
+        when given) as batches of tuples, fetched batch_size at a time.
+        Plain rows rather than ORM objects, so memory stays flat however
+        large the table is.
+        """
+        stmt = select(*[getattr(self.model, name) for name in columns])
+        if since is not None:
+            stmt = stmt.where(self.model.updated_at >= since)
+        result = db.session.execute(stmt.execution_options(yield_per=batch_size))
+        yield from result.partitions()
+
     def update(self, obj_id, data):
         obj = self.get(obj_id)
         if obj:
             for key, value in data.items():
                 setattr(obj, key, value)
-            db.session.commit()
+            db.session.flush()
 
     def delete(self, obj_id):
         obj = self.get(obj_id)
         if obj:
             db.session.delete(obj)
-            db.session.commit()
+            db.session.flush()
 
     def get_by_attribute(self, attr_name, attr_value):
         return self.model.query.filter_by(**{attr_name: attr_value}).first()
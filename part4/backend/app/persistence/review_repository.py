@@ -1,4 +1,6 @@
 from app.models.review import Review
+from app.models.user import User
+from sqlalchemy import func, select
 from app import db
 from app.persistence.repository import SQLAlchemyRepository
 
@@ -20,3 +22,15 @@ class ReviewRepository(SQLAlchemyRepository):
         """user cannot comment more than once"""
         return self.model.query.filter_by(place_id=place_id, user_id=user_id).first() is not None
 
+    def get_place_reviews_version(self, place_id):
+        """
+        (MAX(updated_at), COUNT(*)) of a place's reviews, plus the latest
+        change to their authors, who are embedded in each review.
+        """
+        stmt = (
+            select(func.max(Review.updated_at), func.count(), func.max(User.updated_at))
+            .select_from(Review)
+            .outerjoin(User, User.id == Review.user_id)
+            .where(Review.place_id == place_id)
+        )
+        return tuple(db.session.execute(stmt).one())
@@ -0,0 +1,62 @@
+"""
+PRAGMAs for SQLite connections.
+
+SQLite settings such as journal_mode, synchronous or busy_timeout are
+per connection, so SQLITE_PRAGMAS is run from the engine's connect event
+on every connection the pool opens. Other databases are left alone.
+"""
+import logging
+import weakref
+
+from sqlalchemy import event
+
+from app import db
+
+logger = logging.getLogger(__name__)
+
+
+class SQLitePragmas:
+    """Configured per app with init_app(), like the other extensions in app/__init__.py."""
+    def __init__(self):
+        # engine -> PRAGMAs of the last app configured on it
+        self._pragmas = weakref.WeakKeyDictionary()
+
+    def init_app(self, app):
+        pragmas = dict(app.config.get("SQLITE_PRAGMAS") or {})
+        with app.app_context():
+            engine = db.engine
+        if engine.dialect.name != "sqlite":
+            return
+        registered = engine in self._pragmas
+        self._pragmas[engine] = pragmas
+        if pragmas and not registered:
+            event.listen(engine, "connect", self._connect_listener(engine))
+
+    def _connect_listener(self, engine):
+        engine_ref = weakref.ref(engine)
+
+        def set_pragmas(dbapi_connection, connection_record):
+            engine = engine_ref()
+            pragmas = self._pragmas.get(engine, {}) if engine is not None else {}
+            cursor = dbapi_connection.cursor()
+            try:
+                for name, value in pragmas.items():
+                    cursor.execute(f"PRAGMA {name}={value}")
+                    if name == "journal_mode":
+                        mode = cursor.fetchone()[0]
+                        # :memory: databases cannot use WAL and keep 'memory'
+                        if mode.lower() != str(value).lower():
+                            logger.info("SQLite journal_mode is %s, not %s", mode, value)
+            finally:
+                cursor.close()
+
+        return set_pragmas
+
+    @staticmethod
+    def current(connection):
+        """{name: value} of the tuned PRAGMAs on a SQLAlchemy connection, for checks"""
+        names = ("journal_mode", "synchronous", "mmap_size", "busy_timeout")
+        return {name: connection.exec_driver_sql(f"PRAGMA {name}").scalar() for name in names}
+
+
+sqlite_pragmas = SQLitePragmas()
@@ -0,0 +1,72 @@
+"""
+One transaction per facade call.
+
+Repositories and services only flush. The outermost `unit_of_work()`
+commits when its block returns and rolls back when it raises; blocks
+opened inside it (a facade method calling another one) join the outer
+transaction, so an API call ends in a single COMMIT and a failure
+half way leaves nothing behind. A block that wrote nothing does not
+commit, so the objects it read are not expired. Anything flushed
+outside a unit of work is rolled back when the app context tears down
+the session.
+"""
+import functools
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from app import db
+
+_DEPTH = "unit_of_work_depth"
+_WROTE = "unit_of_work_wrote"
+
+
+def _after_flush(session, flush_context):
+    session.info[_WROTE] = True
+
+
+def _do_orm_execute(orm_execute_state):
+    # bulk statements run through session.execute() bypass the flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info[_WROTE] = True
+
+
+def _end_transaction(session, *args):
+    session.info.pop(_WROTE, None)
+
+
+event.listen(db.session, "after_flush", _after_flush)
+event.listen(db.session, "do_orm_execute", _do_orm_execute)
+event.listen(db.session, "after_commit", _end_transaction)
+event.listen(db.session, "after_rollback", _end_transaction)
+
+
+def _has_writes(session):
+    return bool(session.info.get(_WROTE) or session.new or session.dirty or session.deleted)
+
+
+@contextmanager
+def unit_of_work():
+    """Run the block in the current transaction, committing it if this is the outermost block"""
+    session = db.session()
+    depth = session.info.get(_DEPTH, 0)
+    session.info[_DEPTH] = depth + 1
+    try:
+        yield session
+        if depth == 0 and _has_writes(session):
+            session.commit()
+    except BaseException:
+        if depth == 0:
+            session.rollback()
+        raise
+    finally:
+        session.info[_DEPTH] = depth
+
+
+def transactional(method):
+    """Decorator running a facade method in a unit of work"""
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        with unit_of_work():
+            return method(*args, **kwargs)
+    return wrapper
@@ -28,10 +28,10 @@ class AmenityService:
         
     """ Get all amenities """
     def get_all_amenities(self):
-        if self.amenity_repo.get_all() is None:
-            raise ValueError('No amenities found') 
-        else:
-            return self.amenity_repo.get_all()
+        amenities = self.amenity_repo.get_all()
+        if amenities is None:
+            raise ValueError('No amenities found')
+        return amenities
 
     """ Update amenities """
     def update_amenity(self, amenity_id, amenity_data):
@@ -54,4 +54,8 @@ class AmenityService:
         if check_amenity:
             self.amenity_repo.delete(amenity_id)
         else:
-            raise ValueError(f"Amenity id {amenity_id} does not exist")
\ No newline at end of file
+            raise ValueError(f"Amenity id {amenity_id} does not exist")
+
+    """ Version of the amenity list: (MAX(updated_at), COUNT(*)) """
+    def get_amenities_version(self):
+        return self.amenity_repo.get_version()
@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta
+
+from app.models.place import Place
+from app.models.review import Review
+from app.models.user import User
+
+MAX_EXPORT_BATCH_SIZE = 10000
+
+
+def _columns(model, exclude=()):
+    return [c.key for c in model.__table__.columns if c.key not in exclude]
+
+
+class ExportService:
+    def __init__(self, place_repo, review_repo, user_repo):
+        # name -> (repository, exported columns); password hashes never leave
+        self.exports = {
+            "places": (place_repo, _columns(Place)),
+            "reviews": (review_repo, _columns(Review)),
+            "users": (user_repo, _columns(User, exclude=("password",))),
+        }
+
+    def export_rows(self, name, since=None, batch_size=1000, overlap=timedelta(0)):
+        """
+        Return (columns, watermark, batches) for an export, where batches
+        lazily yields lists of row tuples. Arguments are checked here, the
+        rows are only fetched once batches is iterated.
+
+        watermark is the since of the next incremental export: the newest
+        updated_at among the rows, set back by overlap. updated_at is
+        stamped at write time, so a transaction committing after this
+        export may carry an older one; the overlap exports such rows next
+        time, along with some already exported, which the consumer
+        dedupes by id and updated_at. It never goes back before since.
+        """
+        if name not in self.exports:
+            raise ValueError(f"404: Unknown export '{name}', expected one of {', '.join(self.exports)}")
+        if not isinstance(batch_size, int) or not (1 <= batch_size <= MAX_EXPORT_BATCH_SIZE):
+            raise ValueError(f"400: batch_size must be between 1 and {MAX_EXPORT_BATCH_SIZE}")
+
+        repo, columns = self.exports[name]
+        criteria = () if since is None else (repo.model.updated_at >= since,)
+        newest, _ = repo.get_version(*criteria)
+        watermark = (newest or datetime.utcnow()) - overlap
+        if since is not None:
+            watermark = max(watermark, since)
+        return columns, watermark, repo.iter_rows(columns, since, batch_size)
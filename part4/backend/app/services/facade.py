@@ -1,8 +1,10 @@
+from datetime import timedelta
 from app.persistence.repository import SQLAlchemyRepository
 from app.services.user_service import UserService
 from app.services.amenity_service import AmenityService
 from app.services.place_service import PlaceService
 from app.services.review_service import ReviewService
+from app.services.export_service import ExportService
 from app.models.user import User
 from app.models.place import Place
 from app.models.review import Review
@@ -11,23 +13,32 @@ from app.persistence.user_repository import UserRepository
 from app.persistence.place_repository import PlaceRepository
 from app.persistence.amenity_repository import AmenityRepository
 from app.persistence.review_repository import ReviewRepository
+from app.persistence.cache import CachedRepository, repository_cache
+from app.persistence.unit_of_work import transactional
+from app.utils.rate_limit import login_limiter
 
 class HBnBFacade:
+    """
+    Entry point of the API layer. Methods that write run in a unit of
+    work (@transactional): one commit per call, rolled back on error.
+    """
     def __init__(self):
-        # shared repo
-        self.user_repo = UserRepository()
-        self.place_repo = PlaceRepository()
-        self.review_repo = ReviewRepository()
-        self.amenity_repo = AmenityRepository()
+        # shared repo, get() served through the read-through cache
+        self.user_repo = CachedRepository(UserRepository())
+        self.place_repo = CachedRepository(PlaceRepository())
+        self.review_repo = CachedRepository(ReviewRepository())
+        self.amenity_repo = CachedRepository(AmenityRepository())
 
         # services using shared repos
         self.user_service = UserService(self.user_repo)
         self.amenity_service = AmenityService(self.amenity_repo)
         self.place_service = PlaceService(self.place_repo, self.user_repo, self.amenity_repo, self.review_repo)
         self.review_service = ReviewService(self.place_repo, self.user_repo, self.review_repo)
+        self.export_service = ExportService(self.place_repo, self.review_repo, self.user_repo)
         
     """ User CRU """
     # Placeholder method for creating a user
+    @transactional
     def create_user(self, user_data):
         # Logic will be implemented in later tasks
         return self.user_service.create_user(user_data)
@@ -40,32 +51,54 @@ class HBnBFacade:
     def get_user_by_email(self, email):
         return self.user_service.get_user_by_email(email)
 
+    # check login credentials
+    @transactional
+    def authenticate(self, email, password):
+        return self.user_service.authenticate(email, password)
+
     # get all users
     def get_all_users(self):
         return self.user_service.get_all_users()
 
     # update user
+    @transactional
     def update_user(self, user_id, user_data):
         return self.user_service.update_user(user_id, user_data)
 
     """ Place CRU """
     # Create place
+    @transactional
     def create_place(self, place_data):
         return self.place_service.create_place(place_data)
 
+    # Import many places in chunks, with a per-row error report
+    @transactional
+    def bulk_import_places(self, rows, chunk_size=1000):
+        return self.place_service.bulk_import_places(rows, chunk_size)
+
     # Get all places
-    def list_places(self):
-        return self.place_service.list_places()
+    def list_places(self, limit=None, after=None):
+        return self.place_service.list_places(limit, after)
+
+    # Get places near a point
+    def get_places_nearby(self, latitude, longitude, radius_km, limit=20):
+        return self.place_service.get_places_nearby(latitude, longitude, radius_km, limit)
+
+    # Search places with filters and facet counts
+    def search_places(self, criteria, sort="newest", limit=20, offset=0, facets=True):
+        return self.place_service.search_places(criteria, sort, limit, offset, facets)
 
     # Get a Place
     def get_place(self, place_id):
         return self.place_service.get_place(place_id)
 
     # Update Place
+    @transactional
     def update_place(self, place_id, place_data):
         return self.place_service.update_place(place_id, place_data)
 
     # Delete Place
+    @transactional
     def delete_place(self, place_id):
         return self.place_service.delete_place(place_id)
     
@@ -73,8 +106,25 @@ class HBnBFacade:
     def get_average_rating(self, place_id):
         return self.place_service.get_average_rating_for_place(place_id)
 
+    # Get average rating and review count of many places
+    def get_rating_summaries(self, place_ids):
+        return self.place_service.get_rating_summaries(place_ids)
+
+    # Versions for ETags
+    def get_place_version(self, place):
+        return self.place_service.get_place_version(place)
+
+    def get_places_version(self):
+        return self.place_service.get_listing_version()
+
+    # Recompute stored rating totals (drift repair)
+    @transactional
+    def rebuild_rating_totals(self):
+        return self.place_service.rebuild_rating_totals()
+
     """ Amenity CRU """
     # create amenity
+    @transactional
     def create_amenity(self, amenity_data):
         return self.amenity_service.create_amenity(amenity_data)
 
@@ -86,15 +136,22 @@ class HBnBFacade:
     def get_all_amenities(self):
         return self.amenity_service.get_all_amenities()
     
+    # version of the amenity list, for ETags
+    def get_amenities_version(self):
+        return self.amenity_service.get_amenities_version()
+
     # update amenity
+    @transactional
     def update_amenity(self, amenity_id, amenity_data):
         return self.amenity_service.update_amenity(amenity_id, amenity_data)
     
     # delete amenity
+    @transactional
     def delete_amenity(self, amenity_id):
         return self.amenity_service.delete_amenity(amenity_id)
 
     """Review CRU"""
+    @transactional
     def create_review(self, review_data):
         """Create and save a review."""
         return self.review_service.create_review(review_data)
@@ -115,19 +172,52 @@ class HBnBFacade:
         """Fetch all reviews for a specific place."""
         return self.review_service.get_reviews_for_place(place_id)
 
+    def get_place_reviews_version(self, place_id):
+        """Version of a place's review list, for ETags."""
+        return self.review_service.get_place_reviews_version(place_id)
+
+    def serialize_reviews(self, reviews):
+        """Serialize reviews with their users and places loaded in bulk."""
+        return self.review_service.serialize_reviews(reviews)
+
+    @transactional
     def update_review(self, review_id, review_data, current_user, is_admin=False):
         """User updates a review of a specific place."""
         return self.review_service.update_review(review_id, review_data, current_user, is_admin)
 
+    @transactional
     def delete_review(self, review_id, current_user, is_admin=False):
         """User deletes a review."""
         return self.review_service.delete_review(review_id, current_user, is_admin)
 
 
+    """Exports"""
+    def export_rows(self, name, since=None, batch_size=1000, overlap=timedelta(0)):
+        """(columns, watermark, lazily fetched row batches) of a table export."""
+        return self.export_service.export_rows(name, since, batch_size, overlap)
+
+    """Repository cache"""
+    def get_cache_stats(self):
+        """Hit / miss / invalidation counters of the repository cache."""
+        return repository_cache.stats()
+
+    """Login rate limiter"""
+    def get_rate_limit_stats(self):
+        """Allowed / rejected login attempt counters."""
+        return login_limiter.stats()
+
     # Place add_amenity entry point
+    @transactional
     def add_amenity_to_place(self, place_id, amenity_id):
         return self.place_service.add_amenity_to_place(place_id, amenity_id)
+
+    # add several amenities to a place at once
+    @transactional
+    def add_amenities_to_place(self, place_id, amenity_ids):
+        return self.place_service.add_amenities_to_place(place_id, amenity_ids)
+
     # Place add_review entry
+    @transactional
     def add_review_to_place(self, place_id, review_id):
         return self.place_service.add_review_to_place(place_id, review_id)
 
@@ -1,5 +1,17 @@
 from app.models.place import Place
-from app import db
+from datetime import datetime
+from sqlalchemy.exc import SQLAlchemyError
+import uuid
+
+MAX_PAGE_SIZE = 100
+MAX_NEARBY_RADIUS_KM = 500
+SEARCH_SORTS = ("newest", "price_asc", "price_desc", "rating_desc")
+BULK_IMPORT_FIELDS = {
+    "owner_id", "title", "description", "price", "address",
+    "latitude", "longitude", "image_url", "amenity_ids",
+}
+BULK_IMPORT_REQUIRED = ("owner_id", "title", "price", "latitude", "longitude")
+MAX_BULK_CHUNK_SIZE = 10000
 
 
 class PlaceService():
@@ -40,10 +52,103 @@ class PlaceService():
                 if amenity:
                     # call the helper method from model
                     place.add_amenity(amenity)
-        # Repository add() already commits the session
-        db.session.commit()
         return place
 
+    # ---------- Bulk Import ----------
+    def bulk_import_places(self, rows, chunk_size=1000):
+        """
+        Import many places at once. rows is an iterable of (row_number,
+        data) where data is a dict, or an Exception if the row could not
+        be parsed.
+
+        Rows go through the Place validators, owners and amenities are
+        resolved with one IN query each per chunk, and each chunk is
+        inserted with executemany in its own savepoint. A bad row is
+        reported and skipped; the rest of the batch is kept.
+        Returns {"created": [(row_number, place_id)], "errors": [(row_number, message)]}.
+        """
+        if not isinstance(chunk_size, int) or not (1 <= chunk_size <= MAX_BULK_CHUNK_SIZE):
+            raise ValueError(f"400: chunk_size must be between 1 and {MAX_BULK_CHUNK_SIZE}")
+
+        report = {"created": [], "errors": []}
+        chunk = []
+        for row_number, data in rows:
+            try:
+                chunk.append((row_number, *self._validate_bulk_row(data)))
+            except (TypeError, ValueError) as e:
+                report["errors"].append((row_number, str(e)))
+            if len(chunk) == chunk_size:
+                self._import_chunk(chunk, report)
+                chunk = []
+        if chunk:
+            self._import_chunk(chunk, report)
+
+        report["errors"].sort()
+        return report
+
+    @staticmethod
+    def _validate_bulk_row(data):
+        """Return (place row dict, amenity ids) or raise ValueError / TypeError"""
+        if isinstance(data, Exception):
+            raise ValueError(f"Invalid JSON: {data}")
+        if not isinstance(data, dict):
+            raise ValueError("Row must be a JSON object")
+        unknown = set(data) - BULK_IMPORT_FIELDS
+        if unknown:
+            raise ValueError(f"Unknown field(s): {', '.join(sorted(unknown))}")
+        missing = [key for key in BULK_IMPORT_REQUIRED if data.get(key) is None]
+        if missing:
+            raise ValueError(f"Missing field(s): {', '.join(missing)}")
+
+        fields = dict(data)
+        amenity_ids = fields.pop("amenity_ids", None) or []
+        if not isinstance(amenity_ids, list):
+            raise ValueError("amenity_ids must be a list")
+
+        # same rules as create_place: the Place validators
+        place = Place(**fields)
+        now = datetime.utcnow()
+        row = {column.key: getattr(place, column.key) for column in Place.__table__.columns}
+        row.update(id=str(uuid.uuid4()), created_at=now, updated_at=now, rating_sum=0, rating_count=0)
+        return row, list(dict.fromkeys(str(v) for v in amenity_ids))
+
+    def _import_chunk(self, chunk, report):
+        """Resolve references of one chunk, then insert it"""
+        owners = self.user_repo.get_existing_ids(row["owner_id"] for _, row, _ in chunk)
+        amenities = self.amenity_repo.get_existing_ids(a for _, _, ids in chunk for a in ids)
+
+        valid = []
+        for row_number, row, amenity_ids in chunk:
+            missing = [a for a in amenity_ids if a not in amenities]
+            if row["owner_id"] not in owners:
+                report["errors"].append((row_number, "Owner (owner_id) not found"))
+            elif missing:
+                report["errors"].append((row_number, f"Amenity not found: {', '.join(missing)}"))
+            else:
+                valid.append((row_number, row, amenity_ids))
+        if not valid:
+            return
+
+        try:
+            self._insert_rows(valid)
+        except SQLAlchemyError:
+            # isolate the offending rows, one savepoint each
+            for item in valid:
+                try:
+                    self._insert_rows([item])
+                except SQLAlchemyError as e:
+                    report["errors"].append((item[0], f"Database error: {e.orig if hasattr(e, 'orig') else e}"))
+                else:
+                    report["created"].append((item[0], item[1]["id"]))
+        else:
+            report["created"].extend((row_number, row["id"]) for row_number, row, _ in valid)
+
+    def _insert_rows(self, items):
+        self.place_repo.insert_places(
+            [row for _, row, _ in items],
+            [(row["id"], amenity_id) for _, row, amenity_ids in items for amenity_id in amenity_ids],
+        )
+
     # ---------- Read Place ----------
     def get_place(self, place_id):
         place = self.place_repo.get(place_id)
@@ -52,15 +157,110 @@ class PlaceService():
         return place
 
     # ---------- List All Places ----------
-    def list_places(self):
+    def list_places(self, limit=None, after=None):
         """
-        Return a list[Place] of all places in the repository.
+        Return (rows, next_cursor) where rows are
+        (Place, average_rating, review_count) tuples.
+        Without a limit every place is returned and next_cursor is None.
+        With a limit, places are paged by (created_at, id); pass the
+        returned next_cursor as after to get the following page.
         """
-        places = self.place_repo.get_all()
-        if not places:
+        if limit is not None:
+            if not isinstance(limit, int) or limit < 1:
+                raise ValueError("400: limit must be a positive integer")
+            limit = min(limit, MAX_PAGE_SIZE)
+
+        key = self._decode_cursor(after) if after else None
+
+        # fetch one extra row to know whether there is a next page
+        rows = self.place_repo.get_places_page(
+            limit + 1 if limit is not None else None, key
+        )
+        if not rows and key is None:
             raise ValueError("404: Places not found")
-        return places
 
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = self._encode_cursor(rows[-1][0])
+        return rows, next_cursor
+
+    @staticmethod
+    def _encode_cursor(place):
+        """Cursor is '<created_at iso>,<id>' of the last place in a page"""
+        created_at = place.created_at.isoformat() if place.created_at else ""
+        return f"{created_at},{place.id}"
+
+    @staticmethod
+    def _decode_cursor(cursor):
+        created_at, sep, place_id = cursor.partition(",")
+        if not sep or not place_id:
+            raise ValueError("400: Invalid cursor")
+        try:
+            created_at = datetime.fromisoformat(created_at) if created_at else None
+        except ValueError:
+            raise ValueError("400: Invalid cursor")
+        return created_at, place_id
+
+
+    # ---------- Nearby Places ----------
+    def get_places_nearby(self, latitude, longitude, radius_km, limit=20):
+        """
+        Return [(Place, distance_km)] within radius_km of a point,
+        sorted by distance.
+        """
+        if not (-90.0 <= latitude <= 90.0):
+            raise ValueError("400: Latitude must be between -90.0 and 90.0")
+        if not (-180.0 <= longitude <= 180.0):
+            raise ValueError("400: Longitude must be between -180.0 and 180.0")
+        if not (0 < radius_km <= MAX_NEARBY_RADIUS_KM):
+            raise ValueError(f"400: radius_km must be between 0 and {MAX_NEARBY_RADIUS_KM}")
+        if limit < 1:
+            raise ValueError("400: limit must be a positive integer")
+
+        return self.place_repo.get_places_nearby(
+            latitude, longitude, radius_km, min(limit, MAX_PAGE_SIZE)
+        )
+
+    # ---------- Search Places ----------
+    def search_places(self, criteria, sort="newest", limit=20, offset=0, facets=True):
+        """
+        Search places by any combination of price range, bounding box,
+        required amenity ids and minimum average rating.
+        Returns (rows, total, facets) where rows are
+        (Place, average_rating, review_count) tuples.
+        """
+        min_price, max_price = criteria.get("min_price"), criteria.get("max_price")
+        if min_price is not None and min_price < 0:
+            raise ValueError("400: min_price must be a positive number")
+        if min_price is not None and max_price is not None and min_price > max_price:
+            raise ValueError("400: min_price cannot exceed max_price")
+
+        bbox = criteria.get("bbox")
+        if bbox is not None:
+            min_lat, max_lat, min_lon, max_lon = bbox
+            if not (-90.0 <= min_lat <= max_lat <= 90.0):
+                raise ValueError("400: bbox latitudes must satisfy -90 <= min_lat <= max_lat <= 90")
+            if not (-180.0 <= min_lon <= max_lon <= 180.0):
+                raise ValueError("400: bbox longitudes must satisfy -180 <= min_lon <= max_lon <= 180")
+
+        min_rating = criteria.get("min_rating")
+        if min_rating is not None and not (1 <= min_rating <= 5):
+            raise ValueError("400: min_rating must be between 1 and 5")
+
+        if criteria.get("amenity_ids"):
+            criteria["amenity_ids"] = list(dict.fromkeys(str(v) for v in criteria["amenity_ids"]))
+
+        if sort not in SEARCH_SORTS:
+            raise ValueError(f"400: sort must be one of {', '.join(SEARCH_SORTS)}")
+        if limit < 1:
+            raise ValueError("400: limit must be a positive integer")
+        if offset < 0:
+            raise ValueError("400: offset cannot be negative")
+
+        rows, total = self.place_repo.search_places(criteria, sort, min(limit, MAX_PAGE_SIZE), offset)
+        facet_counts = self.place_repo.get_search_facets(criteria) if facets else None
+        return rows, total, facet_counts
 
     # ---------- Update ----------
     def update_place(self, place_id, place_data:dict):
@@ -91,39 +291,54 @@ class PlaceService():
                 setattr(place, key, value)               # validate by setter
                 update_data[key] = getattr(place, key)   # assign the valiadated value to repo
 
-        # Update amenities through the relationship if provided
+        # Replace the amenities if provided (unknown ids are ignored)
         if amenity_ids is not None and self.amenity_repo:
-            # Remove duplicates
-            unique_amenity_ids = list(dict.fromkeys(str(v) for v in amenity_ids))
-            # Clear existing amenities and add new ones
-            place.amenities.clear()
-            for amenity_id in unique_amenity_ids:
-                amenity = self.amenity_repo.get(amenity_id)
-                if amenity:
-                    place.add_amenity(amenity)
+            self._link_amenities(place, amenity_ids, replace=True)
 
         # update repo（update(obj_id, data)）
         self.place_repo.update(place.id, update_data)
-        db.session.commit()
         return place
 
     # ---------- Relationship: Amenity ----------
-    def add_amenity_to_place(self, place_id, amenity_id):
-        """Add an amenity to a place through the SQLAlchemy relationship"""
-        place = self.get_place(place_id)
-        # Validate amenity exists
-        if self.amenity_repo and amenity_id:
-            amenity = self.amenity_repo.get(amenity_id)
-            if not amenity:
-                raise ValueError(f"Amenity with id {amenity_id} not found")
+    def _link_amenities(self, place, amenity_ids, replace=False, strict=False):
+        """
+        Diff amenity_ids against the place's current amenities: only ids
+        not linked yet are looked up, with one IN query, and the links
+        change with one bulk INSERT / DELETE on place_amenity. With
+        replace, current links missing from amenity_ids are removed.
+        Unknown ids are skipped, or raise ValueError with strict.
+        Nothing is committed.
+        """
+        wanted = list(dict.fromkeys(str(v) for v in amenity_ids))
+        current = {amenity.id for amenity in place.amenities}
+        new = [amenity_id for amenity_id in wanted if amenity_id not in current]
+        existing = self.amenity_repo.get_existing_ids(new)
+        unknown = [amenity_id for amenity_id in new if amenity_id not in existing]
+        if strict and unknown:
+            raise ValueError(f"Amenity with id {', '.join(unknown)} not found")
 
-            # Check if amenity is already associated with this place
-            if amenity not in place.amenities:
-                place.add_amenity(amenity)
-                db.session.commit()
+        added = [amenity_id for amenity_id in new if amenity_id in existing]
+        removed = current.difference(wanted) if replace else set()
+        if added or removed:
+            self.place_repo.update_amenity_links(place, added, removed)
+            # association rows alone do not touch the places row
+            place.updated_at = datetime.utcnow()
 
+    def add_amenities_to_place(self, place_id, amenity_ids):
+        """Add several amenities to a place; every id must exist"""
+        if not isinstance(amenity_ids, list):
+            raise ValueError("amenity_ids must be a list")
+        place = self.get_place(place_id)
+        if self.amenity_repo and amenity_ids:
+            self._link_amenities(place, amenity_ids, strict=True)
         return place
 
+    def add_amenity_to_place(self, place_id, amenity_id):
+        """Add an amenity to a place"""
+        if not amenity_id:
+            return self.get_place(place_id)
+        return self.add_amenities_to_place(place_id, [amenity_id])
+
     # ---------- Relationship Method: Review ----------
     def add_review_to_place(self, place_id, review_id):
     # Reviews are now created with place_id directly, establishing the relationship
@@ -141,7 +356,6 @@ class PlaceService():
             raise ValueError(f"Review with id {review_id} not found")
 
         place.add_review(review)
-        db.session.commit()
         return place
 
     # ---------- Delete Place ----------
@@ -166,3 +380,28 @@ class PlaceService():
         """Calculate the average rating for a place"""
         avg = self.place_repo.get_average_rating_for_place(place_id)
         return float(avg) if avg is not None else 0
+
+    def get_rating_summaries(self, place_ids):
+        """Return {place_id: (average_rating, review_count)} for many places at once"""
+        return self.place_repo.get_rating_summaries(place_ids)
+
+    def rebuild_rating_totals(self):
+        """Recompute every place's stored rating totals from its reviews"""
+        return self.place_repo.rebuild_rating_totals()
+
+    # ---------- Versions for conditional GET ----------
+    def get_place_version(self, place):
+        """Everything a single place response is built from"""
+        owner = place.owner
+        return (
+            place.id,
+            place.updated_at,
+            place.rating_sum,
+            place.rating_count,
+            owner.updated_at if owner else None,
+            sorted((a.id, a.updated_at) for a in place.amenities),
+        )
+
+    def get_listing_version(self):
+        """Cheap version of the whole place listing"""
+        return self.place_repo.get_listing_version()
@@ -23,6 +23,8 @@ class ReviewService():
             text=review_data["text"]
         )
 
+        # Keep the place's rating totals in the same transaction
+        place.adjust_rating_totals(review.rating, 1)
         self.review_repo.add(review)
         return review
     
@@ -47,6 +49,24 @@ class ReviewService():
     def get_reviews_for_place(self, place_id):
         """Fetch all reviews for a specific place (by ID)."""
         return self.review_repo.get_reviews_for_place(place_id)
+
+    def get_place_reviews_version(self, place_id):
+        """Cheap version of a place's review list, for conditional GET"""
+        return self.review_repo.get_place_reviews_version(place_id)
+
+    def serialize_reviews(self, reviews):
+        """
+        Serialize a list of reviews.
+        Users and places are loaded with one IN query each instead of
+        two lookups per review.
+        """
+        users = {u.id: u for u in self.user_repo.get_by_ids(r.user_id for r in reviews)}
+        places = {p.id: p for p in self.place_repo.get_by_ids(r.place_id for r in reviews)}
+
+        return [
+            r.to_dict(user=users.get(r.user_id), place=places.get(r.place_id))
+            for r in reviews
+        ]
   
     def update_review(self, review_id, review_data, current_user, is_admin=False):
         """
@@ -57,6 +77,13 @@ class ReviewService():
         if not is_admin and str(review.user_id) != str(current_user):
             raise PermissionError("Unauthorised action")
 
+        old_rating = review.rating
+        new_rating = review_data.get("rating", old_rating)
+        if new_rating != old_rating:
+            place = self.place_repo.get(review.place_id)
+            if place:
+                place.adjust_rating_totals(new_rating - old_rating, 0)
+
         self.review_repo.update(review_id, review_data)
         return review
 
@@ -67,6 +94,10 @@ class ReviewService():
         if not is_admin and str(review.user_id) != str(current_user):
             raise PermissionError("Unauthorized action.")
 
+        place = self.place_repo.get(review.place_id)
+        if place:
+            place.adjust_rating_totals(-review.rating, -1)
+
         self.review_repo.delete(review_id)
         return True
 
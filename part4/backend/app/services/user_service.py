@@ -1,5 +1,6 @@
 from app.models.user import User
 from app import db
+from app.utils.passwords import password_hasher
 
 class UserService:
     def __init__(self, user_repo):
@@ -15,6 +16,25 @@ class UserService:
         self.user_repo.add(user)
         return user
 
+    # Check credentials
+    def authenticate(self, email, password):
+        """
+        Return the user if email and password match, else None.
+        A hash made with a lower cost than BCRYPT_LOG_ROUNDS is replaced
+        while the plain password is at hand.
+        """
+        user = self.user_repo.get_by_attribute('email', email)
+        if not user:
+            # same bcrypt work as a wrong password: timing does not tell
+            # whether the email exists
+            password_hasher.verify_dummy(password)
+            return None
+        if not user.verify_password(password):
+            return None
+        if user.password_needs_rehash():
+            user.hash_password(password)
+        return user
+
     # Get User by ID
     def get_user(self, user_id):
         user = self.user_repo.get(user_id)
@@ -61,7 +81,7 @@ class UserService:
             if key in user_data and user_data[key] is not None:
                 setattr(user, key, user_data[key])
 
-        db.session.commit()
+        db.session.flush()
 
         return user
 
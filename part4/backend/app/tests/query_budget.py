@@ -0,0 +1,18 @@
+"""
+Query-count assertions for endpoint tests.
+
+Responses carry the number of SQL statements the request ran in the
+X-DB-Queries header (DB_STATS_HEADERS, on in TestingConfig), so an N+1
+regression shows up as a budget overrun instead of a slow page.
+"""
+
+
+class QueryBudgetMixin:
+    """Mix into a unittest.TestCase"""
+    def assertMaxQueries(self, response, max_queries, msg=None):
+        queries = int(response.headers["X-DB-Queries"])
+        self.assertLessEqual(
+            queries, max_queries,
+            msg or f"{response.request.method} {response.request.full_path.rstrip('?')}: "
+                   f"{queries} queries, budget is {max_queries}",
+        )
@@ -0,0 +1,112 @@
+import csv
+import io
+import json
+import unittest
+from datetime import datetime, timedelta, timezone
+from flask_jwt_extended import create_access_token
+from app import create_app, db
+from app.models.user import User
+from app.models.place import Place
+
+
+class TestAdminExport(unittest.TestCase):
+    """ GET /api/v1/export/<name> """
+    def setUp(self):
+        self.app = create_app("config.TestingConfig")
+        self.client = self.app.test_client()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+        owner = User(first_name="Owner", last_name="User", email="owner@example.com", password="secret-hash")
+        db.session.add(owner)
+        db.session.flush()
+        self.old = datetime(2024, 1, 1)
+        for i in range(5):
+            place = Place(title=f"Place {i}", price=10 + i, latitude=-37.8, longitude=145.0, owner_id=owner.id)
+            # the first two were last changed long ago
+            if i < 2:
+                place.updated_at = self.old
+            db.session.add(place)
+        db.session.commit()
+        self.admin = {"Authorization": f"Bearer {create_access_token(identity=owner.id, additional_claims={'is_admin': True})}"}
+        self.user = {"Authorization": f"Bearer {create_access_token(identity=owner.id)}"}
+        db.session.remove()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_ndjson_streamed_in_batches(self):
+        response = self.client.get('/api/v1/export/places?batch_size=2', headers=self.admin, buffered=False)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, "application/x-ndjson")
+        self.assertTrue(response.is_streamed)
+        chunks = [chunk for chunk in response.response if chunk]
+        response.close()
+        self.assertEqual(len(chunks), 3)
+
+        rows = [json.loads(line) for line in b"".join(chunks).decode().splitlines()]
+        self.assertEqual(sorted(r["title"] for r in rows), [f"Place {i}" for i in range(5)])
+        self.assertIn("geohash", rows[0])
+
+    def test_since_is_incremental(self):
+        since = (self.old + timedelta(days=1)).isoformat()
+        response = self.client.get(f'/api/v1/export/places?since={since}', headers=self.admin)
+        titles = sorted(json.loads(line)["title"] for line in response.data.decode().splitlines())
+        self.assertEqual(titles, ["Place 2", "Place 3", "Place 4"])
+
+        # the newest updated_at exported, set back by the overlap
+        newest = max(p.updated_at for p in Place.query)
+        overlap = timedelta(seconds=self.app.config["EXPORT_WATERMARK_OVERLAP"])
+        watermark = response.headers["X-Export-Watermark"]
+        self.assertEqual(datetime.fromisoformat(watermark), newest - overlap)
+
+        # stamped before the newest exported row, committed after the export
+        late = Place(title="Late", price=10, latitude=-37.8, longitude=145.0, owner_id=Place.query.first().owner_id)
+        late.updated_at = newest - timedelta(seconds=1)
+        db.session.add(late)
+        db.session.commit()
+        response = self.client.get(f'/api/v1/export/places?since={watermark}', headers=self.admin)
+        titles = sorted(json.loads(line)["title"] for line in response.data.decode().splitlines())
+        self.assertEqual(titles, ["Late", "Place 2", "Place 3", "Place 4"])
+
+    def test_since_with_a_timezone(self):
+        since = (self.old + timedelta(days=1)).replace(tzinfo=timezone.utc)
+        for value in (since.isoformat(), since.astimezone(timezone(timedelta(hours=2))).isoformat(),
+                      since.strftime("%Y-%m-%dT%H:%M:%S.%fZ")):
+            response = self.client.get('/api/v1/export/places', query_string={"since": value},
+                                       headers=self.admin)
+            self.assertEqual(response.status_code, 200, value)
+            titles = sorted(json.loads(line)["title"] for line in response.data.decode().splitlines())
+            self.assertEqual(titles, ["Place 2", "Place 3", "Place 4"], value)
+
+    def test_watermark_does_not_go_back_before_since(self):
+        since = datetime(2100, 1, 1).isoformat()
+        response = self.client.get(f'/api/v1/export/places?since={since}', headers=self.admin)
+        self.assertEqual(response.data, b"")
+        self.assertEqual(response.headers["X-Export-Watermark"], since)
+
+    def test_csv_users_without_passwords(self):
+        response = self.client.get('/api/v1/export/users?format=csv', headers=self.admin)
+        self.assertEqual(response.mimetype, "text/csv")
+        rows = list(csv.DictReader(io.StringIO(response.data.decode())))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["email"], "owner@example.com")
+        self.assertNotIn("password", rows[0])
+
+    def test_csv_header_when_empty(self):
+        response = self.client.get('/api/v1/export/reviews?format=csv', headers=self.admin)
+        self.assertEqual(response.data.decode().splitlines()[0].split(",")[0], "rating")
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.client.get('/api/v1/export/places', headers=self.user).status_code, 403)
+        self.assertEqual(self.client.get('/api/v1/export/secrets', headers=self.admin).status_code, 404)
+        for query in ("format=xml", "since=yesterday", "batch_size=0"):
+            response = self.client.get(f'/api/v1/export/places?{query}', headers=self.admin)
+            self.assertEqual(response.status_code, 400, query)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
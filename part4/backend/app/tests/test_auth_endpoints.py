@@ -0,0 +1,183 @@
+import unittest
+from concurrent.futures import Future
+from unittest import mock
+from flask_jwt_extended import create_access_token
+from app import create_app, db
+from app.models.user import User
+from app.utils.passwords import password_hasher
+from app.utils.rate_limit import MemoryBuckets, login_limiter, parse_rate
+
+# hash from seed_data.sql (cost 12, 2a prefix), password admin1234
+SEED_HASH = '$2a$12$moBmzGGpareXoBAzBkLj5enYx6gjUtyJnDlCIwGQBakWzA8xVgDby'
+
+
+class TestLoginPasswordHashing(unittest.TestCase):
+    """ POST /api/v1/auth/login with the password hashing service """
+    def setUp(self):
+        self.app = create_app("config.TestingConfig")
+        self.client = self.app.test_client()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+        user = User(first_name="Jane", last_name="Smith", email="jane@example.com", password="x")
+        user.hash_password("secret123")
+        db.session.add(user)
+        db.session.commit()
+        self.user_id = user.id
+        db.session.remove()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+        password_hasher.shutdown()
+
+    def login(self, email="jane@example.com", password="secret123"):
+        return self.client.post('/api/v1/auth/login', json={"email": email, "password": password})
+
+    def stored_hash(self):
+        db.session.remove()
+        return db.session.get(User, self.user_id).password
+
+    def test_login(self):
+        self.assertEqual(self.login().status_code, 200)
+        self.assertEqual(self.login(password="wrong").status_code, 401)
+        self.assertEqual(self.login(email="nobody@example.com").status_code, 401)
+
+    def test_configured_cost(self):
+        self.assertTrue(self.stored_hash().startswith("$2b$04$"))
+
+    def test_rehash_on_login_when_cost_raised(self):
+        self.app.config["BCRYPT_LOG_ROUNDS"] = 5
+        password_hasher.init_app(self.app)
+        old = self.stored_hash()
+
+        self.assertEqual(self.login().status_code, 200)
+        new = self.stored_hash()
+        self.assertNotEqual(new, old)
+        self.assertTrue(new.startswith("$2b$05$"))
+
+        # already at the target cost: left alone
+        self.assertEqual(self.login().status_code, 200)
+        self.assertEqual(self.stored_hash(), new)
+
+    def test_existing_seed_hashes_still_verify(self):
+        self.assertTrue(password_hasher.verify(SEED_HASH, "admin1234"))
+        self.assertFalse(password_hasher.verify(SEED_HASH, "admin12345"))
+        self.assertFalse(password_hasher.needs_rehash(SEED_HASH.replace("$12$", "$13$")))
+
+    def test_process_pool(self):
+        self.app.config["PASSWORD_HASH_WORKERS"] = 1
+        password_hasher.init_app(self.app)
+        hashed = password_hasher.hash("pooled")
+        self.assertTrue(password_hasher.verify(hashed, "pooled"))
+        self.assertFalse(password_hasher.verify(hashed, "other"))
+
+    def test_full_queue_is_503(self):
+        self.app.config.update(PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_MAX_PENDING=1, PASSWORD_HASH_TIMEOUT=0.01)
+        password_hasher.init_app(self.app)
+        password_hasher._slots.acquire()
+        try:
+            response = self.login()
+        finally:
+            password_hasher._slots.release()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers["Retry-After"], "1")
+
+    def test_hashing_timeout_is_503(self):
+        self.app.config.update(PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_TIMEOUT=0.01)
+        password_hasher.init_app(self.app)
+        stuck = Future()
+        pool = mock.Mock(**{"submit.return_value": stuck})
+        with mock.patch.object(password_hasher, "_executor", return_value=pool):
+            response = self.login()
+        self.assertEqual(response.status_code, 503)
+        self.assertIn("longer than", response.get_json()["error"])
+        self.assertTrue(stuck.cancelled())
+        # the slot was given back
+        self.assertEqual(password_hasher._slots._value, password_hasher._max_pending)
+
+
+class TestLoginRateLimit(unittest.TestCase):
+    """ Token buckets on POST /api/v1/auth/login """
+    def setUp(self):
+        self.app = create_app("config.TestingConfig")
+        self.app.config.update(RATELIMIT_LOGIN_PER_IP="6/minute", RATELIMIT_LOGIN_PER_EMAIL="3/minute")
+        login_limiter.init_app(self.app)
+        self.client = self.app.test_client()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+        user = User(first_name="Jane", last_name="Smith", email="jane@example.com", password="x", is_admin=True)
+        user.hash_password("secret123")
+        db.session.add(user)
+        db.session.commit()
+        self.admin = {"Authorization": f"Bearer {create_access_token(identity=user.id, additional_claims={'is_admin': True})}"}
+        db.session.remove()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def login(self, email, password="wrong", ip="10.0.0.1"):
+        return self.client.post('/api/v1/auth/login', json={"email": email, "password": password},
+                                environ_base={"REMOTE_ADDR": ip})
+
+    def test_per_email_limit(self):
+        for _ in range(3):
+            self.assertEqual(self.login("jane@example.com").status_code, 401)
+        response = self.login(" Jane@Example.com", "secret123", ip="10.0.0.2")
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response.headers["Retry-After"]), 1)
+        # other accounts are not affected
+        self.assertEqual(self.login("other@example.com").status_code, 401)
+
+    def test_per_ip_limit(self):
+        for i in range(6):
+            self.assertEqual(self.login(f"user{i}@example.com").status_code, 401)
+        self.assertEqual(self.login("user9@example.com").status_code, 429)
+        self.assertEqual(self.login("user9@example.com", ip="10.0.0.2").status_code, 401)
+
+        stats = self.client.get('/api/v1/ratelimit/stats', headers=self.admin).get_json()
+        self.assertEqual(stats["rejected_ip"], 1)
+        self.assertEqual(stats["allowed"], 7)
+
+    def test_rejected_before_any_lookup(self):
+        for _ in range(3):
+            self.login("jane@example.com")
+        with mock.patch.object(password_hasher, "verify") as verify:
+            self.assertEqual(self.login("jane@example.com").status_code, 429)
+        verify.assert_not_called()
+
+    def test_unknown_email_runs_a_full_check(self):
+        with mock.patch.object(password_hasher, "verify", wraps=password_hasher.verify) as verify:
+            self.assertEqual(self.login("nobody@example.com").status_code, 401)
+        verify.assert_called_once()
+        self.assertFalse(password_hasher.needs_rehash(verify.call_args.args[0]))
+
+    def test_backend_errors_let_logins_through(self):
+        broken = mock.Mock()
+        broken.take.side_effect = ConnectionError("down")
+        with mock.patch.object(login_limiter, "backend", broken):
+            self.assertEqual(self.login("jane@example.com", "secret123").status_code, 200)
+        self.assertEqual(login_limiter.stats()["backend_errors"], 1)
+
+
+class TestMemoryBuckets(unittest.TestCase):
+    def test_refill(self):
+        now = [0.0]
+        buckets = MemoryBuckets(clock=lambda: now[0])
+        capacity, refill = parse_rate("2/minute")
+        self.assertEqual(buckets.take("k", capacity, refill), 0)
+        self.assertEqual(buckets.take("k", capacity, refill), 0)
+        self.assertAlmostEqual(buckets.take("k", capacity, refill), 30.0)
+        now[0] = 30.0
+        self.assertEqual(buckets.take("k", capacity, refill), 0)
+        self.assertGreater(buckets.take("k", capacity, refill), 0)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
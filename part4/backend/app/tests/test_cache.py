@@ -0,0 +1,270 @@
+import os
+import runpy
+import socketserver
+import threading
+import time
+import unittest
+from unittest import mock
+from sqlalchemy import event
+from app import create_app, db
+from app.models.user import User
+from app.persistence.cache import _DELETE_SCRIPT, _FILL_SCRIPT, LRUCache, RedisCache, repository_cache
+from app.persistence.unit_of_work import unit_of_work
+from app.services import facade
+from app.utils.resp import RespClient
+from config import ProductionConfig
+
+
+class TestRepositoryCache(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app("config.TestingConfig")
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+        user = User(first_name="Cached", last_name="User", email="cached@example.com", password="x")
+        db.session.add(user)
+        db.session.commit()
+        self.user_id = user.id
+        db.session.remove()
+
+        self.statements = []
+        event.listen(db.engine, "before_cursor_execute", self._count)
+
+    def tearDown(self):
+        event.remove(db.engine, "before_cursor_execute", self._count)
+        db.drop_all()
+        self.ctx.pop()
+
+    def _count(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def test_hit_skips_select_in_new_session(self):
+        facade.user_repo.get(self.user_id)
+        db.session.remove()
+        self.statements.clear()
+
+        user = facade.user_repo.get(self.user_id)
+        self.assertEqual(self.statements, [])
+        self.assertEqual(user.first_name, "Cached")
+        self.assertIn(user, db.session)
+        self.assertEqual(repository_cache.stats()["hits"], 1)
+
+    def test_cached_instance_can_be_updated(self):
+        facade.user_repo.get(self.user_id)
+        db.session.remove()
+
+        user = facade.user_repo.get(self.user_id)
+        user.first_name = "Changed"
+        db.session.commit()
+        db.session.remove()
+
+        self.assertEqual(db.session.get(User, self.user_id).first_name, "Changed")
+
+    def test_commit_invalidates(self):
+        facade.user_repo.get(self.user_id)
+        db.session.remove()
+
+        # change through the session, bypassing the repository
+        user = db.session.get(User, self.user_id)
+        user.last_name = "Renamed"
+        db.session.commit()
+        db.session.remove()
+
+        self.assertEqual(facade.user_repo.get(self.user_id).last_name, "Renamed")
+
+    def test_repository_update_and_delete_invalidate(self):
+        facade.user_repo.get(self.user_id)
+        db.session.remove()
+        with unit_of_work():
+            facade.user_repo.update(self.user_id, {"first_name": "Updated"})
+        db.session.remove()
+        self.assertEqual(facade.user_repo.get(self.user_id).first_name, "Updated")
+
+        with unit_of_work():
+            facade.user_repo.delete(self.user_id)
+        db.session.remove()
+        self.assertIsNone(facade.user_repo.get(self.user_id))
+
+    def test_row_read_before_a_commit_is_not_cached_after_it(self):
+        load = facade.user_repo.repository.get
+
+        def load_then_commit_elsewhere(obj_id):
+            user = load(obj_id)
+            # another request commits a change to the row and invalidates it
+            repository_cache.invalidate(User, obj_id)
+            return user
+
+        with mock.patch.object(facade.user_repo.repository, "get", side_effect=load_then_commit_elsewhere):
+            self.assertIsNotNone(facade.user_repo.get(self.user_id))
+        self.assertIsNone(repository_cache.get(User, self.user_id))
+
+        db.session.remove()
+        facade.user_repo.get(self.user_id)
+        self.assertIsNotNone(repository_cache.get(User, self.user_id))
+
+    def test_bulk_update_clears_cache(self):
+        facade.user_repo.get(self.user_id)
+        db.session.remove()
+        db.session.execute(db.update(User).values(first_name="Bulk"))
+        db.session.commit()
+        db.session.remove()
+        self.assertEqual(facade.user_repo.get(self.user_id).first_name, "Bulk")
+
+
+class TestLRUCache(unittest.TestCase):
+    def test_eviction_and_ttl(self):
+        cache = LRUCache(maxsize=2, ttl=0.05)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        time.sleep(0.06)
+        self.assertIsNone(cache.get("a"))
+
+    def test_fill_after_delete_or_clear_is_dropped(self):
+        cache = LRUCache(maxsize=2)
+        generation = cache.generation("a")
+        cache.delete("a")
+        cache.set("a", "stale", generation)
+        self.assertIsNone(cache.get("a"))
+        cache.set("a", "fresh", cache.generation("a"))
+        self.assertEqual(cache.get("a"), "fresh")
+
+        generation = cache.generation("b")
+        cache.clear()
+        cache.set("b", "stale", generation)
+        self.assertIsNone(cache.get("b"))
+
+        # deletes older than the last maxsize still drop the fill
+        generation = cache.generation("c")
+        cache.delete("c")
+        cache.delete("d", "e")
+        cache.set("c", "stale", generation)
+        self.assertIsNone(cache.get("c"))
+
+
+class _StandInHandler(socketserver.StreamRequestHandler):
+    """ Just enough of the Redis protocol for RedisCache """
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def handle(self):
+        store = self.server.store
+        while True:
+            args = self.read_command()
+            if args is None:
+                return
+            name = args[0].upper()
+            if name == b"GET":
+                value = store.get(args[1])
+                reply = b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+            elif name == b"MGET":
+                values = [store.get(k) for k in args[1:]]
+                reply = b"*%d\r\n" % len(values) + b"".join(
+                    b"$-1\r\n" if v is None else b"$%d\r\n%s\r\n" % (len(v), v) for v in values)
+            elif name == b"INCR":
+                store[args[1]] = b"%d" % (int(store.get(args[1], b"0")) + 1)
+                reply = b":%s\r\n" % store[args[1]]
+            elif name == b"EVALSHA":
+                reply = b"-NOSCRIPT No matching script\r\n"
+            elif name == b"EVAL":
+                # the two scripts of RedisCache, done in Python
+                script, keys = args[1].decode(), args[3:3 + int(args[2])]
+                argv = args[3 + int(args[2]):]
+                if script == _FILL_SCRIPT:
+                    if (store.get(keys[1], b"0"), store.get(keys[2], b"0")) == tuple(argv[:2]):
+                        store[keys[0]] = argv[2]
+                elif script == _DELETE_SCRIPT:
+                    for key, gen in zip(keys[::2], keys[1::2]):
+                        store.pop(key, None)
+                        store[gen] = b"%d" % (int(store.get(gen, b"0")) + 1)
+                reply = b":0\r\n"
+            elif name == b"SET":
+                store[args[1]] = args[2]
+                reply = b"+OK\r\n"
+            elif name == b"DEL":
+                reply = b":%d\r\n" % sum(store.pop(k, None) is not None for k in args[1:])
+            elif name == b"SCAN":
+                prefix = args[3].rstrip(b"*")
+                keys = [k for k in store if k.startswith(prefix)]
+                reply = b"*2\r\n$1\r\n0\r\n*%d\r\n" % len(keys)
+                reply += b"".join(b"$%d\r\n%s\r\n" % (len(k), k) for k in keys)
+            else:
+                reply = b"-ERR unknown command\r\n"
+            self.wfile.write(reply)
+
+
+class TestRedisCache(unittest.TestCase):
+    def setUp(self):
+        self.server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _StandInHandler)
+        self.server.daemon_threads = True
+        self.server.store = {}
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        host, port = self.server.server_address
+        self.client = RespClient(f"redis://{host}:{port}/0")
+        self.cache = RedisCache(self.client, ttl=60)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_round_trip_and_clear(self):
+        from datetime import datetime
+        row = {"id": "1", "created_at": datetime(2024, 1, 2, 3, 4, 5), "is_admin": False}
+        self.cache.set("users:1", row)
+        self.assertEqual(self.cache.get("users:1"), row)
+        self.cache.delete("users:1")
+        self.assertIsNone(self.cache.get("users:1"))
+
+        self.cache.set("users:2", {"id": "2"})
+        self.cache.clear()
+        self.assertEqual(list(self.server.store), [b"hbnb:cache:epoch"])
+
+    def test_fill_after_delete_or_clear_is_dropped(self):
+        generation = self.cache.generation("users:1")
+        self.cache.delete("users:1")
+        self.cache.set("users:1", {"id": "stale"}, generation)
+        self.assertIsNone(self.cache.get("users:1"))
+        self.cache.set("users:1", {"id": "fresh"}, self.cache.generation("users:1"))
+        self.assertEqual(self.cache.get("users:1"), {"id": "fresh"})
+
+        generation = self.cache.generation("users:2")
+        self.cache.clear()
+        self.cache.set("users:2", {"id": "stale"}, generation)
+        self.assertIsNone(self.cache.get("users:2"))
+
+    def test_unreachable_server_is_a_miss(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.client.close()
+        cache = RedisCache(RespClient("redis://127.0.0.1:1/0", timeout=0.1))
+        self.assertIsNone(cache.get("users:1"))
+
+
+class TestGunicornCacheCheck(unittest.TestCase):
+    """ gunicorn.conf.py refuses a per-process cache with several workers """
+    def load(self, **settings):
+        path = os.path.join(os.path.dirname(__file__), "..", "..", "gunicorn.conf.py")
+        with mock.patch.multiple(ProductionConfig, **settings):
+            return runpy.run_path(path)
+
+    def test_simple_cache_needs_a_single_worker(self):
+        with self.assertRaisesRegex(RuntimeError, "CACHE_TYPE=simple"):
+            self.load(SERVER_WORKERS=3, CACHE_TYPE="simple")
+        self.assertEqual(self.load(SERVER_WORKERS=1, CACHE_TYPE="simple")["workers"], 1)
+        self.assertEqual(self.load(SERVER_WORKERS=3, CACHE_TYPE="redis")["workers"], 3)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
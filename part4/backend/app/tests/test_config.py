@@ -0,0 +1,48 @@
+import os
+import shutil
+import tempfile
+import unittest
+from app import create_app, db
+from app.persistence.sqlite_pragmas import sqlite_pragmas
+from config import ProductionConfig, engine_options
+
+
+class TestDatabaseConfig(unittest.TestCase):
+    """ Engine options and SQLite PRAGMAs of the production configuration """
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def pragmas(self, config_class):
+        app = create_app(config_class)
+        with app.app_context():
+            with db.engine.connect() as connection:
+                pragmas = sqlite_pragmas.current(connection)
+            db.engine.dispose()
+        return pragmas
+
+    def test_engine_options(self):
+        options = engine_options("postgresql://hbnb@db/hbnb")
+        self.assertTrue(options["pool_pre_ping"])
+        self.assertGreater(options["pool_size"], 0)
+        self.assertLess(options["pool_recycle"], 8 * 3600)
+        self.assertEqual(engine_options("sqlite:///production.db"), {})
+
+    def test_production_sqlite_pragmas(self):
+        class Config(ProductionConfig):
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(self.tmp, 'hbnb.db')}"
+
+        pragmas = self.pragmas(Config)
+        self.assertEqual(pragmas["journal_mode"], "wal")
+        self.assertEqual(pragmas["synchronous"], 1)  # NORMAL
+        self.assertEqual(pragmas["mmap_size"], ProductionConfig.SQLITE_PRAGMAS["mmap_size"])
+        self.assertEqual(pragmas["busy_timeout"], ProductionConfig.SQLITE_PRAGMAS["busy_timeout"])
+
+    def test_testing_config_keeps_sqlite_defaults(self):
+        self.assertEqual(self.pragmas("config.TestingConfig")["synchronous"], 2)  # FULL
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
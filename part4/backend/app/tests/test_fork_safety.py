@@ -0,0 +1,76 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from app import create_app, db
+from app.models.amenity import Amenity
+from app.persistence.cache import repository_cache
+from app.utils.passwords import password_hasher
+from config import ProductionConfig
+
+
+@unittest.skipUnless(hasattr(os, "fork"), "needs os.fork")
+class TestForkSafety(unittest.TestCase):
+    """ A forked server worker does not reuse the parent's connections """
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+        class Config(ProductionConfig):
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(self.tmp, 'hbnb.db')}"
+            SQLALCHEMY_ENGINE_OPTIONS = {}
+            CACHE_TYPE = 'simple'
+            PASSWORD_HASH_WORKERS = 0
+
+        self.app = create_app(Config)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        db.session.add(Amenity(name="WiFi"))
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.engine.dispose()
+        self.ctx.pop()
+        shutil.rmtree(self.tmp)
+
+    def run_in_child(self, fn):
+        read_end, write_end = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                result = fn()
+            except BaseException as e:
+                result = {"error": repr(e)}
+            os.write(write_end, json.dumps(result).encode())
+            os._exit(0)
+        os.close(write_end)
+        with os.fdopen(read_end) as f:
+            result = json.loads(f.read())
+        os.waitpid(pid, 0)
+        return result
+
+    def test_child_starts_with_its_own_pools(self):
+        # the parent holds a pooled connection at fork time
+        parent_pool = id(db.engine.pool)
+        parent_lock = id(repository_cache._stats_lock)
+        self.assertEqual(Amenity.query.count(), 1)
+
+        def child():
+            db.session.remove()
+            return {
+                "new_pool": id(db.engine.pool) != parent_pool,
+                "new_lock": id(repository_cache._stats_lock) != parent_lock,
+                "hasher_pool": password_hasher._pool is None,
+                "amenities": Amenity.query.count(),
+            }
+
+        self.assertEqual(self.run_in_child(child),
+                         {"new_pool": True, "new_lock": True, "hasher_pool": True, "amenities": 1})
+        # the parent's connection still works
+        self.assertEqual(Amenity.query.count(), 1)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,71 @@
+import unittest
+from sqlalchemy import inspect, text
+from app import create_app, db
+from app.persistence import migrations
+
+
+class TestMigrations(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app("config.TestingConfig")
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+    def tearDown(self):
+        db.drop_all()
+        with db.engine.begin() as conn:
+            conn.execute(text("DROP TABLE IF EXISTS schema_version"))
+        self.ctx.pop()
+
+    def create_old_schema(self):
+        """ places / reviews as they were before rating totals and indexes """
+        with db.engine.begin() as conn:
+            conn.execute(text(
+                "CREATE TABLE places (id VARCHAR(36) PRIMARY KEY, created_at DATETIME, updated_at DATETIME, "
+                "title VARCHAR(255) NOT NULL, description VARCHAR(1000), price FLOAT NOT NULL, "
+                "latitude FLOAT NOT NULL, longitude FLOAT NOT NULL, address VARCHAR(200), "
+                "image_url VARCHAR, owner_id VARCHAR(36) NOT NULL)"
+            ))
+            conn.execute(text(
+                "CREATE TABLE reviews (id VARCHAR(36) PRIMARY KEY, created_at DATETIME, updated_at DATETIME, "
+                "rating INTEGER NOT NULL, text TEXT NOT NULL, user_id VARCHAR(36) NOT NULL, "
+                "place_id VARCHAR(36) NOT NULL, UNIQUE (user_id, place_id))"
+            ))
+            conn.execute(text(
+                "INSERT INTO places (id, title, price, latitude, longitude, owner_id) "
+                "VALUES ('p1', 'Old Place', 10, 0, 0, 'u1')"
+            ))
+            conn.execute(text(
+                "INSERT INTO reviews (id, rating, text, user_id, place_id) VALUES "
+                "('r1', 4, 'ok', 'u2', 'p1'), ('r2', 5, 'good', 'u3', 'p1')"
+            ))
+
+    def test_upgrade_old_schema(self):
+        self.create_old_schema()
+        applied = migrations.upgrade(db.engine)
+        self.assertEqual([v for v, _ in applied], [v for v, _, _ in migrations.MIGRATIONS])
+        self.assertEqual(migrations.current_version(db.engine), len(migrations.MIGRATIONS))
+
+        inspector = inspect(db.engine)
+        place_indexes = {i['name'] for i in inspector.get_indexes('places')}
+        self.assertIn('ix_places_owner_id', place_indexes)
+        self.assertIn('ix_places_latitude_longitude', place_indexes)
+        self.assertIn('ix_places_geohash', place_indexes)
+        review_indexes = {i['name'] for i in inspector.get_indexes('reviews')}
+        self.assertIn('ix_reviews_place_id_user_id', review_indexes)
+
+        with db.engine.connect() as conn:
+            totals = conn.execute(text("SELECT rating_sum, rating_count, geohash FROM places WHERE id = 'p1'")).one()
+        self.assertEqual(tuple(totals), (9, 2, "s00000000"))
+
+        # already at head: nothing left to apply
+        self.assertEqual(migrations.upgrade(db.engine), [])
+
+    def test_upgrade_fresh_schema_only_stamps(self):
+        db.create_all()
+        applied = migrations.upgrade(db.engine)
+        self.assertEqual(len(applied), len(migrations.MIGRATIONS))
+        self.assertEqual(migrations.current_version(db.engine), len(migrations.MIGRATIONS))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -1,6 +1,15 @@
+import json
 import unittest
 from uuid import uuid4
-from app import create_app
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+from app import create_app, db
+from app.models.user import User
+from app.models.place import Place
+from app.models.amenity import Amenity
+from app.models.review import Review
+from app.services import facade
+from app.tests.query_budget import QueryBudgetMixin
 
 class TestPlaceEndpoints(unittest.TestCase):
     def setUp(self):
@@ -92,3 +101,554 @@ class TestPlaceEndpoints(unittest.TestCase):
             "title": "Fail Update"
         })
         self.assertEqual(response.status_code, 404)
+
+
+class TestPlaceListPagination(QueryBudgetMixin, unittest.TestCase):
+    """ Keyset pagination of GET /api/v1/places/ """
+    def setUp(self):
+        self.app = create_app("config.TestingConfig")
+        self.client = self.app.test_client()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+        wifi = Amenity(name="WiFi")
+        db.session.add(wifi)
+        owners, places = [], []
+        for i in range(7):
+            owner = User(first_name="Owner", last_name=str(i), email=f"owner{i}@example.com", password="x")
+            db.session.add(owner)
+            db.session.flush()
+            place = Place(title=f"Place {i}", price=100 + i, latitude=0.0, longitude=0.0, owner_id=owner.id)
+            place.add_amenity(wifi)
+            db.session.add(place)
+            db.session.flush()
+            owners.append(owner)
+            places.append(place)
+        db.session.add(Review(rating=4, text="Good", user_id=owners[1].id, place_id=places[0].id))
+        db.session.add(Review(rating=5, text="Great", user_id=owners[2].id, place_id=places[0].id))
+        db.session.commit()
+        facade.rebuild_rating_totals()
+        self.rated_place_id = places[0].id
+        self.unrated_place_id = places[1].id
+        db.session.remove()
+
+    def tearDown(self):
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_pages_cover_all_places_once(self):
+        seen = []
+        cursor = None
+        while True:
+            url = '/api/v1/places/?limit=3' + (f'&after={cursor}' if cursor else '')
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            data = response.get_json()
+            self.assertLessEqual(len(data["result"]), 3)
+            seen.extend(p["id"] for p in data["result"])
+            cursor = data["next_cursor"]
+            if not cursor:
+                break
+        self.assertEqual(len(seen), 7)
+        self.assertEqual(len(set(seen)), 7)
+
+    def test_page_query_count_is_fixed(self):
+        response = self.client.get('/api/v1/places/?limit=5')
+        data = response.get_json()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(data["result"]), 5)
+        self.assertEqual(data["result"][0]["owner"]["first_name"], "Owner")
+        self.assertEqual(data["result"][0]["amenities"][0]["name"], "WiFi")
+        # ETag version + places joined with owners and ratings + one IN query for amenities
+        self.assertMaxQueries(response, 3)
+
+    def test_listing_includes_ratings(self):
+        response = self.client.get('/api/v1/places/')
+        places = {p["id"]: p for p in response.get_json()["result"]}
+        self.assertEqual(places[self.rated_place_id]["average_rating"], 4.5)
+        self.assertEqual(places[self.rated_place_id]["review_count"], 2)
+        self.assertIsNone(places[self.unrated_place_id]["average_rating"])
+        self.assertEqual(places[self.unrated_place_id]["review_count"], 0)
+
+    def test_bulk_ratings(self):
+        ids = f"{self.rated_place_id},{self.unrated_place_id}"
+        response = self.client.get(f'/api/v1/places/ratings?ids={ids}')
+        data = response.get_json()["result"]
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(data[self.rated_place_id], {"average_rating": 4.5, "review_count": 2})
+        self.assertEqual(data[self.unrated_place_id], {"average_rating": None, "review_count": 0})
+        self.assertMaxQueries(response, 1)
+
+    def test_bulk_ratings_requires_ids(self):
+        response = self.client.get('/api/v1/places/ratings')
+        self.assertEqual(response.status_code, 400)
+
+    def test_without_limit_returns_everything(self):
+        response = self.client.get('/api/v1/places/')
+        data = response.get_json()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(data["result"]), 7)
+        self.assertIsNone(data["next_cursor"])
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/v1/places/?limit=2&after=garbage')
+        self.assertEqual(response.status_code, 400)
+
+
+class TestPlaceNearby(unittest.TestCase):
+    """ GET /api/v1/places/nearby """
+    def setUp(self):
+        self.app = create_app("config.TestingConfig")
+        self.client = self.app.test_client()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+        owner = User(first_name="Owner", last_name="User", email="owner@example.com", password="x")
+        db.session.add(owner)
+        db.session.flush()
+        # Melbourne CBD, St Kilda (~6km), Geelong (~65km), Sydney (~713km)
+        for title, lat, lon in [
+            ("CBD Loft", -37.8136, 144.9631),
+            ("St Kilda Flat", -37.8676, 144.9809),
+            ("Geelong House", -38.1499, 144.3617),
+            ("Sydney Studio", -33.8688, 151.2093),
+        ]:
+            db.session.add(Place(title=title, price=100, latitude=lat, longitude=lon, owner_id=owner.id))
+        db.session.commit()
+        db.session.remove()
+
+    def tearDown(self):
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_geohash_follows_coordinates(self):
+        place = Place.query.filter_by(title="CBD Loft").one()
+        self.assertTrue(place.geohash.startswith("r1r0f"))
+        place.latitude = -33.8688
+        place.longitude = 151.2093
+        self.assertTrue(place.geohash.startswith("r3gx2"))
+
+    def test_nearby_sorted_by_distance(self):
+        response = self.client.get('/api/v1/places/nearby?lat=-37.8136&lon=144.9631&radius_km=10')
+        self.assertEqual(response.status_code, 200)
+        result = response.get_json()["result"]
+        self.assertEqual([p["title"] for p in result], ["CBD Loft", "St Kilda Flat"])
+        self.assertEqual(result[0]["distance_km"], 0.0)
+        self.assertAlmostEqual(result[1]["distance_km"], 6.2, delta=0.3)
+
+    def test_nearby_larger_radius_and_limit(self):
+        response = self.client.get('/api/v1/places/nearby?lat=-37.8136&lon=144.9631&radius_km=100&limit=2')
+        result = response.get_json()["result"]
+        self.assertEqual([p["title"] for p in result], ["CBD Loft", "St Kilda Flat"])
+        response = self.client.get('/api/v1/places/nearby?lat=-37.8136&lon=144.9631&radius_km=100')
+        self.assertEqual(len(response.get_json()["result"]), 3)
+
+    def test_nearby_candidates_use_geohash_index(self):
+        statements = []
+        listener = lambda *args: statements.append(args[2:4])
+        event.listen(db.engine, "before_cursor_execute", listener)
+        try:
+            response = self.client.get('/api/v1/places/nearby?lat=-37.8136&lon=144.9631&radius_km=10')
+        finally:
+            event.remove(db.engine, "before_cursor_execute", listener)
+        self.assertEqual(response.status_code, 200)
+        statement, parameters = next((s, p) for s, p in statements if "places.geohash >=" in s)
+        plan = [row[3] for row in db.session.connection().exec_driver_sql(
+            "EXPLAIN QUERY PLAN " + statement, parameters)]
+        self.assertTrue(any("USING INDEX ix_places_geohash (geohash>? AND geohash<?)" in step for step in plan), plan)
+        self.assertFalse(any(step.startswith("SCAN places") for step in plan), plan)
+
+    def test_nearby_invalid_params(self):
+        self.assertEqual(self.client.get('/api/v1/places/nearby?lat=-37.8').status_code, 400)
+        self.assertEqual(self.client.get('/api/v1/places/nearby?lat=95&lon=0').status_code, 400)
+        self.assertEqual(self.client.get('/api/v1/places/nearby?lat=0&lon=0&radius_km=0').status_code, 400)
+
+
+class TestPlaceSearch(unittest.TestCase):
+    """ GET /api/v1/places/search """
+    def setUp(self):
+        self.app = create_app("config.TestingConfig")
+        self.client = self.app.test_client()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+        self.wifi = Amenity(name="WiFi")
+        self.pool = Amenity(name="Pool")
+        owner = User(first_name="Owner", last_name="User", email="owner@example.com", password="x")
+        db.session.add_all([self.wifi, self.pool, owner])
+        db.session.flush()
+        # title, price, latitude, amenities, (rating_sum, rating_count)
+        for title, price, lat, amenities, totals in [
+            ("Budget Room", 40, -37.8, [self.wifi], (6, 2)),
+            ("City Flat", 120, -37.8, [self.wifi, self.pool], (9, 2)),
+            ("Beach House", 350, -38.3, [self.pool], (5, 1)),
+            ("Luxury Villa", 900, -33.9, [self.wifi, self.pool], (0, 0)),
+        ]:
+            place = Place(title=title, price=price, latitude=lat, longitude=145.0, owner_id=owner.id)
+            place.rating_sum, place.rating_count = totals
+            for amenity in amenities:
+                place.add_amenity(amenity)
+            db.session.add(place)
+        db.session.commit()
+        self.wifi_id, self.pool_id = self.wifi.id, self.pool.id
+        db.session.remove()
+
+        self.statements = []
+        event.listen(db.engine, "before_cursor_execute", self._count)
+
+    def tearDown(self):
+        event.remove(db.engine, "before_cursor_execute", self._count)
+        db.drop_all()
+        self.ctx.pop()
+
+    def _count(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def search(self, query):
+        response = self.client.get(f'/api/v1/places/search?{query}')
+        self.assertEqual(response.status_code, 200)
+        return response.get_json()
+
+    def titles(self, data):
+        return [p["title"] for p in data["result"]]
+
+    def test_price_range_sorted(self):
+        data = self.search("min_price=50&max_price=400&sort=price_desc")
+        self.assertEqual(self.titles(data), ["Beach House", "City Flat"])
+        self.assertEqual(data["total"], 2)
+
+    def test_required_amenities(self):
+        data = self.search(f"amenity_ids={self.wifi_id},{self.pool_id}&sort=price_asc")
+        self.assertEqual(self.titles(data), ["City Flat", "Luxury Villa"])
+
+    def test_bbox_and_min_rating(self):
+        data = self.search("bbox=-38.0,-37.0,144.0,146.0&min_rating=4")
+        self.assertEqual(self.titles(data), ["City Flat"])
+        data = self.search("min_rating=3&sort=rating_desc")
+        self.assertEqual(self.titles(data), ["Beach House", "City Flat", "Budget Room"])
+
+    def test_pagination_keeps_total(self):
+        data = self.search("sort=price_asc&limit=2&offset=2")
+        self.assertEqual(self.titles(data), ["Beach House", "Luxury Villa"])
+        self.assertEqual(data["total"], 4)
+        data = self.search("sort=price_asc&limit=2&offset=10")
+        self.assertEqual(data["result"], [])
+        self.assertEqual(data["total"], 4)
+
+    def test_facets(self):
+        data = self.search("max_price=400")
+        amenities = {a["name"]: a["count"] for a in data["facets"]["amenities"]}
+        self.assertEqual(amenities, {"WiFi": 2, "Pool": 2})
+        prices = {(b["min"], b["max"]): b["count"] for b in data["facets"]["price"]}
+        self.assertEqual(prices[(0, 50)], 1)
+        self.assertEqual(prices[(100, 200)], 1)
+        self.assertEqual(prices[(200, 500)], 1)
+        self.assertEqual(prices[(500, None)], 0)
+
+    def test_query_count(self):
+        self.search(f"amenity_ids={self.wifi_id}&min_price=10&bbox=-40,-30,140,150")
+        # page with total, amenities of the page, facets
+        self.assertEqual(len(self.statements), 3)
+
+    def test_invalid_parameters(self):
+        for query in ("min_price=abc", "bbox=1,2,3", "sort=random", "min_rating=9", "min_price=10&max_price=5",
+                      "min_price=nan", "max_price=inf", "max_price=-inf", "bbox=0,nan,0,1"):
+            response = self.client.get(f'/api/v1/places/search?{query}')
+            self.assertEqual(response.status_code, 400, query)
+
+
+class TestPlaceConditionalGet(unittest.TestCase):
+    """ ETag / If-None-Match on place, amenity and review reads """
+    def setUp(self):
+        self.app = create_app("config.TestingConfig")
+        self.client = self.app.test_client()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+        self.wifi = Amenity(name="WiFi")
+        owner = User(first_name="Owner", last_name="User", email="owner@example.com", password="x")
+        db.session.add_all([self.wifi, owner])
+        db.session.flush()
+        self.place = Place(title="City Flat", price=120, latitude=-37.8, longitude=145.0, owner_id=owner.id)
+        self.place.add_amenity(self.wifi)
+        db.session.add(self.place)
+        db.session.commit()
+        self.place_id = self.place.id
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def revalidate(self, url):
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        etag = first.headers["ETag"]
+        second = self.client.get(url, headers={"If-None-Match": etag})
+        return etag, second
+
+    def test_not_modified(self):
+        for url in ('/api/v1/places/', f'/api/v1/places/{self.place_id}',
+                    '/api/v1/amenities/', f'/api/v1/reviews/place/{self.place_id}'):
+            etag, response = self.revalidate(url)
+            self.assertEqual(response.status_code, 304, url)
+            self.assertEqual(response.data, b"", url)
+            self.assertEqual(response.headers["ETag"], etag, url)
+
+    def test_not_modified_skips_serialization(self):
+        etag, _ = self.revalidate('/api/v1/places/?limit=10')
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.engine, "before_cursor_execute", listener)
+        try:
+            response = self.client.get('/api/v1/places/?limit=10', headers={"If-None-Match": etag})
+        finally:
+            event.remove(db.engine, "before_cursor_execute", listener)
+        self.assertEqual(response.status_code, 304)
+        # only the version query
+        self.assertEqual(len(statements), 1)
+
+    def test_changes_give_new_etag(self):
+        place_url = f'/api/v1/places/{self.place_id}'
+        place_etag, _ = self.revalidate(place_url)
+        list_etag, _ = self.revalidate('/api/v1/places/')
+        amenities_etag, _ = self.revalidate('/api/v1/amenities/')
+
+        facade.update_amenity(self.wifi.id, {"name": "Fast WiFi"})
+        db.session.remove()
+
+        for url, etag in ((place_url, place_etag), ('/api/v1/places/', list_etag),
+                          ('/api/v1/amenities/', amenities_etag)):
+            response = self.client.get(url, headers={"If-None-Match": etag})
+            self.assertEqual(response.status_code, 200, url)
+            self.assertNotEqual(response.headers["ETag"], etag, url)
+
+    def test_amenity_change_on_place_gives_new_list_etag(self):
+        list_etag, _ = self.revalidate('/api/v1/places/')
+        pool = Amenity(name="Pool")
+        db.session.add(pool)
+        db.session.commit()
+        list_etag, _ = self.revalidate('/api/v1/places/')
+
+        facade.update_place(self.place_id, {"amenity_ids": [pool.id]})
+        db.session.remove()
+
+        response = self.client.get('/api/v1/places/', headers={"If-None-Match": list_etag})
+        self.assertEqual(response.status_code, 200)
+
+    def test_new_review_gives_new_etag(self):
+        url = f'/api/v1/reviews/place/{self.place_id}'
+        etag, _ = self.revalidate(url)
+        reviewer = User(first_name="Guest", last_name="User", email="guest@example.com", password="x")
+        db.session.add(reviewer)
+        db.session.commit()
+        facade.create_review({"user": reviewer, "place": db.session.get(Place, self.place_id),
+                              "rating": 4, "text": "Nice"})
+        db.session.remove()
+
+        response = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.get_json()), 1)
+
+
+    def test_reviewer_change_gives_new_etag(self):
+        url = f'/api/v1/reviews/place/{self.place_id}'
+        reviewer = User(first_name="Guest", last_name="User", email="guest@example.com", password="x")
+        db.session.add(reviewer)
+        db.session.commit()
+        facade.create_review({"user": reviewer, "place": db.session.get(Place, self.place_id),
+                              "rating": 4, "text": "Nice"})
+        reviewer_id = reviewer.id
+        db.session.remove()
+        etag, _ = self.revalidate(url)
+
+        facade.update_user(reviewer_id, {"first_name": "Renamed"})
+        db.session.remove()
+
+        response = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()[0]["user"]["first_name"], "Renamed")
+
+class TestPlaceBulkImport(unittest.TestCase):
+    """ POST /api/v1/places/bulk """
+    def setUp(self):
+        self.app = create_app("config.TestingConfig")
+        self.client = self.app.test_client()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+        self.wifi, self.pool = Amenity(name="WiFi"), Amenity(name="Pool")
+        owner = User(first_name="Owner", last_name="User", email="owner@example.com", password="x")
+        db.session.add_all([self.wifi, self.pool, owner])
+        db.session.commit()
+        self.owner_id, self.wifi_id, self.pool_id = owner.id, self.wifi.id, self.pool.id
+        self.admin = {"Authorization": f"Bearer {create_access_token(identity=owner.id, additional_claims={'is_admin': True})}"}
+        db.session.remove()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def row(self, title, **fields):
+        data = {"owner_id": self.owner_id, "title": title, "price": 100,
+                "latitude": -37.81, "longitude": 144.96}
+        data.update(fields)
+        return data
+
+    def test_json_array_with_per_row_errors(self):
+        rows = [
+            self.row("Good One", amenity_ids=[self.wifi_id, self.pool_id, self.wifi_id]),
+            self.row("No"),                                   # title too short
+            self.row("Bad Owner", owner_id="missing"),
+            self.row("Bad Amenity", amenity_ids=["missing"]),
+            self.row("Bad Field", colour="red"),
+            self.row("Good Two", price=50),
+        ]
+        response = self.client.post('/api/v1/places/bulk?chunk_size=4', json=rows, headers=self.admin)
+        data = response.get_json()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(data["created"], 2)
+        self.assertEqual([e["row"] for e in data["errors"]], [2, 3, 4, 5])
+        self.assertIn("Title", data["errors"][0]["error"])
+
+        places = {p.title: p for p in Place.query.all()}
+        self.assertEqual(set(places), {"Good One", "Good Two"})
+        self.assertEqual({a.name for a in places["Good One"].amenities}, {"WiFi", "Pool"})
+        self.assertEqual(places["Good Two"].geohash, places["Good One"].geohash)
+
+    def test_ndjson_with_invalid_line(self):
+        body = "\n".join([json.dumps(self.row("First Place")), "{not json", "",
+                          json.dumps(self.row("Second Place"))])
+        response = self.client.post('/api/v1/places/bulk', data=body, headers=self.admin,
+                                    content_type="application/x-ndjson")
+        data = response.get_json()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(data["created"], 2)
+        self.assertEqual(data["errors"][0]["row"], 2)
+        self.assertEqual([i["row"] for i in data["ids"]], [1, 4])
+
+    def test_lookups_batched_per_chunk(self):
+        rows = [self.row(f"Place {i}", amenity_ids=[self.wifi_id]) for i in range(10)]
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.engine, "before_cursor_execute", listener)
+        try:
+            response = self.client.post('/api/v1/places/bulk?chunk_size=5', json=rows, headers=self.admin)
+        finally:
+            event.remove(db.engine, "before_cursor_execute", listener)
+        self.assertEqual(response.get_json()["created"], 10)
+        selects = [s for s in statements if s.lstrip().upper().startswith("SELECT")]
+        # one owner and one amenity lookup per chunk
+        self.assertEqual(len(selects), 4)
+
+    def test_invalid_requests(self):
+        response = self.client.post('/api/v1/places/bulk', json={"title": "x"}, headers=self.admin)
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/api/v1/places/bulk?chunk_size=0', json=[self.row("Place")], headers=self.admin)
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/api/v1/places/bulk', json=[self.row("No")], headers=self.admin)
+        self.assertEqual(response.status_code, 400)
+
+        user = {"Authorization": f"Bearer {create_access_token(identity=self.owner_id)}"}
+        response = self.client.post('/api/v1/places/bulk', json=[self.row("Place")], headers=user)
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(Place.query.count(), 0)
+
+
+
+class TestPlaceAmenityLinks(unittest.TestCase):
+    """ Amenity changes on a place are diffed and written in bulk """
+    def setUp(self):
+        self.app = create_app("config.TestingConfig")
+        self.client = self.app.test_client()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+        self.amenities = [Amenity(name=name) for name in ("WiFi", "Pool", "Kitchen", "Parking")]
+        owner = User(first_name="Owner", last_name="User", email="owner@example.com", password="x")
+        other = User(first_name="Other", last_name="User", email="other@example.com", password="x")
+        db.session.add_all(self.amenities + [owner, other])
+        db.session.flush()
+        place = Place(title="City Flat", price=120, latitude=-37.8, longitude=145.0, owner_id=owner.id)
+        place.add_amenity(self.amenities[0])
+        place.add_amenity(self.amenities[1])
+        db.session.add(place)
+        db.session.commit()
+        self.place_id = place.id
+        self.wifi, self.pool, self.kitchen, self.parking = (a.id for a in self.amenities)
+        self.owner = {"Authorization": f"Bearer {create_access_token(identity=owner.id)}"}
+        self.other = {"Authorization": f"Bearer {create_access_token(identity=other.id)}"}
+        db.session.remove()
+
+        self.statements = []
+        event.listen(db.engine, "before_cursor_execute", self._count)
+
+    def tearDown(self):
+        event.remove(db.engine, "before_cursor_execute", self._count)
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def _count(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def linked(self):
+        db.session.remove()
+        return {a.id for a in db.session.get(Place, self.place_id).amenities}
+
+    def link_statements(self):
+        return [s.split()[0] for s in self.statements
+                if "place_amenity" in s and not s.lstrip().startswith("SELECT")]
+
+    def test_update_replaces_with_one_delete_and_one_insert(self):
+        before = db.session.get(Place, self.place_id).updated_at
+        db.session.remove()
+        self.statements.clear()
+
+        response = self.client.put(f'/api/v1/places/{self.place_id}', headers=self.owner, json={
+            "amenity_ids": [self.pool, self.kitchen, self.parking, self.kitchen, "missing"]
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.get_json()["result"]["amenity_ids"]), {self.pool, self.kitchen, self.parking})
+        self.assertEqual(self.link_statements(), ["DELETE", "INSERT"])
+        # only the ids not linked yet are looked up, in one query
+        self.assertEqual(sum(1 for s in self.statements if s.lstrip().startswith("SELECT amenities.id")), 1)
+        self.assertEqual(self.linked(), {self.pool, self.kitchen, self.parking})
+        self.assertGreater(db.session.get(Place, self.place_id).updated_at, before)
+
+    def test_update_with_same_amenities_writes_nothing(self):
+        response = self.client.put(f'/api/v1/places/{self.place_id}', headers=self.owner,
+                                   json={"amenity_ids": [self.pool, self.wifi]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.link_statements(), [])
+
+    def test_batch_add(self):
+        url = f'/api/v1/places/{self.place_id}/amenities'
+        response = self.client.post(url, headers=self.owner,
+                                    json={"amenity_ids": [self.wifi, self.kitchen, self.parking]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.get_json()["result"]["amenities"]), 4)
+        self.assertEqual(self.link_statements(), ["INSERT"])
+        self.assertEqual(self.linked(), {self.wifi, self.pool, self.kitchen, self.parking})
+
+    def test_batch_add_errors(self):
+        url = f'/api/v1/places/{self.place_id}/amenities'
+        response = self.client.post(url, headers=self.owner, json={"amenity_ids": [self.kitchen, "missing"]})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("missing", response.get_json()["error"])
+        self.assertEqual(self.linked(), {self.wifi, self.pool})
+
+        response = self.client.post(url, headers=self.other, json={"amenity_ids": [self.kitchen]})
+        self.assertEqual(response.status_code, 403)
+        response = self.client.post(f'/api/v1/places/{uuid4()}/amenities', headers=self.owner,
+                                    json={"amenity_ids": [self.kitchen]})
+        self.assertEqual(response.status_code, 404)
+        response = self.client.post(url, headers=self.owner, json={"amenity_ids": "not a list"})
+        self.assertEqual(response.status_code, 400)
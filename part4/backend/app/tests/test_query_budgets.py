@@ -0,0 +1,103 @@
+import logging
+import unittest
+from sqlalchemy.exc import OperationalError
+from app import create_app, db
+from app.models.user import User
+from app.models.place import Place
+from app.models.amenity import Amenity
+from app.models.review import Review
+from app.services import facade
+from app.tests.query_budget import QueryBudgetMixin
+
+
+class TestEndpointQueryBudgets(QueryBudgetMixin, unittest.TestCase):
+    """ Fixed query budgets per endpoint: they must not grow with the data """
+    PLACES = 12
+    REVIEWS_PER_PLACE = 4
+
+    def setUp(self):
+        self.app = create_app("config.TestingConfig")
+        self.client = self.app.test_client()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+        amenities = [Amenity(name=name) for name in ("WiFi", "Pool", "Kitchen")]
+        users = [
+            User(first_name="User", last_name=str(i), email=f"user{i}@example.com", password="x")
+            for i in range(self.REVIEWS_PER_PLACE + 1)
+        ]
+        db.session.add_all(amenities + users)
+        db.session.flush()
+        for i in range(self.PLACES):
+            place = Place(title=f"Place {i}", price=50 + i, latitude=-37.8, longitude=145.0,
+                          owner_id=users[0].id)
+            for amenity in amenities[:2]:
+                place.add_amenity(amenity)
+            db.session.add(place)
+            db.session.flush()
+            for reviewer in users[1:]:
+                db.session.add(Review(rating=4, text="Nice", place_id=place.id, user_id=reviewer.id))
+        db.session.commit()
+        facade.rebuild_rating_totals()
+        self.place_id = place.id
+        self.amenity_id = amenities[0].id
+        self.user_id = users[0].id
+        db.session.remove()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_read_endpoints_stay_within_budget(self):
+        budgets = [
+            ('/api/v1/places/', 3),
+            ('/api/v1/places/?limit=5', 3),
+            (f'/api/v1/places/{self.place_id}', 4),
+            ('/api/v1/places/search?min_price=10', 3),
+            ('/api/v1/places/nearby?lat=-37.8&lon=145.0', 4),
+            (f'/api/v1/places/ratings?ids={self.place_id}', 1),
+            ('/api/v1/amenities/', 2),
+            (f'/api/v1/amenities/{self.amenity_id}', 1),
+            ('/api/v1/reviews/', 4),
+            (f'/api/v1/reviews/place/{self.place_id}', 5),
+            ('/api/v1/users/', 1),
+            (f'/api/v1/users/{self.user_id}', 1),
+        ]
+        for url, budget in budgets:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertMaxQueries(response, budget)
+                db.session.remove()
+
+    def test_timing_headers(self):
+        response = self.client.get('/api/v1/places/')
+        queries = int(response.headers["X-DB-Queries"])
+        self.assertGreater(queries, 0)
+        self.assertGreaterEqual(float(response.headers["X-DB-Time-ms"]), 0)
+        self.assertIn(f'desc="{queries} queries"', response.headers["Server-Timing"])
+
+    def test_headers_can_be_disabled(self):
+        self.app.config["DB_STATS_HEADERS"] = False
+        response = self.client.get('/api/v1/places/')
+        self.assertNotIn("X-DB-Queries", response.headers)
+
+    def test_failed_statement_does_not_leave_its_start_time(self):
+        with db.engine.connect() as connection:
+            with self.assertRaises(OperationalError):
+                connection.exec_driver_sql("SELECT * FROM no_such_table")
+            self.assertEqual(connection.info["query_start"], [])
+            connection.exec_driver_sql("SELECT 1")
+            self.assertEqual(connection.info["query_start"], [])
+
+    def test_slow_query_logged_with_endpoint(self):
+        self.app.config["DB_SLOW_QUERY_MS"] = 0
+        with self.assertLogs("app.persistence.query_stats", logging.WARNING) as logs:
+            self.client.get('/api/v1/amenities/')
+        self.assertIn("in amenities_amenity_list", logs.output[0])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
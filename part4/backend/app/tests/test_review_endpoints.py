@@ -1,6 +1,14 @@
 import unittest
-from app import create_app
+from unittest import mock
+from flask_jwt_extended import create_access_token, verify_jwt_in_request
+from sqlalchemy import event
+from app import create_app, db
 from app.models.review import Review
+from app.models.user import User
+from app.models.place import Place
+from app.services import facade
+from app.tests.query_budget import QueryBudgetMixin
+from app.utils.current_user import current_user
 
 class TestReviewEndpoints(unittest.TestCase):
     def setUp(self):
@@ -172,5 +180,202 @@ class TestReviewEndpoints(unittest.TestCase):
         self.assertEqual(len(data), 0)
 
 
+class TestReviewListQueries(QueryBudgetMixin, unittest.TestCase):
+    """ Review listings load users and places in bulk """
+    def setUp(self):
+        self.app = create_app("config.TestingConfig")
+        self.client = self.app.test_client()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+        owner = User(first_name="Owner", last_name="User", email="owner@example.com", password="x")
+        db.session.add(owner)
+        db.session.flush()
+        place = Place(title="Test Place", price=100, latitude=0.0, longitude=0.0, owner_id=owner.id)
+        db.session.add(place)
+        db.session.flush()
+        for i in range(5):
+            reviewer = User(first_name="Reviewer", last_name=str(i), email=f"reviewer{i}@example.com", password="x")
+            db.session.add(reviewer)
+            db.session.flush()
+            db.session.add(Review(rating=4, text="Nice stay!", user_id=reviewer.id, place_id=place.id))
+        db.session.commit()
+        self.place_id = place.id
+        db.session.remove()
+
+    def tearDown(self):
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_list_reviews_by_place_batches_lookups(self):
+        response = self.client.get(f'/api/v1/reviews/place/{self.place_id}')
+        data = response.get_json()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(data), 5)
+        self.assertTrue(all(r["user"]["first_name"] == "Reviewer" for r in data))
+        self.assertTrue(all(r["place"]["id"] == self.place_id for r in data))
+        # place lookup + ETag version + reviews + one IN query each for users and places
+        self.assertMaxQueries(response, 7)
+
+    def test_missing_bulk_loaded_user_is_not_lazy_loaded(self):
+        with mock.patch.object(facade.review_service.user_repo, "get_by_ids", return_value=[]):
+            response = self.client.get(f'/api/v1/reviews/place/{self.place_id}')
+        data = response.get_json()
+        self.assertEqual(len(data), 5)
+        self.assertTrue(all(r["user"] is None for r in data))
+        self.assertMaxQueries(response, 6)
+
+    def test_list_all_reviews_batches_lookups(self):
+        response = self.client.get('/api/v1/reviews/')
+        data = response.get_json()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(data), 5)
+        self.assertMaxQueries(response, 4)
+
+
+class TestReviewRatingTotals(unittest.TestCase):
+    """ Review writes keep Place.rating_sum / rating_count in step """
+    def setUp(self):
+        self.app = create_app("config.TestingConfig")
+        self.client = self.app.test_client()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+        owner = User(first_name="Owner", last_name="User", email="owner@example.com", password="x")
+        reviewer = User(first_name="Reviewer", last_name="User", email="reviewer@example.com", password="x")
+        db.session.add_all([owner, reviewer])
+        db.session.flush()
+        place = Place(title="Test Place", price=100, latitude=0.0, longitude=0.0, owner_id=owner.id)
+        db.session.add(place)
+        db.session.commit()
+        self.place_id = place.id
+        self.reviewer_id = reviewer.id
+        self.headers = {"Authorization": f"Bearer {create_access_token(identity=reviewer.id)}"}
+        db.session.remove()
+
+    def tearDown(self):
+        db.drop_all()
+        self.ctx.pop()
+
+    def totals(self):
+        db.session.remove()
+        place = db.session.get(Place, self.place_id)
+        return place.rating_sum, place.rating_count, place.average_rating
+
+    def test_create_update_delete_review(self):
+        response = self.client.post('/api/v1/reviews/', headers=self.headers, json={
+            "place_id": self.place_id, "rating": 4, "text": "Nice stay!"
+        })
+        self.assertEqual(response.status_code, 201)
+        review_id = response.get_json()["review"]["id"]
+        self.assertEqual(self.totals(), (4, 1, 4.0))
+
+        response = self.client.put(f'/api/v1/reviews/{review_id}', headers=self.headers, json={
+            "rating": 2, "text": "Changed my mind"
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.totals(), (2, 1, 2.0))
+
+        response = self.client.delete(f'/api/v1/reviews/{review_id}', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.totals(), (0, 0, None))
+
+    def test_rebuild_ratings_command(self):
+        db.session.add(Review(rating=5, text="Great", user_id=self.reviewer_id, place_id=self.place_id))
+        db.session.commit()
+        self.assertEqual(self.totals(), (0, 0, None))
+
+        result = self.app.test_cli_runner().invoke(args=["rebuild-ratings"])
+        self.assertIn("Rebuilt rating totals for 1 places", result.output)
+        self.assertEqual(self.totals(), (5, 1, 5.0))
+
+
+class TestReviewCurrentUser(unittest.TestCase):
+    """ Review writes take the id and admin flag from the token, the author row at most once """
+    def setUp(self):
+        self.app = create_app("config.TestingConfig")
+        self.client = self.app.test_client()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+        owner = User(first_name="Owner", last_name="User", email="owner@example.com", password="x")
+        reviewer = User(first_name="Reviewer", last_name="User", email="reviewer@example.com", password="x")
+        other = User(first_name="Other", last_name="User", email="other@example.com", password="x")
+        db.session.add_all([owner, reviewer, other])
+        db.session.flush()
+        place = Place(title="Test Place", price=100, latitude=0.0, longitude=0.0, owner_id=owner.id)
+        db.session.add(place)
+        db.session.commit()
+        self.place_id = place.id
+        self.reviewer = {"Authorization": f"Bearer {create_access_token(identity=reviewer.id)}"}
+        self.other = {"Authorization": f"Bearer {create_access_token(identity=other.id)}"}
+        self.admin = {"Authorization": "Bearer " + create_access_token(
+            identity=owner.id, additional_claims={"is_admin": True})}
+        db.session.remove()
+
+        self.statements = []
+        event.listen(db.engine, "before_cursor_execute", self._count)
+
+    def tearDown(self):
+        event.remove(db.engine, "before_cursor_execute", self._count)
+        db.drop_all()
+        self.ctx.pop()
+
+    def _count(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def user_lookups(self, before):
+        """users SELECTs issued before the first statement starting with `before`"""
+        end = next(i for i, s in enumerate(self.statements) if s.startswith(before))
+        return sum(1 for s in self.statements[:end] if s.lstrip().startswith("SELECT users."))
+
+    def create_review(self):
+        response = self.client.post('/api/v1/reviews/', headers=self.reviewer, json={
+            "place_id": self.place_id, "rating": 4, "text": "Nice stay!"
+        })
+        self.assertEqual(response.status_code, 201)
+        return response.get_json()["review"]["id"]
+
+    def test_create_loads_author_once(self):
+        self.create_review()
+        self.assertEqual(self.user_lookups(before="INSERT INTO reviews"), 1)
+
+    def test_user_row_loaded_on_first_access_only(self):
+        with self.app.test_request_context(headers=self.reviewer), \
+                mock.patch("app.utils.current_user.facade.get_user", wraps=lambda user_id: User(
+                    first_name="Reviewer", last_name="User", email="reviewer@example.com", password="x")) as get_user:
+            verify_jwt_in_request()
+            self.assertFalse(current_user.is_admin)
+            self.assertTrue(current_user.owns(current_user.id))
+            get_user.assert_not_called()
+
+            self.assertEqual(current_user.first_name, "Reviewer")
+            self.assertEqual(current_user.email, "reviewer@example.com")
+            get_user.assert_called_once_with(current_user.id)
+
+    def test_update_and_delete_without_user_lookup(self):
+        review_id = self.create_review()
+        db.session.remove()
+        self.statements.clear()
+
+        response = self.client.put(f'/api/v1/reviews/{review_id}', headers=self.reviewer,
+                                   json={"rating": 2, "text": "Changed my mind"})
+        self.assertEqual(response.status_code, 200)
+        # the response still embeds the author, loaded after the commit
+        self.assertEqual(self.user_lookups(before="UPDATE reviews"), 0)
+
+        response = self.client.put(f'/api/v1/reviews/{review_id}', headers=self.other,
+                                   json={"rating": 1, "text": "Not mine"})
+        self.assertEqual(response.status_code, 403)
+
+        self.statements.clear()
+        response = self.client.delete(f'/api/v1/reviews/{review_id}', headers=self.admin)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.user_lookups(before="DELETE FROM reviews"), 0)
+
+
 if __name__ == "__main__":
     unittest.main(verbosity=2)
@@ -0,0 +1,86 @@
+import unittest
+from unittest import mock
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+from app import create_app, db
+from app.models.amenity import Amenity
+from app.models.place import Place
+from app.models.user import User
+from app.persistence.unit_of_work import unit_of_work
+from app.services import facade
+
+
+class TestUnitOfWork(unittest.TestCase):
+    """ One transaction per facade call """
+    def setUp(self):
+        self.app = create_app("config.TestingConfig")
+        self.client = self.app.test_client()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+        self.wifi, self.pool = Amenity(name="WiFi"), Amenity(name="Pool")
+        owner = User(first_name="Owner", last_name="User", email="owner@example.com", password="x")
+        db.session.add_all([self.wifi, self.pool, owner])
+        db.session.commit()
+        self.owner_id, self.wifi_id, self.pool_id = owner.id, self.wifi.id, self.pool.id
+        self.headers = {"Authorization": f"Bearer {create_access_token(identity=owner.id)}"}
+        db.session.remove()
+
+        self.commits = 0
+        event.listen(db.engine, "commit", self._count)
+
+    def tearDown(self):
+        event.remove(db.engine, "commit", self._count)
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def _count(self, conn):
+        self.commits += 1
+
+    def place_data(self, **fields):
+        data = {"owner_id": self.owner_id, "title": "City Flat", "price": 120,
+                "latitude": -37.8, "longitude": 145.0}
+        data.update(fields)
+        return data
+
+    def test_create_place_commits_once(self):
+        response = self.client.post('/api/v1/places/', headers=self.headers,
+                                    json=self.place_data(amenity_ids=[self.wifi_id, self.pool_id]))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.commits, 1)
+        self.assertEqual(len(response.get_json()["result"]["amenities"]), 2)
+
+    def test_failed_amenity_attachment_leaves_no_place(self):
+        with mock.patch.object(Place, "add_amenity", side_effect=RuntimeError("boom")):
+            with self.assertRaises(RuntimeError):
+                facade.create_place(self.place_data(amenity_ids=[self.wifi_id]))
+        db.session.remove()
+        self.assertEqual(Place.query.count(), 0)
+        self.assertEqual(self.commits, 0)
+
+    def test_reads_do_not_commit(self):
+        response = self.client.post('/api/v1/auth/login', json={"email": "nobody@example.com", "password": "x"})
+        self.assertEqual(response.status_code, 401)
+        facade.get_user(self.owner_id)
+        self.assertEqual(self.commits, 0)
+
+    def test_nested_units_commit_at_the_outermost(self):
+        with unit_of_work():
+            facade.create_amenity({"name": "Kitchen"})
+            facade.create_amenity({"name": "Parking"})
+            self.assertEqual(self.commits, 0)
+        self.assertEqual(self.commits, 1)
+
+        with self.assertRaises(ValueError):
+            with unit_of_work():
+                facade.create_amenity({"name": "Sauna"})
+                raise ValueError("abort")
+        db.session.remove()
+        self.assertEqual(self.commits, 1)
+        self.assertEqual({a.name for a in Amenity.query.all()}, {"WiFi", "Pool", "Kitchen", "Parking"})
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,58 @@
+"""
+The authenticated user of the current request.
+
+`current_user` reads the verified JWT once per request: `id` and
+`is_admin` come straight from its claims, without a database hit. Any
+other attribute (`first_name`, `email`, ...) or `.user` loads the User
+row on first access; later accesses in the same request, from any
+handler or facade call, reuse that row.
+
+Only valid inside a @jwt_required() view.
+"""
+from flask import g
+from werkzeug.local import LocalProxy
+from flask_jwt_extended import get_jwt
+from app.services import facade
+
+_NOT_LOADED = object()
+
+
+class CurrentUser:
+    def __init__(self, claims):
+        self.claims = claims
+        self.id = str(claims["sub"])
+        self.is_admin = bool(claims.get("is_admin", False))
+        self._user = _NOT_LOADED
+
+    @property
+    def user(self):
+        """The User row, loaded once; raises ValueError('404: ...') if it was deleted"""
+        if self._user is _NOT_LOADED:
+            self._user = facade.get_user(self.id)
+        return self._user
+
+    @property
+    def loaded(self):
+        """True once the User row has been fetched in this request"""
+        return self._user is not _NOT_LOADED
+
+    def owns(self, owner_id):
+        """True if owner_id is this user's id (ids compared as strings)"""
+        return str(owner_id) == self.id
+
+    def __getattr__(self, name):
+        # only reached for attributes not set above
+        return getattr(self.user, name)
+
+
+def _get_current_user():
+    claims = get_jwt()
+    cached = g.get("_current_user")
+    # g outlives the request when an app context was already pushed
+    # (tests, CLI), so the cache is tied to this request's verified token
+    if cached is None or cached.claims is not claims:
+        cached = g._current_user = CurrentUser(claims)
+    return cached
+
+
+current_user = LocalProxy(_get_current_user)
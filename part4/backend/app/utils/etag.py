@@ -0,0 +1,34 @@
+"""
+Strong ETags and If-None-Match handling for conditional GETs.
+
+An ETag is a hash of the versions a response is built from (ids,
+updated_at timestamps, row counts), never of the serialized body, so a
+304 can be answered before anything is serialized.
+"""
+import hashlib
+
+from flask import Response, request
+from werkzeug.http import quote_etag
+
+# clients must revalidate, but may keep the body and send If-None-Match
+CACHE_CONTROL = "no-cache"
+
+
+def make_etag(*parts):
+    """Hash the version parts into an ETag value (unquoted)"""
+    return hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()
+
+
+def not_modified(etag):
+    """Return a 304 response if the request's If-None-Match matches etag, else None"""
+    # If-None-Match uses the weak comparison (RFC 9110 13.1.2)
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    response = Response(status=304)
+    response.headers.update(etag_headers(etag))
+    return response
+
+
+def etag_headers(etag):
+    """Headers to send with a 200 response"""
+    return {"ETag": quote_etag(etag), "Cache-Control": CACHE_CONTROL}
@@ -0,0 +1,44 @@
+"""
+NDJSON and CSV encoders for streamed exports.
+
+Each takes the column names and an iterable of row batches and yields
+one text chunk per batch, so a response built on them holds a single
+batch in memory at a time.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+
+
+def _value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def ndjson_chunks(columns, batches):
+    for batch in batches:
+        yield "".join(
+            json.dumps({c: _value(v) for c, v in zip(columns, row)}) + "\n"
+            for row in batch
+        )
+
+
+def csv_chunks(columns, batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for batch in batches:
+        writer.writerows([_value(v) for v in row] for row in batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # header only when there were no rows
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+# format -> (mimetype, encoder)
+FORMATS = {
+    "ndjson": ("application/x-ndjson", ndjson_chunks),
+    "csv": ("text/csv", csv_chunks),
+}
@@ -0,0 +1,50 @@
+"""
+Process-local state after fork.
+
+A pre-forking server (gunicorn --preload, uWSGI) builds the app once and
+forks its workers from it. Pooled database connections, sockets to the
+cache server, the password hashing pool and locks held at fork time must
+not be shared with the parent, so after every fork the child:
+
+- disposes of the tracked engines' pools without closing the parent's
+  connections (SQLAlchemy's engine.dispose(close=False)), and
+- calls after_fork() on every registered object.
+
+Runs from os.register_at_fork, so any fork is covered, not only gunicorn's.
+"""
+import os
+import weakref
+
+_engines = weakref.WeakSet()
+_objects = []
+_hooked = False
+
+
+def _hook():
+    global _hooked
+    if not _hooked and hasattr(os, "register_at_fork"):
+        os.register_at_fork(after_in_child=reinit_after_fork)
+        _hooked = True
+
+
+def track_engines(engines):
+    """Dispose of these engines' pools in forked children"""
+    for engine in engines:
+        _engines.add(engine)
+    _hook()
+
+
+def register(obj):
+    """Call obj.after_fork() in forked children"""
+    _objects.append(obj)
+    _hook()
+    return obj
+
+
+def reinit_after_fork():
+    for engine in list(_engines):
+        # drop the inherited connections without closing them: they
+        # still belong to the parent
+        engine.dispose(close=False)
+    for obj in _objects:
+        obj.after_fork()
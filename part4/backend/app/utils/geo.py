@@ -0,0 +1,108 @@
+"""
+Geohash encoding and radius helpers for the nearby place search.
+
+A geohash interleaves longitude and latitude bits into a base32 string;
+places sharing a prefix lie in the same grid cell, so an index range
+scan per prefix (prefix_range) prunes candidates before the exact
+haversine check.
+"""
+import math
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+GEOHASH_PRECISION = 9   # ~4.8m x 4.8m cells
+EARTH_RADIUS_KM = 6371.0088
+
+
+def encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Return the geohash of a point"""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bit, ch, even = 0, 0, True
+    while len(chars) < precision:
+        rng, value = (lon_range, longitude) if even else (lat_range, latitude)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            ch |= 1 << (4 - bit)
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        if bit < 4:
+            bit += 1
+        else:
+            chars.append(_BASE32[ch])
+            bit, ch = 0, 0
+    return "".join(chars)
+
+
+def prefix_range(prefix):
+    """
+    Return (low, high) such that low <= geohash < high exactly when the
+    geohash starts with prefix. '~' sorts after every base32 character.
+    """
+    return prefix, prefix + "~"
+
+
+def cell_size(precision):
+    """Return (lat_degrees, lon_degrees) of a cell at this precision"""
+    bits = precision * 5
+    lon_bits = (bits + 1) // 2
+    lat_bits = bits // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance between two points in km"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """
+    Return (min_lat, max_lat, min_lon, max_lon) enclosing the circle.
+    The longitude span is widened to the whole world near the poles.
+    """
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    min_lat, max_lat = max(-90.0, latitude - dlat), min(90.0, latitude + dlat)
+    if min_lat <= -90.0 or max_lat >= 90.0:
+        return min_lat, max_lat, -180.0, 180.0
+    dlon = math.degrees(radius_km / (EARTH_RADIUS_KM * math.cos(math.radians(latitude))))
+    if dlon >= 180.0:
+        return min_lat, max_lat, -180.0, 180.0
+    return min_lat, max_lat, longitude - dlon, longitude + dlon
+
+
+def covering_cells(latitude, longitude, radius_km, max_cells=16):
+    """
+    Return the geohash prefixes of the cells covering the circle.
+    Picks the finest precision whose covering needs at most max_cells.
+    """
+    min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, radius_km)
+
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        lat_step, lon_step = cell_size(precision)
+        rows = math.floor((max_lat + 90.0) / lat_step) - math.floor((min_lat + 90.0) / lat_step) + 1
+        cols = math.floor((max_lon + 180.0) / lon_step) - math.floor((min_lon + 180.0) / lon_step) + 1
+        if rows * cols <= max_cells:
+            break
+
+    cells = set()
+    lat = min_lat
+    for _ in range(rows):
+        lon = min_lon
+        for _ in range(cols):
+            # wrap across the antimeridian
+            wrapped = (lon + 180.0) % 360.0 - 180.0
+            cells.add(encode(min(lat, 90.0), wrapped, precision))
+            lon += lon_step
+        lat += lat_step
+    # make sure the far corners are covered despite float stepping
+    for lat in (min_lat, max_lat):
+        for lon in (min_lon, max_lon):
+            cells.add(encode(lat, (lon + 180.0) % 360.0 - 180.0, precision))
+    return sorted(cells)
@@ -0,0 +1,146 @@
+"""
+Password hashing off the request thread.
+
+bcrypt is deliberately slow (~250ms at cost 12), so hashes and checks run
+in a bounded process pool: a request thread only waits on the result and
+other threads of the worker keep serving meanwhile. With
+PASSWORD_HASH_WORKERS = 0 everything runs inline (tests, one-off scripts).
+
+The work factor is BCRYPT_LOG_ROUNDS. Hashes made with a lower cost are
+reported by needs_rehash() so login can upgrade them transparently.
+"""
+import os
+import secrets
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from multiprocessing import get_context
+
+import bcrypt
+
+from app.utils import fork_safety
+
+# bcrypt only reads the first 72 bytes; older bcrypt releases truncated
+# silently and existing hashes rely on it
+MAX_PASSWORD_BYTES = 72
+
+
+class PasswordHasherBusy(Exception):
+    """Too many hashing jobs queued, or one timed out: try again later"""
+
+
+def _to_bytes(password):
+    if isinstance(password, str):
+        password = password.encode("utf-8")
+    return password[:MAX_PASSWORD_BYTES]
+
+
+# module level so the pool can pickle them
+def _hash(password, rounds):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds)).decode("utf-8")
+
+
+def _check(password, hashed):
+    try:
+        return bcrypt.checkpw(password, hashed)
+    except ValueError:
+        # not a bcrypt hash
+        return False
+
+
+class PasswordHasher:
+    """Configured per app with init_app(), like the other extensions in app/__init__.py."""
+    def __init__(self):
+        self.rounds = 12
+        self.workers = 0
+        self.timeout = None
+        self._pool = None
+        self._slots = None
+        self._max_pending = 0
+        self._dummy_hash = None
+        self._lock = threading.Lock()
+        fork_safety.register(self)
+
+    def init_app(self, app):
+        self.shutdown()
+        self._dummy_hash = None
+        self.rounds = app.config.get("BCRYPT_LOG_ROUNDS", 12)
+        workers = app.config.get("PASSWORD_HASH_WORKERS", 0)
+        if workers is None:
+            workers = os.cpu_count() or 1
+        self.workers = workers
+        self.timeout = app.config.get("PASSWORD_HASH_TIMEOUT", 10)
+        # jobs waiting or running; beyond this callers get PasswordHasherBusy
+        self._max_pending = app.config.get("PASSWORD_HASH_MAX_PENDING") or self.workers * 8
+        self._slots = threading.BoundedSemaphore(self._max_pending) if self.workers else None
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def after_fork(self):
+        # the parent's pool processes are not ours to use or shut down;
+        # a new pool starts on first use
+        self._pool = None
+        self._lock = threading.Lock()
+        if self._slots is not None:
+            self._slots = threading.BoundedSemaphore(self._max_pending)
+
+    # ---------- pool ----------
+    def _executor(self):
+        # created on first use, so every forked server worker gets its own
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(self.workers, mp_context=get_context("spawn"))
+            return self._pool
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PasswordHasherBusy("Password hashing queue is full")
+        try:
+            future = self._executor().submit(fn, *args)
+            try:
+                return future.result(timeout=self.timeout)
+            except FutureTimeoutError:
+                # drop it if it has not started; a running job finishes unseen
+                future.cancel()
+                raise PasswordHasherBusy(f"Password hashing took longer than {self.timeout}s")
+        finally:
+            self._slots.release()
+
+    # ---------- public ----------
+    def hash(self, password):
+        """Return the bcrypt hash of password at the configured cost"""
+        return self._run(_hash, _to_bytes(password), self.rounds)
+
+    def verify(self, hashed, password):
+        """Check password against a stored hash"""
+        if not hashed:
+            return False
+        return self._run(_check, _to_bytes(password), hashed.encode("utf-8"))
+
+    def verify_dummy(self, password):
+        """
+        Check password against a throw-away hash at the current cost and
+        return False, so a login for an unknown email takes as long as a
+        wrong password and does not reveal which emails exist.
+        """
+        if self._dummy_hash is None or self.needs_rehash(self._dummy_hash):
+            self._dummy_hash = self.hash(secrets.token_hex(16))
+        self.verify(self._dummy_hash, password)
+        return False
+
+    def needs_rehash(self, hashed):
+        """True if hashed was made with a lower cost than BCRYPT_LOG_ROUNDS"""
+        try:
+            # $2b$12$<salt+hash>
+            return int(hashed.split("$")[2]) < self.rounds
+        except (AttributeError, IndexError, ValueError):
+            return True
+
+
+password_hasher = PasswordHasher()
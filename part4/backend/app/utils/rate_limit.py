@@ -0,0 +1,193 @@
+"""
+Token-bucket rate limiting for the login endpoint.
+
+Every bucket holds up to `capacity` tokens and refills continuously at
+capacity per period; an attempt takes one token and is rejected when
+the bucket is empty. Buckets are keyed per client IP and per email, so
+a burst from one address and a slow spray against one account are both
+cut off before any database lookup or bcrypt check.
+
+Backends, chosen by RATELIMIT_STORAGE:
+    'memory' - per process; enough with a single worker
+    'redis'  - shared by every worker, through a Lua script run
+               atomically by any server speaking the Redis protocol
+"""
+import hashlib
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from app.utils import fork_safety
+from app.utils.resp import RespClient, RespError
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+def parse_rate(rate):
+    """'10/minute' -> (capacity 10, refill 10/60 tokens per second)"""
+    count, _, period = rate.partition("/")
+    if period not in PERIODS:
+        raise ValueError(f"Invalid rate '{rate}', expected e.g. '10/minute'")
+    capacity = int(count)
+    return capacity, capacity / PERIODS[period]
+
+
+# ---------- backends ----------
+class MemoryBuckets:
+    """Buckets in this process, least recently used ones dropped past max_keys"""
+    def __init__(self, max_keys=100000, clock=time.monotonic):
+        self.max_keys = max_keys
+        self.clock = clock
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, refill):
+        """Take a token; return 0 if allowed, else seconds until one is available"""
+        now = self.clock()
+        with self._lock:
+            tokens, last = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - last) * refill)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return 0 if allowed else (1 - tokens) / refill
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+    def after_fork(self):
+        self._lock = threading.Lock()
+
+
+_TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local refill = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local last = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - last) * refill)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / refill * 1000) + 1000)
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisBuckets:
+    """
+    Buckets shared by every worker. The refill-and-take runs as one Lua
+    script, so concurrent workers cannot both take the last token.
+    """
+    def __init__(self, client, prefix="hbnb:ratelimit:"):
+        self.client = client
+        self.prefix = prefix
+        self._sha = hashlib.sha1(_TAKE_SCRIPT.encode("utf-8")).hexdigest()
+
+    def after_fork(self):
+        self.client.after_fork()
+
+    def take(self, key, capacity, refill):
+        args = (1, self.prefix + key, capacity, refill, f"{time.time():.6f}")
+        try:
+            allowed, tokens = self.client.execute("EVALSHA", self._sha, *args)
+        except RespError as e:
+            if not str(e).startswith("NOSCRIPT"):
+                raise
+            allowed, tokens = self.client.execute("EVAL", _TAKE_SCRIPT, *args)
+        return 0 if allowed else (1 - float(tokens)) / refill
+
+    def clear(self):
+        cursor = "0"
+        while True:
+            cursor, keys = self.client.execute("SCAN", cursor, "MATCH", self.prefix + "*", "COUNT", 500)
+            cursor = cursor.decode() if isinstance(cursor, bytes) else str(cursor)
+            if keys:
+                self.client.execute("DEL", *keys)
+            if cursor == "0":
+                break
+
+
+# ---------- extension ----------
+class LoginRateLimiter:
+    """Configured per app with init_app(), like the other extensions in app/__init__.py."""
+    def __init__(self):
+        self.backend = MemoryBuckets()
+        self.enabled = True
+        self.ip_rate = parse_rate("20/minute")
+        self.email_rate = parse_rate("5/minute")
+        self._stats_lock = threading.Lock()
+        self.reset_stats()
+        fork_safety.register(self)
+
+    def after_fork(self):
+        self._stats_lock = threading.Lock()
+        self.backend.after_fork()
+
+    def init_app(self, app):
+        self.enabled = app.config.get("RATELIMIT_ENABLED", True)
+        self.ip_rate = parse_rate(app.config.get("RATELIMIT_LOGIN_PER_IP", "20/minute"))
+        self.email_rate = parse_rate(app.config.get("RATELIMIT_LOGIN_PER_EMAIL", "5/minute"))
+        storage = app.config.get("RATELIMIT_STORAGE", "memory")
+        if storage == "memory":
+            self.backend = MemoryBuckets()
+        elif storage == "redis":
+            self.backend = RedisBuckets(RespClient(app.config.get("RATELIMIT_REDIS_URL", "redis://127.0.0.1:6379/0")))
+        else:
+            raise ValueError(f"Unknown RATELIMIT_STORAGE: {storage}")
+        self.reset_stats()
+
+    # ---------- stats ----------
+    def reset_stats(self):
+        with self._stats_lock:
+            self._stats = {"allowed": 0, "rejected_ip": 0, "rejected_email": 0, "backend_errors": 0}
+
+    def _count(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["backend"] = type(self.backend).__name__
+        return stats
+
+    # ---------- check ----------
+    def check(self, ip, email):
+        """
+        Take a token from the IP bucket, then from the email bucket.
+        Return None if the attempt may go ahead, else the number of
+        seconds to wait. Backend errors let the attempt through.
+        """
+        if not self.enabled:
+            return None
+        email = (email or "").strip().lower()
+        try:
+            wait = self.backend.take(f"login:ip:{ip}", *self.ip_rate)
+            if wait:
+                self._count("rejected_ip")
+                return math.ceil(wait)
+            wait = self.backend.take(f"login:email:{email}", *self.email_rate)
+            if wait:
+                self._count("rejected_email")
+                return math.ceil(wait)
+        except (ConnectionError, RespError) as e:
+            logger.warning("rate limiter unavailable, allowing login: %s", e)
+            self._count("backend_errors")
+        self._count("allowed")
+        return None
+
+
+login_limiter = LoginRateLimiter()
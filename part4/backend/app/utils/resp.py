@@ -0,0 +1,100 @@
+"""
+Minimal client for servers speaking the Redis protocol (RESP2).
+
+Only what the cache and the rate limiter need: send a command, read the
+reply. One connection per thread, reconnecting after errors. Works with
+Redis, Valkey, KeyDB or any local stand-in implementing the commands used.
+"""
+import socket
+import threading
+from urllib.parse import urlparse
+
+
+class RespError(Exception):
+    """Error reply sent by the server"""
+
+
+class RespClient:
+    def __init__(self, url="redis://127.0.0.1:6379/0", timeout=1.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 6379
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.password = parsed.password
+        self.timeout = timeout
+        self._local = threading.local()
+
+    # ---------- connection ----------
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            conn = (sock, sock.makefile("rb"))
+            self._local.conn = conn
+            if self.password:
+                self._send(conn, ("AUTH", self.password))
+            if self.db:
+                self._send(conn, ("SELECT", self.db))
+        return conn
+
+    def after_fork(self):
+        # the inherited socket belongs to the parent: forget it, unclosed
+        self._local = threading.local()
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            self._local.conn = None
+            sock, reader = conn
+            reader.close()
+            sock.close()
+
+    # ---------- protocol ----------
+    @staticmethod
+    def _encode(args):
+        out = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            if isinstance(arg, bytes):
+                data = arg
+            else:
+                data = str(arg).encode("utf-8")
+            out.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        return b"".join(out)
+
+    def _read_reply(self, reader):
+        line = reader.readline()
+        if not line:
+            raise ConnectionError("Connection closed by server")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload.decode("utf-8")
+        if kind == b"-":
+            raise RespError(payload.decode("utf-8"))
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = reader.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            length = int(payload)
+            if length < 0:
+                return None
+            return [self._read_reply(reader) for _ in range(length)]
+        raise ConnectionError(f"Unexpected reply: {line!r}")
+
+    def _send(self, conn, args):
+        sock, reader = conn
+        sock.sendall(self._encode(args))
+        return self._read_reply(reader)
+
+    def execute(self, *args):
+        """Send one command and return its decoded reply"""
+        try:
+            return self._send(self._connection(), args)
+        except (OSError, ConnectionError):
+            # drop the broken connection so the next call reconnects
+            self.close()
+            raise ConnectionError(f"Cannot reach {self.host}:{self.port}")
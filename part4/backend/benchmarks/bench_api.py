@@ -0,0 +1,370 @@
+"""
+Measure the API endpoints against a freshly seeded database.
+
+Run from part4/backend:
+    python -m benchmarks.bench_api --places 5000 --reviews 50000
+    python -m benchmarks.bench_api --server --compare benchmarks/results/api-1a2b3c4.json
+
+A throw-away SQLite file is seeded with users, amenities, places (with
+amenity associations) and reviews shaped like seed_data.sql. Each
+endpoint is requested through the Flask test client, or over HTTP from
+a local WSGI server with --server, and its latency percentiles, SQL
+queries per request and throughput are written to a JSON file named
+after the current commit so runs can be compared across commits.
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import sqlalchemy
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from app import create_app, db
+from app.models.amenity import Amenity
+from app.models.place import Place, place_amenity
+from app.models.review import Review
+from app.models.user import User
+from app.persistence.place_repository import PlaceRepository
+from app.utils import geo
+from app.utils.passwords import password_hasher
+
+PASSWORD = "bench1234"
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+AMENITY_NAMES = ["WiFi", "Air Conditioning", "Kitchen", "TV", "Parking", "Heating",
+                 "Pool", "Washer", "Dryer", "Gym", "Hot Tub", "Fireplace"]
+
+
+def seed(users, places, amenities, reviews, amenities_per_place=3, chunk=20000, reserved=0):
+    """
+    Bulk insert every table with executemany. Returns the user, place
+    and amenity ids, and (review id, author id) pairs.
+    The last `reserved` users own no place and wrote no review, so the
+    write endpoints can review as them.
+    """
+    rng = random.Random(42)
+    authors = max(1, users - reserved)
+    # bcrypt is slow on purpose: every user shares one hash, as in seed_data.sql
+    password = password_hasher.hash(PASSWORD)
+    start = datetime(2024, 1, 1)
+
+    def insert(table, rows):
+        for i in range(0, len(rows), chunk):
+            db.session.execute(table.insert(), rows[i:i + chunk])
+
+    user_ids = [str(uuid.uuid4()) for _ in range(users)]
+    insert(User.__table__, [
+        {"id": uid, "first_name": "Bench", "last_name": str(i), "email": f"bench{i}@example.com",
+         "password": password, "is_admin": False}
+        for i, uid in enumerate(user_ids)
+    ])
+
+    amenity_ids = [str(uuid.uuid4()) for _ in range(amenities)]
+    insert(Amenity.__table__, [
+        {"id": aid, "name": f"{AMENITY_NAMES[i % len(AMENITY_NAMES)]} {i // len(AMENITY_NAMES) or ''}".strip(),
+         "description": "bench"}
+        for i, aid in enumerate(amenity_ids)
+    ])
+
+    place_ids = [str(uuid.uuid4()) for _ in range(places)]
+    rows = []
+    for i, pid in enumerate(place_ids):
+        latitude, longitude = rng.uniform(-45, -10), rng.uniform(110, 155)
+        created_at = start + timedelta(minutes=i)
+        rows.append({
+            "id": pid, "title": f"Place {i}", "description": "A benchmark listing.",
+            "price": round(rng.uniform(20, 1000), 2), "address": f"{i} Bench Street",
+            "latitude": latitude, "longitude": longitude, "geohash": geo.encode(latitude, longitude),
+            "owner_id": user_ids[i % authors], "rating_sum": 0, "rating_count": 0,
+            "created_at": created_at, "updated_at": created_at,
+        })
+    insert(Place.__table__, rows)
+    insert(place_amenity, [
+        {"place_id": pid, "amenity_id": aid}
+        for pid in place_ids
+        for aid in rng.sample(amenity_ids, min(amenities_per_place, amenities))
+    ])
+
+    # at most one review per (place, user), as the API enforces
+    per_place = max(1, reviews // places)
+    rows, written = [], []
+    for k in range(reviews):
+        p, j = k % places, k // places
+        rows.append({
+            "id": str(uuid.uuid4()), "rating": rng.randint(1, 5), "text": "bench",
+            "place_id": place_ids[p], "user_id": user_ids[(p + 1 + j * (authors // per_place)) % authors],
+        })
+        written.append((rows[-1]["id"], rows[-1]["user_id"]))
+        if len(rows) == chunk:
+            insert(Review.__table__, rows)
+            rows = []
+    insert(Review.__table__, rows)
+    db.session.commit()
+    PlaceRepository().rebuild_rating_totals()
+    db.session.commit()
+    return user_ids, place_ids, amenity_ids, written
+
+
+def endpoints(user_ids, place_ids, amenity_ids, review_ids, tokens, args):
+    """(name, method, request factory returning (path, json body, headers), requests)"""
+    rng = random.Random(7)
+    authors = len(user_ids) - args.reserved_users
+    # every (reserved user, place) pair reviews once
+    reviewers = iter([(u, p) for p in range(len(place_ids)) for u in range(authors, len(user_ids))])
+
+    def public(path, body=None):
+        return lambda: (path(), body() if body else None, None)
+
+    def bearer(user_id):
+        return {"Authorization": f"Bearer {tokens[user_id]}"}
+
+    def review_create():
+        user, place = next(reviewers)
+        body = {"place_id": place_ids[place], "rating": 4, "text": "bench"}
+        return "/api/v1/reviews/", body, bearer(user_ids[user])
+
+    def review_update():
+        review_id, author_id = rng.choice(review_ids)
+        return f"/api/v1/reviews/{review_id}", {"rating": 3, "text": "bench, edited"}, bearer(author_id)
+
+    def place_create():
+        owner = rng.randrange(authors)
+        body = {"owner_id": user_ids[owner], "title": "Bench Listing", "price": 120.0,
+                "latitude": -37.8, "longitude": 145.0,
+                "amenity_ids": rng.sample(amenity_ids, min(3, len(amenity_ids)))}
+        return "/api/v1/places/", body, bearer(user_ids[owner])
+
+    def place_update():
+        place = rng.randrange(len(place_ids))
+        return f"/api/v1/places/{place_ids[place]}", {"title": f"Place {place}"}, bearer(user_ids[place % authors])
+
+    return [
+        ("places_page", "GET", public(lambda: "/api/v1/places/?limit=20"), args.requests),
+        ("places_all", "GET", public(lambda: "/api/v1/places/"), args.list_requests),
+        ("place_detail", "GET", public(lambda: f"/api/v1/places/{rng.choice(place_ids)}"), args.requests),
+        ("reviews_all", "GET", public(lambda: "/api/v1/reviews/"), args.list_requests),
+        ("reviews_by_place", "GET", public(lambda: f"/api/v1/reviews/place/{rng.choice(place_ids)}"), args.requests),
+        ("auth_login", "POST", public(lambda: "/api/v1/auth/login",
+                                      lambda: {"email": f"bench{rng.randrange(args.users)}@example.com",
+                                               "password": PASSWORD}),
+         args.login_requests),
+        # authenticated writes, as a reviewer and as the place owner
+        ("place_create", "POST", place_create, args.write_requests),
+        ("review_create", "POST", review_create, args.write_requests),
+        ("review_update", "PUT", review_update, args.write_requests),
+        ("place_update", "PUT", place_update, args.write_requests),
+    ]
+
+
+class TestClientDriver:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, body, headers=None):
+        response = self.client.open(path, method=method, json=body, headers=headers)
+        response.get_data()
+        return response.status_code
+
+    def close(self):
+        pass
+
+
+class _KeepAliveHandler(WSGIRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class ServerDriver:
+    """A local WSGI server in a thread, requested over one keep-alive connection"""
+    def __init__(self, app):
+        self.server = make_server("127.0.0.1", 0, app, request_handler=_KeepAliveHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.conn = http.client.HTTPConnection("127.0.0.1", self.server.server_port)
+
+    def request(self, method, path, body, headers=None):
+        headers = dict(headers or {})
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers["Content-Type"] = "application/json"
+        self.conn.request(method, path, body=payload, headers=headers)
+        response = self.conn.getresponse()
+        response.read()
+        return response.status
+
+    def close(self):
+        self.conn.close()
+        self.server.shutdown()
+
+
+def percentile(samples, pct):
+    return statistics.quantiles(samples, n=100, method="inclusive")[pct - 1] if len(samples) > 1 else samples[0]
+
+
+def measure(driver, method, make_request, requests, warmup):
+    """Time one endpoint, counting the SQL statements and commits of each request"""
+    statements, commits = [], []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    def count_commit(conn):
+        commits.append(None)
+
+    for _ in range(warmup):
+        driver.request(method, *make_request())
+
+    samples, queries, transactions, errors = [], [], [], 0
+    event.listen(db.engine, "before_cursor_execute", count)
+    event.listen(db.engine, "commit", count_commit)
+    try:
+        started = time.perf_counter()
+        for _ in range(requests):
+            statements.clear()
+            commits.clear()
+            request_args = make_request()
+            start = time.perf_counter()
+            status = driver.request(method, *request_args)
+            samples.append((time.perf_counter() - start) * 1000)
+            queries.append(len(statements))
+            transactions.append(len(commits))
+            if status >= 400:
+                errors += 1
+        elapsed = time.perf_counter() - started
+    finally:
+        event.remove(db.engine, "before_cursor_execute", count)
+        event.remove(db.engine, "commit", count_commit)
+
+    return {
+        "requests": requests,
+        "errors": errors,
+        "p50_ms": round(percentile(samples, 50), 3),
+        "p95_ms": round(percentile(samples, 95), 3),
+        "p99_ms": round(percentile(samples, 99), 3),
+        "mean_ms": round(statistics.fmean(samples), 3),
+        "queries_per_request": round(statistics.fmean(queries), 2),
+        "commits_per_request": round(statistics.fmean(transactions), 2),
+        "throughput_rps": round(requests / elapsed, 1),
+    }
+
+
+def git_revision():
+    """(commit, dirty) of the working tree, (None, None) outside git"""
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=cwd, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        status = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=cwd,
+                                capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, bool(status.strip())
+
+
+def print_report(results, baseline=None):
+    header = f"{'endpoint':<18}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries':>9}{'commits':>9}{'req/s':>10}"
+    if baseline:
+        header += f"{'p50 vs base':>13}"
+    print("\n" + header)
+    for name, r in results["endpoints"].items():
+        line = (f"{name:<18}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}"
+                f"{r['queries_per_request']:>9.1f}{r.get('commits_per_request', 0):>9.1f}"
+                f"{r['throughput_rps']:>10.1f}")
+        base = baseline["endpoints"].get(name) if baseline else None
+        if base:
+            line += f"{(r['p50_ms'] - base['p50_ms']) / base['p50_ms'] * 100:>+12.1f}%"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--places", type=int, default=2000)
+    parser.add_argument("--amenities", type=int, default=20)
+    parser.add_argument("--reviews", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=200, help="requests per single-item / paged endpoint")
+    parser.add_argument("--list-requests", type=int, default=20, help="requests per full-listing endpoint")
+    parser.add_argument("--login-requests", type=int, default=20, help="logins (each runs bcrypt)")
+    parser.add_argument("--write-requests", type=int, default=100, help="authenticated review posts / place updates")
+    parser.add_argument("--reserved-users", type=int, default=50,
+                        help="users with no place and no review, who post the benchmark reviews")
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--cache", default="simple", choices=("null", "simple"), help="CACHE_TYPE")
+    parser.add_argument("--server", action="store_true", help="go through a local WSGI server over HTTP")
+    parser.add_argument("--output", help="JSON file (default benchmarks/results/api-<commit>.json)")
+    parser.add_argument("--compare", help="earlier JSON result to print p50 deltas against")
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench_api.db")
+
+    class BenchConfig:
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{path}"
+        SQLALCHEMY_TRACK_MODIFICATIONS = False
+        SECRET_KEY = "bench-secret-key-long-enough-for-hs256"
+        CACHE_TYPE = args.cache
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.create_all()
+        start = time.perf_counter()
+        user_ids, place_ids, amenity_ids, review_ids = seed(args.users, args.places, args.amenities, args.reviews,
+                                   reserved=args.reserved_users)
+        tokens = {uid: create_access_token(identity=uid, additional_claims={"is_admin": False}) for uid in user_ids}
+        print(f"seeded {args.users} users / {args.places} places / {args.reviews} reviews "
+              f"in {time.perf_counter() - start:.1f}s")
+        db.session.remove()
+
+    driver = ServerDriver(app) if args.server else TestClientDriver(app)
+    commit, dirty = git_revision()
+    results = {
+        "commit": commit,
+        "dirty": dirty,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlalchemy": sqlalchemy.__version__,
+        "driver": "server" if args.server else "test_client",
+        "volumes": {"users": args.users, "places": args.places,
+                    "amenities": args.amenities, "reviews": args.reviews},
+        "cache": args.cache,
+        "endpoints": {},
+    }
+    try:
+        for name, method, make_request, requests in endpoints(user_ids, place_ids, amenity_ids, review_ids, tokens, args):
+            if requests <= 0:
+                continue
+            with app.app_context():
+                results["endpoints"][name] = measure(driver, method, make_request, requests, args.warmup)
+            print(f"  {name}: done")
+    finally:
+        driver.close()
+        os.remove(path)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"api-{(commit or 'nogit')[:7]}{'-dirty' if dirty else ''}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(results, baseline)
+    print(f"\nwrote {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Concurrent writers and readers on a disk-backed SQLite database.
+
+Run from part4/backend:
+    python -m benchmarks.bench_concurrency --writers 8 --readers 4 --seconds 10
+
+The same seeded database is hammered through the facade by --writers
+threads (place updates and creations, one transaction each) and
+--readers threads (a place page and a place's reviews) for --seconds,
+once with SQLite's defaults (rollback journal, synchronous=FULL) and
+once with the SQLITE_PRAGMAS of ProductionConfig (WAL,
+synchronous=NORMAL, mmap, busy timeout). "database is locked"
+failures, throughput and write latency are reported for each.
+--busy-timeout-ms applies to both runs.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+
+from sqlalchemy.exc import OperationalError
+
+from app import create_app, db
+from app.persistence.sqlite_pragmas import sqlite_pragmas
+from benchmarks.bench_api import seed
+from config import SQLITE_TUNED_PRAGMAS
+
+
+def make_app(path, pragmas, busy_timeout_ms):
+    class ConcurrencyConfig:
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{path}"
+        SQLALCHEMY_TRACK_MODIFICATIONS = False
+        # pysqlite's own busy handler, used when no PRAGMA overrides it
+        SQLALCHEMY_ENGINE_OPTIONS = {"connect_args": {"timeout": busy_timeout_ms / 1000}}
+        SQLITE_PRAGMAS = dict(pragmas, busy_timeout=busy_timeout_ms) if pragmas else {}
+        SECRET_KEY = "bench-secret-key-long-enough-for-hs256"
+        RATELIMIT_ENABLED = False
+        DB_SLOW_QUERY_MS = None
+
+    return create_app(ConcurrencyConfig)
+
+
+def run(name, pragmas, args):
+    path = os.path.join(tempfile.mkdtemp(), "bench_concurrency.db")
+    app = make_app(path, pragmas, args.busy_timeout_ms)
+    with app.app_context():
+        db.create_all()
+        user_ids, place_ids, amenity_ids, _ = seed(args.users, args.places, 10, args.reviews)
+        with db.engine.connect() as connection:
+            settings = sqlite_pragmas.current(connection)
+        db.session.remove()
+
+    from app.services import facade
+
+    stop = threading.Event()
+    lock = threading.Lock()
+    totals = {"writes": 0, "reads": 0, "locked": 0, "other_errors": 0}
+    write_ms = []
+
+    def count(key, amount=1):
+        with lock:
+            totals[key] += amount
+
+    def writer(n):
+        rng = random.Random(n)
+        with app.app_context():
+            while not stop.is_set():
+                start = time.perf_counter()
+                try:
+                    if rng.random() < 0.8:
+                        facade.update_place(rng.choice(place_ids), {"price": round(rng.uniform(20, 900), 2)})
+                    else:
+                        facade.create_place({
+                            "owner_id": rng.choice(user_ids), "title": f"Concurrent {n}", "price": 99.0,
+                            "latitude": rng.uniform(-45, -10), "longitude": rng.uniform(110, 155),
+                            "amenity_ids": rng.sample(amenity_ids, 2),
+                        })
+                except OperationalError as e:
+                    count("locked" if "locked" in str(e) else "other_errors")
+                except Exception:
+                    count("other_errors")
+                else:
+                    count("writes")
+                    with lock:
+                        write_ms.append((time.perf_counter() - start) * 1000)
+                finally:
+                    db.session.remove()
+
+    def reader(n):
+        rng = random.Random(-n)
+        with app.app_context():
+            while not stop.is_set():
+                try:
+                    facade.list_places(limit=50)
+                    facade.get_reviews_for_place(rng.choice(place_ids))
+                except OperationalError as e:
+                    count("locked" if "locked" in str(e) else "other_errors")
+                except Exception:
+                    count("other_errors")
+                else:
+                    count("reads")
+                finally:
+                    db.session.remove()
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(args.writers)]
+    threads += [threading.Thread(target=reader, args=(n,)) for n in range(args.readers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        db.engine.dispose()
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+    return {
+        "profile": name,
+        "pragmas": settings,
+        "writes": totals["writes"],
+        "reads": totals["reads"],
+        "locked_errors": totals["locked"],
+        "other_errors": totals["other_errors"],
+        "writes_per_s": round(totals["writes"] / elapsed, 1),
+        "reads_per_s": round(totals["reads"] / elapsed, 1),
+        "write_p50_ms": round(statistics.median(write_ms), 2) if write_ms else None,
+        "write_p95_ms": round(statistics.quantiles(write_ms, n=20)[18], 2) if len(write_ms) > 1 else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--busy-timeout-ms", type=int, default=5000,
+                        help="how long a connection waits for a lock before 'database is locked'")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--places", type=int, default=2000)
+    parser.add_argument("--reviews", type=int, default=10000)
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = [run("sqlite defaults", {}, args), run("tuned", SQLITE_TUNED_PRAGMAS, args)]
+
+    print(f"\nwriters: {args.writers}, readers: {args.readers}, {args.seconds:g}s each, "
+          f"busy timeout {args.busy_timeout_ms} ms")
+    print(f"{'profile':<18}{'journal':>9}{'writes/s':>10}{'reads/s':>10}{'locked':>8}"
+          f"{'other':>7}{'write p50':>11}{'write p95':>11}")
+    for r in results:
+        print(f"{r['profile']:<18}{r['pragmas']['journal_mode']:>9}{r['writes_per_s']:>10.1f}"
+              f"{r['reads_per_s']:>10.1f}{r['locked_errors']:>8}{r['other_errors']:>7}"
+              f"{r['write_p50_ms'] or 0:>11.2f}{r['write_p95_ms'] or 0:>11.2f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"args": vars(args), "runs": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Time the repository filter queries with and without the model indexes.
+
+Run from part4/backend:
+    python -m benchmarks.bench_indexes --places 100000 --reviews 1000000
+
+A throw-away SQLite file is seeded, the declared indexes are dropped to
+reproduce the old schema, every query is timed, then the indexes are
+created through the migration step and the queries are timed again.
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+import uuid
+
+from app import create_app, db
+from app.models.place import Place
+from app.models.review import Review
+from app.models.user import User
+from app.persistence import migrations
+from app.persistence.place_repository import PlaceRepository
+from app.persistence.review_repository import ReviewRepository
+
+
+def seed(places, reviews, users, chunk=20000):
+    """Bulk insert users, places and reviews with executemany"""
+    user_ids = [str(uuid.uuid4()) for _ in range(users)]
+    place_ids = [str(uuid.uuid4()) for _ in range(places)]
+    rng = random.Random(42)
+
+    def insert(table, rows):
+        for i in range(0, len(rows), chunk):
+            db.session.execute(table.insert(), rows[i:i + chunk])
+
+    insert(User.__table__, [
+        {"id": uid, "first_name": "Bench", "last_name": str(i), "email": f"bench{i}@example.com",
+         "password": "x", "is_admin": False}
+        for i, uid in enumerate(user_ids)
+    ])
+    insert(Place.__table__, [
+        {"id": pid, "title": f"Place {i}", "description": "", "price": rng.uniform(20, 1000),
+         "latitude": rng.uniform(-60, 60), "longitude": rng.uniform(-180, 180),
+         "owner_id": user_ids[i % users], "rating_sum": 0, "rating_count": 0}
+        for i, pid in enumerate(place_ids)
+    ])
+
+    per_place = max(1, reviews // places)
+    rows = []
+    for k in range(reviews):
+        p, j = k % places, k // places
+        rows.append({
+            "id": str(uuid.uuid4()), "rating": rng.randint(1, 5), "text": "bench",
+            "place_id": place_ids[p], "user_id": user_ids[(p + j * (users // per_place)) % users],
+        })
+        if len(rows) == chunk:
+            insert(Review.__table__, rows)
+            rows = []
+    insert(Review.__table__, rows)
+    db.session.commit()
+    return user_ids, place_ids
+
+
+def time_queries(user_ids, place_ids, repeat):
+    place_repo, review_repo = PlaceRepository(), ReviewRepository()
+    rng = random.Random(7)
+    queries = {
+        "get_places_by_owner": lambda: place_repo.get_places_by_owner(rng.choice(user_ids)),
+        "get_places_by_price_range": lambda: (
+            lambda low: place_repo.get_places_by_price_range(low, low + 1)
+        )(rng.uniform(20, 999)),
+        "get_places_by_location": lambda: (
+            lambda lat, lon: place_repo.get_places_by_location(lat, lat + 0.5, lon, lon + 0.5)
+        )(rng.uniform(-60, 59), rng.uniform(-180, 179)),
+        "get_reviews_for_place": lambda: review_repo.get_reviews_for_place(rng.choice(place_ids)),
+        "user_already_reviewed": lambda: review_repo.user_already_reviewed(
+            rng.choice(place_ids), rng.choice(user_ids)),
+    }
+    results = {}
+    for name, query in queries.items():
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            query()
+            samples.append((time.perf_counter() - start) * 1000)
+            db.session.expunge_all()
+        results[name] = statistics.median(samples)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--places", type=int, default=100000)
+    parser.add_argument("--reviews", type=int, default=1000000)
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench_indexes.db")
+
+    class BenchConfig:
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{path}"
+        SQLALCHEMY_TRACK_MODIFICATIONS = False
+        SECRET_KEY = "bench"
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.create_all()
+        for table in (Place.__table__, Review.__table__):
+            for index in table.indexes:
+                index.drop(db.engine)
+
+        start = time.perf_counter()
+        user_ids, place_ids = seed(args.places, args.reviews, args.users)
+        print(f"seeded {args.places} places / {args.reviews} reviews in {time.perf_counter() - start:.1f}s")
+
+        before = time_queries(user_ids, place_ids, args.repeat)
+        start = time.perf_counter()
+        migrations.upgrade(db.engine)
+        print(f"created indexes in {time.perf_counter() - start:.1f}s")
+        after = time_queries(user_ids, place_ids, args.repeat)
+
+    print(f"\n{'query (median ms)':<28}{'before':>10}{'after':>10}{'speedup':>10}")
+    for name in before:
+        print(f"{name:<28}{before[name]:>10.2f}{after[name]:>10.2f}{before[name] / after[name]:>9.1f}x")
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
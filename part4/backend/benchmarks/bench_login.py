@@ -0,0 +1,129 @@
+"""
+Login throughput against the number of password hashing processes.
+
+Run from part4/backend:
+    python -m benchmarks.bench_login --workers 0 1 2 4 --clients 8 --logins 200
+
+For each PASSWORD_HASH_WORKERS value a threaded local WSGI server is
+started and --clients threads log in concurrently. With 0 every bcrypt
+check runs on the request thread, contending for the GIL; with N they
+run in N processes, so throughput should grow with N up to the number
+of cores (reported as "cpus").
+"""
+import argparse
+import http.client
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from app import create_app, db
+from app.models.user import User
+from app.utils.passwords import password_hasher
+
+PASSWORD = "bench1234"
+
+
+class _QuietHandler(WSGIRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def run(workers, args):
+    path = os.path.join(tempfile.mkdtemp(), "bench_login.db")
+
+    class BenchConfig:
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{path}"
+        SQLALCHEMY_TRACK_MODIFICATIONS = False
+        SECRET_KEY = "bench-secret-key-long-enough-for-hs256"
+        BCRYPT_LOG_ROUNDS = args.rounds
+        PASSWORD_HASH_WORKERS = workers
+        PASSWORD_HASH_MAX_PENDING = args.clients * 2
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.create_all()
+        password = password_hasher.hash(PASSWORD)
+        db.session.execute(User.__table__.insert(), [
+            {"id": str(uuid.uuid4()), "first_name": "Bench", "last_name": str(i),
+             "email": f"bench{i}@example.com", "password": password, "is_admin": False}
+            for i in range(args.users)
+        ])
+        db.session.commit()
+        # start the pool processes before timing
+        password_hasher.verify(password, PASSWORD)
+
+    server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=_QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    per_client = args.logins // args.clients
+    samples, failures = [], []
+
+    def client(n):
+        conn = http.client.HTTPConnection("127.0.0.1", server.server_port)
+        for i in range(per_client):
+            body = json.dumps({"email": f"bench{(n * per_client + i) % args.users}@example.com",
+                               "password": PASSWORD})
+            start = time.perf_counter()
+            conn.request("POST", "/api/v1/auth/login", body=body, headers={"Content-Type": "application/json"})
+            response = conn.getresponse()
+            response.read()
+            samples.append((time.perf_counter() - start) * 1000)
+            if response.status != 200:
+                failures.append(response.status)
+        conn.close()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(args.clients) as pool:
+        list(pool.map(client, range(args.clients)))
+    elapsed = time.perf_counter() - started
+
+    server.shutdown()
+    password_hasher.shutdown()
+    os.remove(path)
+
+    quantiles = statistics.quantiles(samples, n=100, method="inclusive")
+    return {
+        "workers": workers,
+        "logins": len(samples),
+        "failures": len(failures),
+        "logins_per_s": round(len(samples) / elapsed, 2),
+        "p50_ms": round(quantiles[49], 1),
+        "p95_ms": round(quantiles[94], 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({0, 1, 2, os.cpu_count() or 1}))
+    parser.add_argument("--clients", type=int, default=8, help="concurrent client threads")
+    parser.add_argument("--logins", type=int, default=160, help="logins per run")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=12, help="BCRYPT_LOG_ROUNDS")
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = [run(workers, args) for workers in args.workers]
+
+    print(f"cpus: {os.cpu_count()}, cost: {args.rounds}, clients: {args.clients}")
+    print(f"\n{'hash workers':<14}{'logins/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'failed':>8}")
+    for r in results:
+        print(f"{r['workers']:<14}{r['logins_per_s']:>10.2f}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['failures']:>8}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"cpus": os.cpu_count(), "rounds": args.rounds, "clients": args.clients,
+                       "runs": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
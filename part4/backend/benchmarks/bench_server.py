@@ -0,0 +1,179 @@
+"""
+Throughput of the development server against gunicorn.
+
+Run from part4/backend:
+    python -m benchmarks.bench_server --clients 16 --seconds 15 --workers 3 --threads 4
+
+A throw-away SQLite file is seeded once, then served in turn by the
+Flask development server (python run.py: one process, a thread per
+request) and by gunicorn with gunicorn.conf.py (wsgi:app, --workers
+processes of --threads threads, forked from a preloaded app), both with
+APP_CONFIG=benchmark. --clients threads keep one HTTP connection each
+and request a mix of public GET endpoints for --seconds; requests per
+second, latency percentiles and failed requests are reported per server.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from app import create_app, db
+from benchmarks.bench_api import seed
+from config import BenchmarkConfig
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def seed_database(path, args):
+    class SeedConfig(BenchmarkConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{path}"
+        SQLALCHEMY_ENGINE_OPTIONS = {}
+
+    app = create_app(SeedConfig)
+    with app.app_context():
+        db.create_all()
+        _, place_ids, _, _ = seed(args.users, args.places, 10, args.reviews)
+        db.session.remove()
+        db.engine.dispose()
+    return place_ids
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start(name, port, path, args):
+    env = dict(os.environ, APP_CONFIG="benchmark", DATABASE_URL=f"sqlite:///{path}",
+               WEB_CONCURRENCY=str(args.workers), SERVER_THREADS=str(args.threads),
+               PYTHONPATH=BACKEND, PASSWORD_HASH_WORKERS="0")
+    if name == "flask dev server":
+        command = [sys.executable, "-c", f"from run import app; app.run(host='127.0.0.1', port={port})"]
+    else:
+        command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py",
+                   "--bind", f"127.0.0.1:{port}", "wsgi:app"]
+    process = subprocess.Popen(command, cwd=BACKEND, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+            conn.request("GET", "/api/v1/amenities/")
+            conn.getresponse().read()
+            conn.close()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"{name} did not start on port {port}")
+
+
+def stop(process):
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def load(port, place_ids, args):
+    paths = [
+        lambda rng: "/api/v1/places/?limit=20",
+        lambda rng: f"/api/v1/places/{rng.choice(place_ids)}",
+        lambda rng: f"/api/v1/reviews/place/{rng.choice(place_ids)}",
+    ]
+    deadline = time.perf_counter() + args.seconds
+    lock = threading.Lock()
+    latencies, errors = [], [0]
+
+    def client(n):
+        rng = random.Random(n)
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        mine = []
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                conn.request("GET", rng.choice(paths)(rng))
+                response = conn.getresponse()
+                response.read()
+                ok = response.status == 200
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+                ok = False
+            if ok:
+                mine.append((time.perf_counter() - start) * 1000)
+            else:
+                with lock:
+                    errors[0] += 1
+        conn.close()
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(args.clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0] * 99
+    return {
+        "requests": len(latencies),
+        "errors": errors[0],
+        "req_per_s": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(quantiles[49], 2),
+        "p95_ms": round(quantiles[94], 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=15)
+    parser.add_argument("--workers", type=int, default=(os.cpu_count() or 1) * 2 + 1, help="gunicorn worker processes")
+    parser.add_argument("--threads", type=int, default=4, help="threads per gunicorn worker")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--places", type=int, default=2000)
+    parser.add_argument("--reviews", type=int, default=10000)
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench_server.db")
+    place_ids = seed_database(path, args)
+
+    results = []
+    for name in ("flask dev server", "gunicorn"):
+        port = free_port()
+        process = start(name, port, path, args)
+        try:
+            results.append(dict(server=name, **load(port, place_ids, args)))
+        finally:
+            stop(process)
+
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+    print(f"\nclients: {args.clients}, {args.seconds:g}s each, gunicorn: {args.workers} workers "
+          f"x {args.threads} threads, {os.cpu_count()} CPUs")
+    print(f"{'server':<18}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'errors':>8}")
+    for r in results:
+        print(f"{r['server']:<18}{r['req_per_s']:>9.1f}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['errors']:>8}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"args": vars(args), "cpus": os.cpu_count(), "runs": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,115 @@
 import os
 
+
+def engine_options(uri):
+    """
+    SQLALCHEMY_ENGINE_OPTIONS for a database URL. Server databases
+    (MySQL, PostgreSQL) get a sized pool whose connections are checked
+    before use and recycled before the server drops them; SQLite
+    connections are local and tuned with SQLITE_PRAGMAS instead.
+    """
+    if uri.startswith('sqlite'):
+        return {}
+    return {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 20)),
+        'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', 30)),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': True,
+    }
+
+
+# applied to every new SQLite connection: readers and the writer no
+# longer block each other (WAL), commits skip the per-transaction fsync
+# of the WAL (NORMAL is still safe in WAL mode), reads go through a
+# memory map, and a busy writer is waited for instead of failing
+SQLITE_TUNED_PRAGMAS = {
+    'journal_mode': os.getenv('SQLITE_JOURNAL_MODE', 'WAL'),
+    'synchronous': os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+    'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+}
+
+
 class Config:
     SECRET_KEY = os.getenv('SECRET_KEY', 'default_secret_key')
     DEBUG = False
 
+    # Repository read-through cache: 'null', 'simple' (in-process LRU) or 'redis'
+    CACHE_TYPE = os.getenv('CACHE_TYPE', 'null')
+    CACHE_DEFAULT_TIMEOUT = int(os.getenv('CACHE_DEFAULT_TIMEOUT', 300))
+    CACHE_MAXSIZE = int(os.getenv('CACHE_MAXSIZE', 10000))
+    CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL', 'redis://127.0.0.1:6379/0')
+
+    # SQL instrumentation: log statements slower than this, optionally
+    # return X-DB-Queries / X-DB-Time-ms / Server-Timing headers
+    DB_SLOW_QUERY_MS = float(os.getenv('DB_SLOW_QUERY_MS', 200))
+    DB_STATS_HEADERS = os.getenv('DB_STATS_HEADERS', 'false').lower() == 'true'
+
+    # rows per executemany / savepoint in POST /api/v1/places/bulk
+    BULK_IMPORT_CHUNK_SIZE = int(os.getenv('BULK_IMPORT_CHUNK_SIZE', 1000))
+
+    # rows fetched per round trip by the streamed exports
+    EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 1000))
+    # seconds the export watermark is set back, for rows stamped before
+    # it by transactions that commit later (longer ones can be missed)
+    EXPORT_WATERMARK_OVERLAP = int(os.getenv('EXPORT_WATERMARK_OVERLAP', 300))
+
+    # bcrypt work factor; stored hashes below it are upgraded on login
+    BCRYPT_LOG_ROUNDS = int(os.getenv('BCRYPT_LOG_ROUNDS', 12))
+    # processes hashing passwords (unset: one per CPU, 0: inline)
+    PASSWORD_HASH_WORKERS = int(os.environ['PASSWORD_HASH_WORKERS']) if os.getenv('PASSWORD_HASH_WORKERS') else None
+    PASSWORD_HASH_TIMEOUT = 10
+
+    # login token buckets; 'memory' per process or 'redis' shared by workers
+    RATELIMIT_ENABLED = os.getenv('RATELIMIT_ENABLED', 'true').lower() == 'true'
+    RATELIMIT_STORAGE = os.getenv('RATELIMIT_STORAGE', 'memory')
+    RATELIMIT_REDIS_URL = os.getenv('RATELIMIT_REDIS_URL', 'redis://127.0.0.1:6379/0')
+    RATELIMIT_LOGIN_PER_IP = os.getenv('RATELIMIT_LOGIN_PER_IP', '20/minute')
+    RATELIMIT_LOGIN_PER_EMAIL = os.getenv('RATELIMIT_LOGIN_PER_EMAIL', '5/minute')
+
+    # PRAGMAs run on each new SQLite connection (none: SQLite defaults)
+    SQLITE_PRAGMAS = {}
+
+    # gunicorn (gunicorn.conf.py): worker processes, threads per worker
+    SERVER_BIND = os.getenv('SERVER_BIND', '0.0.0.0:8000')
+    SERVER_WORKERS = int(os.getenv('WEB_CONCURRENCY', (os.cpu_count() or 1) * 2 + 1))
+    SERVER_THREADS = int(os.getenv('SERVER_THREADS', 4))
+    SERVER_TIMEOUT = int(os.getenv('SERVER_TIMEOUT', 30))
+
 class DevelopmentConfig(Config):
     DEBUG = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///development.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    CACHE_TYPE = os.getenv('CACHE_TYPE', 'simple')
+    DB_STATS_HEADERS = os.getenv('DB_STATS_HEADERS', 'true').lower() == 'true'
+
+class ProductionConfig(Config):
+    SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///production.db')
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+    SQLITE_PRAGMAS = SQLITE_TUNED_PRAGMAS
+
+class BenchmarkConfig(ProductionConfig):
+    SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///benchmark.db')
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+    SECRET_KEY = os.getenv('SECRET_KEY', 'benchmark-secret-key-long-enough-for-hs256')
+    # load generators log in far more often than people do
+    RATELIMIT_ENABLED = False
+
+class TestingConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    CACHE_TYPE = 'simple'
+    DB_STATS_HEADERS = True
+    BCRYPT_LOG_ROUNDS = 4
+    PASSWORD_HASH_WORKERS = 0
 
 config = {
     'development': DevelopmentConfig,
+    'production': ProductionConfig,
+    'benchmark': BenchmarkConfig,
+    'testing': TestingConfig,
     'default': DevelopmentConfig
 }
\ No newline at end of file
@@ -0,0 +1,34 @@
+"""
+gunicorn settings, from the configuration class picked by APP_CONFIG
+(production by default). Run from part4/backend:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+The app is built once in the master (preload_app) and forked into
+SERVER_WORKERS processes of SERVER_THREADS threads each. Each worker
+resets its connection pools, cache and rate limiter sockets and
+password hashing pool right after the fork (app/utils/fork_safety.py),
+so no SQLAlchemy connection is shared between processes.
+
+With more than one worker the repository cache must be shared
+(CACHE_TYPE=redis) or off (null): an in-process 'simple' cache only
+hears about the writes of its own worker.
+"""
+import os
+
+# not imported as `config`: gunicorn reads every module-level name as a setting
+from config import config as _configs
+
+_config = _configs[os.getenv('APP_CONFIG', 'production')]
+
+bind = _config.SERVER_BIND
+workers = _config.SERVER_WORKERS
+if workers > 1 and _config.CACHE_TYPE == 'simple':
+    raise RuntimeError(
+        f"CACHE_TYPE=simple cannot be invalidated across {workers} workers: "
+        "set CACHE_TYPE=redis (with CACHE_REDIS_URL) or CACHE_TYPE=null, or WEB_CONCURRENCY=1")
+threads = _config.SERVER_THREADS
+worker_class = 'gthread'
+timeout = _config.SERVER_TIMEOUT
+preload_app = True
+accesslog = os.getenv('SERVER_ACCESS_LOG')
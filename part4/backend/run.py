@@ -1,6 +1,10 @@
+import os
+
 from app import create_app
+from config import config
 
-app = create_app()
+# APP_CONFIG: development (default), production, benchmark or testing
+app = create_app(config[os.getenv('APP_CONFIG', 'default')])
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    app.run(debug=app.config['DEBUG'])
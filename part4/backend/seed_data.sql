@@ -178,4 +178,19 @@ INSERT INTO reviews (id, user_id, place_id, rating, text) VALUES
      '36c9050e-ddd3-4c3b-9731-9f487208bbc7',  -- sylvia
      'a35837b8-25a2-49be-855d-84c1d0e8fe7c', 
      3, 
-     'Decent place for the price. The animals are cute but it can get a bit noisy in the morning. Good for a budget stay.');
\ No newline at end of file
+     'Decent place for the price. The animals are cute but it can get a bit noisy in the morning. Good for a budget stay.');
+
+
+-- ==========================
+-- Place rating totals:
+-- ==========================
+-- same as `flask rebuild-ratings`
+UPDATE places SET
+    rating_sum = (SELECT COALESCE(SUM(rating), 0) FROM reviews WHERE reviews.place_id = places.id),
+    rating_count = (SELECT COUNT(*) FROM reviews WHERE reviews.place_id = places.id);
+
+-- ==========================
+-- Place geohash:
+-- ==========================
+-- geohash cell of (-37.81, 144.96), normally set by the Place validators
+UPDATE places SET geohash = 'r1r0fsusu' WHERE latitude = -37.81 AND longitude = 144.96;
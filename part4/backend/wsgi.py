@@ -0,0 +1,7 @@
+import os
+
+from app import create_app
+from config import config
+
+# entry point of the production server: gunicorn -c gunicorn.conf.py wsgi:app
+app = create_app(config[os.getenv('APP_CONFIG', 'production')])
@@ -28,56 +28,69 @@ function getCookie(name) {
   return null;
 }
 
-// Fetch places data
-async function fetchPlaces(token) {
-  try {
-    const response = await fetch("http://127.0.0.1:5000/api/v1/places/", {
-      method: "GET",
-      headers: {
-        Authorization: `Bearer ${token}`,
-      },
-    });
-    if (!response.ok) {
-      throw new Error(`Failed to load places from API`);
-    } else {
-      const placesData = await response.json();
-      const placesResult = placesData.result;
-      displayPlaces(placesResult);
-    }
-  } catch (error) {
-    console.error("Error:", error);
-  }
-}
+// Fetch places data one page at a time.
+// Without a price filter the listing is paged by cursor, with one the
+// server-side search endpoint does the filtering and is paged by offset.
+const PLACES_PAGE_SIZE = 20;
+let placesRequest = 0;
 
-// Fetch average rating
-async function fetchRating(place_id) {
+async function fetchPlaces(token, maxPrice = null) {
+  const request = ++placesRequest;
+  const placeCard = document.querySelector("#places-list");
+  placeCard.innerHTML = "";
+  let cursor = null;
+  let offset = 0;
+  let more = true;
   try {
-    const response = await fetch(
-      `http://127.0.0.1:5000/api/v1/places/average/${place_id}`,
-      {
+    while (more) {
+      let url;
+      if (maxPrice === null) {
+        url = `http://127.0.0.1:5000/api/v1/places/?limit=${PLACES_PAGE_SIZE}`;
+        if (cursor) {
+          url += `&after=${encodeURIComponent(cursor)}`;
+        }
+      } else {
+        url =
+          `http://127.0.0.1:5000/api/v1/places/search?max_price=${maxPrice}` +
+          `&facets=false&limit=${PLACES_PAGE_SIZE}&offset=${offset}`;
+      }
+      const response = await fetch(url, {
         method: "GET",
+        headers: {
+          Authorization: `Bearer ${token}`,
+        },
+      });
+      if (!response.ok) {
+        throw new Error(`Failed to load places from API`);
+      }
+      const placesData = await response.json();
+      // a newer filter selection has started, drop this one
+      if (request !== placesRequest) {
+        return;
+      }
+      displayPlaces(placesData.result);
+      if (maxPrice === null) {
+        cursor = placesData.next_cursor;
+        more = Boolean(cursor);
+      } else {
+        offset += placesData.result.length;
+        more = placesData.result.length > 0 && offset < placesData.total;
       }
-    );
-    if (!response.ok) {
-      throw new Error("Failed to fetch average rating");
-    } else {
-      const ratingData = await response.json();
-      return ratingData;
     }
   } catch (error) {
     console.error("Error:", error);
   }
 }
 
-// Populate places list dynamically
-async function displayPlaces(places) {
+// Append a page of places to the list
+function displayPlaces(places) {
   const placeCard = document.querySelector("#places-list");
-  placeCard.innerHTML = "";
   for (const place of places) {
     const placeDiv = document.createElement("div");
     placeDiv.setAttribute("class", "place-card");
     placeDiv.setAttribute("data-price", place.price);
-    const rating = await fetchRating(place.id);
+    // average_rating is null for places without reviews
+    const rating = place.average_rating ?? 0;
     placeDiv.innerHTML = `<div>
           <h2 class="card-title">${place.title}</h2>
       </div>
@@ -91,7 +104,7 @@ async function displayPlaces(places) {
         </div>
 
         <div class="rating">
-          <span class="rating-value"> ${rating.average_rating}</span>
+          <span class="rating-value"> ${rating}</span>
           <span class="rating-label">Rating</span>
         </div>
       </div>
@@ -107,18 +120,8 @@ async function displayPlaces(places) {
   }
 }
 
-// Implement Client side filtering
+// Filter by price on the server
 document.getElementById("price-filter").addEventListener("change", (event) => {
-  const myFilters = document.getElementById("price-filter");
-  const filteredPrice = myFilters.value;
-  const places = document.getElementById("places-list");
-
-  for (const place of places.children) {
-    const placePrice = place.getAttribute("data-price");
-    if (filteredPrice === "All" || placePrice <= parseFloat(filteredPrice)) {
-      place.style.display = "block";
-    } else {
-      place.style.display = "none";
-    }
-  }
+  const filteredPrice = event.target.value;
+  fetchPlaces(getCookie("token"), filteredPrice === "All" ? null : parseFloat(filteredPrice));
 });